@@ -1,35 +1,109 @@
 import os
+import threading
 
 import certifi
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
 import mongoengine as mongo
 from dotenv import load_dotenv
 
+from api.monitoring import commandCounter
+from api.utils import loadKeyring
+
+
+def mongoSetting(name: str):
+    """
+    Gets a MongoDB setting from the environment (.env) or, if not set there, from settings.py.
+
+    @param name      Name of the setting, ex: "MONGO_MAX_POOL_SIZE".
+    @return      The value (ints are converted).
+    """
+    default = getattr(settings, name)
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return int(value) if isinstance(default, int) else value
+
 
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
 
+    # Process that created the current MongoClient (pymongo clients are not fork-safe)
+    connectedPid = None
+    connectLock = threading.Lock()
+
     def ready(self):
         """
-        Ran when app starts. Sets up database connection.
+        Ran when app starts. Loads the API keyring. The database connection is only registered
+        on first use (see ensure_connection): parsing a mongodb+srv URI already does the SRV/TXT
+        DNS lookups, so startup (manage.py, pytest) needs no network.
         """
-        self.connect_database()
+        load_dotenv()
+        if os.getenv("API_SECRET"):
+            loadKeyring()
+        request_started.connect(self.on_request_started, weak=False, dispatch_uid="api.ensure_connection")
+
+    def on_request_started(self, sender, **kwargs):
+        self.ensure_connection()
 
     def connect_database(self):
         """
-        Establishes a connection to the MongoDB database using environment variables. Requires
-        an .env file with MONGO_USERNAME and MONGO_PASSWORD variables. Adjust hostname and
-        database name as necessary for different setups.
+        Registers the connection to the MongoDB database using environment variables. Requires
+        an .env file with MONGO_USERNAME and MONGO_PASSWORD variables (or MONGO_URI for a full
+        connection string). Host, database and pool settings come from settings.py and can be
+        overridden with env variables of the same name.
+
+        Called through ensure_connection. The client is created with connect=False, so no
+        sockets are opened until the first query (or warm_pool).
         """
 
         # Load environment variables from .env file
         load_dotenv()
         username = os.getenv("MONGO_USERNAME")
         password = os.getenv("MONGO_PASSWORD")
-        hostname = "quayside-cluster.ry3otj1.mongodb.net"
-        database = "quayside"
+        hostname = mongoSetting("MONGO_HOST")
+        database = mongoSetting("MONGO_DATABASE")
 
         # connection_string = f"mongodb+srv://{username}:{password}@{hostname}/{database}?retryWrites=true&w=majority"
-        connection_string = f"mongodb+srv://{username}:{password}@{hostname}/{database}?retryWrites=true&w=majority&tls=true&tlsCAFile={certifi.where()}"
-        mongo.connect(db=database, host=connection_string)
+        connection_string = os.getenv("MONGO_URI") or (
+            f"mongodb+srv://{username}:{password}@{hostname}/{database}?retryWrites=true&w=majority&tls=true&tlsCAFile={certifi.where()}"
+        )
+        mongo.connect(
+            db=database,
+            host=connection_string,
+            connect=False,
+            maxPoolSize=mongoSetting("MONGO_MAX_POOL_SIZE"),
+            minPoolSize=mongoSetting("MONGO_MIN_POOL_SIZE"),
+            maxIdleTimeMS=mongoSetting("MONGO_MAX_IDLE_TIME_MS"),
+            serverSelectionTimeoutMS=mongoSetting("MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+            socketTimeoutMS=mongoSetting("MONGO_SOCKET_TIMEOUT_MS"),
+            event_listeners=[commandCounter],
+        )
+        ApiConfig.connectedPid = os.getpid()
+
+    def ensure_connection(self):
+        """
+        Registers the connection if the current process has none yet. Replaces the MongoClient if
+        it was created in another process (ex: the gunicorn master before forking the worker),
+        since pymongo clients must not be shared across a fork. Runs at the start of every request;
+        code that uses the database outside of requests (management commands, scripts such as
+        benchmarks/kanban.py, tests creating documents directly) calls it first.
+        """
+        if ApiConfig.connectedPid == os.getpid():
+            return
+        with ApiConfig.connectLock:
+            if ApiConfig.connectedPid != os.getpid():
+                if ApiConfig.connectedPid is not None:
+                    mongo.disconnect()
+                self.connect_database()
+
+    def warm_pool(self):
+        """
+        Opens the connection in the current process (SRV DNS lookup, TLS handshake, auth) so the
+        first request does not pay for it. pymongo then keeps MONGO_MIN_POOL_SIZE connections open.
+        Called from the gunicorn post_fork hook (see gunicorn.conf.py).
+        """
+        self.ensure_connection()
+        mongo.get_db().command("ping")
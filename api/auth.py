@@ -0,0 +1,123 @@
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+
+from api.cache import TTLCache
+from api.models import Project
+from api.utils import decodeApiKey, getAuthorizationToken
+
+
+# userID -> frozenset of the ObjectIds of the projects the user is a member of
+projectMembershipCache = TTLCache(
+    "projectMembership",
+    maxSize=settings.MEMBERSHIP_CACHE_SIZE,
+    ttl=settings.MEMBERSHIP_CACHE_TTL_SECONDS,
+)
+
+
+def getMemberProjectIDs(userID: str, refresh: bool = False) -> frozenset:
+    """
+    Gets the IDs of every project a user is a member of, from projectMembershipCache if possible.
+
+    @param userID      ID of the user.
+    @param refresh      If true, always reloads from the database.
+    @return      Frozenset of project ObjectIds.
+    """
+    userID = str(userID)
+    projectIDs = None if refresh else projectMembershipCache.get(userID)
+    if projectIDs is None:
+        projectIDs = frozenset(Project.objects(userIDs=userID).scalar("id"))
+        projectMembershipCache.set(userID, projectIDs)
+    return projectIDs
+
+
+def invalidateMemberships(userIDs):
+    """
+    Forgets the cached project memberships of users. Call whenever a project's userIDs change
+    (project created, updated or deleted).
+
+    @param userIDs      Iterable of user IDs (str or ObjectId).
+    """
+    for userID in userIDs:
+        projectMembershipCache.invalidate(str(userID))
+
+
+class AuthContext:
+    """
+    Who is making a request. Built once per request by api.decorators.apiKeyRequired (after the
+    token is verified) and passed to the service API functions instead of the raw token, so the
+    JWT is only decoded once no matter how many service functions a view chains together.
+
+    @example:
+        authContext = getAuthContext(request)
+        TasksAPIView.getTasks({"projectID": "1234"}, authContext)
+    """
+
+    def __init__(self, userID: str, token: str = None):
+        """
+        @param userID      ID of the authenticated user.
+        @param token      The (already verified) API token the user sent.
+        """
+        self.userID = str(userID)
+        self.token = token
+        self._projectIDs = None
+        self._projectIDsFresh = False  # Read from the database during this request
+
+    @classmethod
+    def fromToken(cls, token: str):
+        """
+        Builds a context by decoding a token. Will raise jwt.InvalidTokenError if it is invalid.
+        Only use when there is no request to take the context from (ex: right after login).
+
+        @param token      JWT API token.
+        @return      A new AuthContext.
+        """
+        return cls(decodeApiKey(token).get("userID"), token)
+
+    @property
+    def projectIDs(self) -> frozenset:
+        """
+        IDs (ObjectId) of every project the user is a member of. Loaded on first use from
+        projectMembershipCache.
+        """
+        if self._projectIDs is None:
+            self._projectIDs = getMemberProjectIDs(self.userID)
+        return self._projectIDs
+
+    def canAccessProject(self, projectID, fresh: bool = False) -> bool:
+        """
+        Checks if the user is a member of a project without querying the project.
+        A project missing from the cached memberships is checked once more against the database,
+        since it may have been shared with the user by another worker process.
+
+        @param projectID      ID of the project (str or ObjectId).
+        @param fresh      If true, a cached membership is not trusted either: the user may have
+            been removed from the project by another worker process (invalidateMemberships only
+            clears this one's cache). For destructive operations. At most one query per request.
+        @return      True if the user is a member of the project.
+        """
+        try:
+            projectID = ObjectId(projectID)
+        except (InvalidId, TypeError):
+            return False
+
+        if fresh or projectID not in self.projectIDs:
+            if not self._projectIDsFresh:
+                self._projectIDs = getMemberProjectIDs(self.userID, refresh=True)
+                self._projectIDsFresh = True
+        return projectID in self._projectIDs
+
+
+def getAuthContext(request) -> AuthContext:
+    """
+    Gets the AuthContext that apiKeyRequired attached to the request, falling back to decoding the
+    request's token if the view is not wrapped.
+
+    @param request      Django or DRF request.
+    @return      The AuthContext of the requesting user.
+    """
+    authContext = getattr(request, "authContext", None)
+    if authContext is None:
+        authContext = AuthContext.fromToken(getAuthorizationToken(request))
+        request.authContext = authContext
+    return authContext
@@ -0,0 +1,78 @@
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+
+from api.metrics import Counter
+
+
+_executors = {}  # pool name -> ThreadPoolExecutor
+_executorPid = None
+_lock = threading.Lock()
+
+failures = Counter("background.failures")
+
+
+def poolSizes() -> dict:
+    """
+    @return      Dict of pool name to number of threads. Slow jobs get their own pool so they
+        never hold up the short deferred writes of the "background" pool.
+    """
+    return {
+        "background": settings.BACKGROUND_WORKERS,
+        "generation": settings.GENERATION_WORKERS,
+    }
+
+
+def getExecutor(pool: str = "background") -> ThreadPoolExecutor:
+    """
+    Gets one of the process' background thread pools, making new ones after a fork (threads do
+    not survive fork, so a pool inherited from the gunicorn master would never run anything).
+
+    @param pool      Name of the pool, see poolSizes.
+    """
+    global _executorPid
+    with _lock:
+        if _executorPid != os.getpid():
+            _executors.clear()
+            _executorPid = os.getpid()
+        if pool not in _executors:
+            _executors[pool] = ThreadPoolExecutor(
+                max_workers=poolSizes()[pool], thread_name_prefix=pool
+            )
+        return _executors[pool]
+
+
+def _run(function, args, kwargs):
+    try:
+        return function(*args, **kwargs)
+    except Exception:
+        failures.increment()
+        print(f"Background task {function.__name__} failed:")
+        traceback.print_exc()
+        raise
+
+
+def submit(function, *args, **kwargs):
+    """
+    Runs function(*args, **kwargs) in a background thread of this process. It starts right
+    away, so it may run before, during or after the response is sent, and nothing waits for it.
+    For work the response does not depend on (ex: persisting a cleanup). It is lost if the
+    worker exits, so it must be safe to skip.
+
+    @param function      Function to run.
+    @return      concurrent.futures.Future of the result.
+    """
+    return getExecutor().submit(_run, function, args, kwargs)
+
+
+def submitTo(pool: str, function, *args, **kwargs):
+    """
+    Same as submit, on another pool (see poolSizes).
+
+    @param pool      Name of the pool.
+    @param function      Function to run.
+    @return      concurrent.futures.Future of the result.
+    """
+    return getExecutor(pool).submit(_run, function, args, kwargs)
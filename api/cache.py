@@ -0,0 +1,110 @@
+import time
+import threading
+from collections import OrderedDict
+
+from api.metrics import Counter
+
+
+class TTLCache:
+    """
+    Process-local LRU cache where every entry also expires after a time to live.
+    Safe to share between threads. Each cache keeps hit/miss counters that are registered
+    in api.metrics under "<name>.hits" and "<name>.misses".
+
+    NOTE: Every gunicorn worker has its own copy, so invalidating an entry only affects the
+    current process. Keep the TTL short for anything used for authorization.
+
+    @example:
+        cache = TTLCache("verifiedTokens", maxSize=1024, ttl=300)
+        cache.set("key", "value")
+        cache.get("key")  # "value"
+    """
+
+    _MISSING = object()
+
+    def __init__(self, name: str, maxSize: int = 1024, ttl: float = 300):
+        """
+        @param name      Name used for the hit/miss counters.
+        @param maxSize      Maximum number of entries before the least recently used is evicted.
+        @param ttl      Default time to live of an entry in seconds.
+        """
+        self.name = name
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.hits = Counter(f"{name}.hits")
+        self.misses = Counter(f"{name}.misses")
+        self._entries = OrderedDict()  # key -> (expiresAt, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Gets a value from the cache, counting the lookup as a hit or a miss.
+
+        @param key      Key of the entry.
+        @param default      Returned if the key is missing or expired.
+        @return      The cached value or default.
+        """
+        with self._lock:
+            entry = self._entries.get(key, self._MISSING)
+            if entry is not self._MISSING:
+                expiresAt, value = entry
+                if expiresAt > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits.increment()
+                    return value
+                del self._entries[key]
+        self.misses.increment()
+        return default
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Adds or replaces an entry, evicting the least recently used entry if the cache is full.
+
+        @param key      Key of the entry.
+        @param value      Value to store.
+        @param ttl      Time to live in seconds. Defaults to the cache's ttl.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxSize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        Removes a single entry if it exists.
+
+        @param key      Key of the entry.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidateWhere(self, predicate):
+        """
+        Removes every entry where predicate(key, value) is true.
+
+        @param predicate      Function taking (key, value) and returning a bool.
+        @return      Number of entries removed.
+        """
+        with self._lock:
+            keys = [
+                key
+                for key, (_, value) in self._entries.items()
+                if predicate(key, value)
+            ]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        """
+        Removes every entry (counters are kept).
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
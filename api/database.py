@@ -0,0 +1,45 @@
+import mongoengine as mongo
+from pymongo.errors import OperationFailure
+
+
+# Topologies where MongoDB supports multi-document transactions
+TRANSACTION_TOPOLOGIES = {"ReplicaSetWithPrimary", "Sharded", "LoadBalanced"}
+
+# "Transaction numbers are only allowed on a replica set member or mongos"
+ILLEGAL_OPERATION = 20
+
+
+def supportsTransactions(client) -> bool:
+    """
+    @param client      pymongo MongoClient.
+    @return      False if the server is known to be standalone (ex: a local dev database).
+    """
+    return client.topology_description.topology_type_name in TRANSACTION_TOPOLOGIES
+
+
+def runInTransaction(function):
+    """
+    Runs function(session) in a MongoDB transaction (retried by pymongo on transient errors).
+    Standalone servers have no transactions, so there function(None) is run directly. Pass the
+    session to every pymongo call made in function (ex: collection.update_many(..., session=session)).
+
+    @param function      Function taking a pymongo ClientSession (or None).
+    @return      What function returns.
+
+    @example:
+        def deleteCascade(session):
+            Project._get_collection().delete_one({"_id": projectID}, session=session)
+            Task._get_collection().delete_many({"projectID": projectID}, session=session)
+        runInTransaction(deleteCascade)
+    """
+    client = mongo.get_connection()
+    if not supportsTransactions(client):
+        return function(None)
+
+    with client.start_session() as session:
+        try:
+            return session.with_transaction(function)
+        except OperationFailure as e:
+            if e.code != ILLEGAL_OPERATION:
+                raise
+    return function(None)
@@ -1,14 +1,61 @@
+import time
+import hashlib
+from django.conf import settings
 from django.http import JsonResponse
 import jwt
+from api.auth import AuthContext
+from api.cache import TTLCache
 from api.models import User
 from api.utils import decodeApiKey, decryptApiKey, getAuthorizationToken
 
 
+# Hash of every token that recently passed the full check -> userID
+verifiedTokenCache = TTLCache(
+    "verifiedTokens",
+    maxSize=settings.TOKEN_CACHE_SIZE,
+    ttl=settings.TOKEN_CACHE_TTL_SECONDS,
+)
+
+
+def hashToken(token: str) -> str:
+    """
+    Hashes a token so raw API keys are never kept in memory as cache keys.
+
+    @param token      The API token.
+    @return      Hex sha256 digest of the token.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def invalidateToken(token: str):
+    """
+    Forgets that a token was verified (ex: on logout). The next request with it is fully checked.
+
+    @param token      The API token.
+    """
+    if token:
+        verifiedTokenCache.invalidate(hashToken(token))
+
+
+def invalidateUserTokens(userID: str):
+    """
+    Forgets every verified token of a user (ex: when their API key changes).
+
+    @param userID      ID of the user.
+    """
+    verifiedTokenCache.invalidateWhere(
+        lambda _, cachedUserID: cachedUserID == str(userID)
+    )
+
+
 def apiKeyRequired(function):
     """
     Wraps function to authenticate it.
     Requires authorization token to be passed in the authorization header OR through cookies (header good for scripts,
     cookies good for websites).
+    Tokens that passed the full check are remembered in verifiedTokenCache for a short time so
+    following requests skip the database lookup and decryption.
+    Attaches an api.auth.AuthContext to the request as request.authContext.
 
     @param function Function to be wrapped.
     """
@@ -21,6 +68,17 @@ def apiKeyRequired(function):
         if not token:
             return JsonResponse({"Error": "No token provided"}, status=401)
 
+        # Already verified earlier in this request (ex: a wrapped view calling another)
+        authContext = getattr(request, "authContext", None)
+        if authContext is not None and authContext.token == token:
+            return function(request, *args, **kwargs)
+
+        tokenHash = hashToken(token)
+        cachedUserID = verifiedTokenCache.get(tokenHash)
+        if cachedUserID is not None:
+            request.authContext = AuthContext(cachedUserID, token)
+            return function(request, *args, **kwargs)
+
         try:
             decodedKey = decodeApiKey(token)
         except jwt.ExpiredSignatureError:
@@ -50,6 +108,15 @@ def apiKeyRequired(function):
             return JsonResponse(
                 {"Error": "Could not find user associated with token"}, status=401
             )
+
+        # Never cache a token past its expiration
+        ttl = None
+        if "exp" in decodedKey:
+            ttl = min(verifiedTokenCache.ttl, decodedKey["exp"] - time.time())
+        verifiedTokenCache.set(tokenHash, str(userID), ttl=ttl)
+
+        # Service functions take this instead of re-decoding the token
+        request.authContext = AuthContext(userID, token)
         return function(request, *args, **kwargs)  # Call original function
 
     return wrap
@@ -0,0 +1,117 @@
+from datetime import datetime
+from functools import lru_cache
+import mongoengine as mongo
+from django.utils import timezone
+
+
+def encodeObjectId(value) -> str:
+    return str(value)
+
+
+def encodeDate(value) -> str:
+    # DateFields are stored as datetimes at midnight
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+def encodeDateTime(value) -> str:
+    # Same output as rest_framework's DateTimeField (naive values are in settings.TIME_ZONE)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    value = value.isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def fieldEncoder(field):
+    """
+    Gets the function that converts a raw pymongo value of a MongoEngine field to its JSON value.
+
+    @param field      MongoEngine field.
+    @return      Function taking the raw value, or None if the raw value is already JSON friendly.
+    """
+    if isinstance(field, mongo.ObjectIdField):
+        return encodeObjectId
+    if isinstance(field, mongo.DateField):  # Before DateTimeField, DateField subclasses it
+        return encodeDate
+    if isinstance(field, mongo.DateTimeField):
+        return encodeDateTime
+    if isinstance(field, mongo.EmbeddedDocumentField):
+        return DocumentEncoder(field.document_type).encode
+    if isinstance(field, mongo.ListField):
+        itemEncoder = fieldEncoder(field.field) if field.field else None
+        if itemEncoder is None:
+            return list
+        return lambda values: [
+            None if value is None else itemEncoder(value) for value in values
+        ]
+    return None
+
+
+class DocumentEncoder:
+    """
+    Converts raw pymongo documents (ex: from QuerySet.as_pymongo()) to the same dicts the
+    DocumentSerializers in api.serializers return, without building MongoEngine documents.
+    The conversion of every field is worked out once when the encoder is made.
+
+    @example:
+        encoder = getEncoder(Task)
+        data = encoder.encodeMany(Task.objects(projectID=projectID).as_pymongo())
+    """
+
+    def __init__(self, documentClass, fields=None):
+        """
+        @param documentClass      MongoEngine Document or EmbeddedDocument class.
+        @param fields      Names of the fields to output (ex: from .only()), None for all fields.
+        """
+        self.documentClass = documentClass
+        self.fields = []  # (name, dbField, encoder, default) default is None for null=True fields
+
+        for name in documentClass._fields_ordered:
+            field = documentClass._fields[name]
+            if fields is not None and name not in fields:
+                continue
+            default = None if field.null else field.default
+            self.fields.append((name, field.db_field, fieldEncoder(field), default))
+
+    def encode(self, rawDocument: dict) -> dict:
+        """
+        @param rawDocument      Document as returned by pymongo.
+        @return      JSON friendly dict.
+        """
+        data = {}
+        for name, dbField, encoder, default in self.fields:
+            value = rawDocument.get(dbField)
+            if value is None:
+                # Same default MongoEngine would have given the missing field
+                value = default() if callable(default) else default
+            if value is not None and encoder is not None:
+                value = encoder(value)
+            data[name] = value
+        return data
+
+    def encodeMany(self, rawDocuments) -> list:
+        """
+        @param rawDocuments      Iterable of documents as returned by pymongo.
+        @return      List of JSON friendly dicts.
+        """
+        encode = self.encode
+        return [encode(rawDocument) for rawDocument in rawDocuments]
+
+
+@lru_cache(maxsize=None)
+def _getEncoder(documentClass, fields):
+    return DocumentEncoder(documentClass, fields)
+
+
+def getEncoder(documentClass, fields=None) -> DocumentEncoder:
+    """
+    Gets the (cached) encoder of a document class.
+
+    @param documentClass      MongoEngine Document or EmbeddedDocument class.
+    @param fields      Names of the fields to output, None for all fields.
+    @return      DocumentEncoder.
+    """
+    return _getEncoder(documentClass, frozenset(fields) if fields is not None else None)
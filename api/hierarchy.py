@@ -0,0 +1,265 @@
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+from api.models import Task
+
+# Tasks saved before Task.ancestors existed have neither ancestors nor depth until
+# `manage.py backfill_ancestors` runs. Until then their paths and subtrees are found by following
+# parentTaskID (see pathOf, legacySubtree), so nothing is orphaned or given a partial path.
+BACKFILLED = {"depth": {"$exists": True}}
+
+
+def ancestorsUnder(parentTaskID, projectID, taskID=None) -> list:
+    """
+    Gets the ancestors (Task.ancestors) of a task placed under parentTaskID: the parent's
+    ancestors followed by the parent.
+
+    @param parentTaskID      Id of the new parent (ObjectId or str), None for a root task.
+    @param projectID      ObjectId of the task's project, the parent must be in it.
+    @param taskID      ObjectId of the task if it already exists, so it is not moved under itself.
+    @return      List of ObjectIds, root first.
+    @raises ValueError      If the parent does not exist in the project or is in taskID's subtree.
+    """
+    if parentTaskID is None:
+        return []
+
+    try:
+        parentTaskID = ObjectId(parentTaskID)
+    except (InvalidId, TypeError) as e:
+        raise ValueError(f"Invalid parentTaskID {parentTaskID!r}") from e
+
+    parent = Task._get_collection().find_one(
+        {"_id": parentTaskID, "projectID": ObjectId(projectID)},
+        {"projectID": 1, "parentTaskID": 1, "ancestors": 1, "depth": 1},
+    )
+    if parent is None:
+        raise ValueError("Parent task not found in the task's project")
+
+    ancestors = pathOf(parent) + [parentTaskID]
+    if taskID is not None and taskID in ancestors:
+        raise ValueError("A task can not be moved under itself or one of its subtasks")
+    return ancestors
+
+
+def assignAncestors(tasks: list):
+    """
+    Sets 'ancestors' and 'depth' on tasks about to be created, with one query for all their
+    parents.
+
+    @param tasks      List of dicts with 'projectID' and (optional) 'parentTaskID' ObjectIds.
+        Updated in place.
+    @raises ValueError      If a parent does not exist in its child's project.
+    """
+    parentIDs = {task["parentTaskID"] for task in tasks if task.get("parentTaskID")}
+    parents = {
+        parent["_id"]: parent
+        for parent in Task._get_collection().find(
+            {"_id": {"$in": list(parentIDs)}},
+            {"projectID": 1, "parentTaskID": 1, "ancestors": 1, "depth": 1},
+        )
+    }
+
+    for task in tasks:
+        ancestors = []
+        parentTaskID = task.get("parentTaskID")
+        if parentTaskID:
+            parent = parents.get(parentTaskID)
+            if parent is None or parent.get("projectID") != task["projectID"]:
+                raise ValueError("Parent task not found in the task's project")
+            ancestors = pathOf(parent) + [parentTaskID]
+        task["ancestors"] = ancestors
+        task["depth"] = len(ancestors)
+
+
+def moveSubtree(taskID, ancestors: list):
+    """
+    Gives a task new ancestors (after its parentTaskID changed) and rewrites the ancestors of all
+    its descendants to match, with one update each however big the subtree is.
+
+    @param taskID      ObjectId of the moved task.
+    @param ancestors      Its new ancestors, see ancestorsUnder.
+    """
+    collection = Task._get_collection()
+    task = collection.find_one({"_id": taskID}, {"projectID": 1, "depth": 1})
+    if task is not None and "depth" not in task:
+        # Not backfilled: its descendants have no ancestors to rewrite, set them from parentTaskID
+        descendants = legacySubtree(taskID, task["projectID"])
+        parents = {taskID: None, **{child["_id"]: child["parentTaskID"] for child in descendants}}
+        paths, _ = computeAncestors(parents)
+        collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": subtaskID},
+                    {"$set": {"ancestors": ancestors + path, "depth": len(ancestors) + len(path)}},
+                )
+                for subtaskID, path in paths.items()
+            ],
+            ordered=False,
+        )
+        return
+
+    collection.update_one(
+        {"_id": taskID}, {"$set": {"ancestors": ancestors, "depth": len(ancestors)}}
+    )
+    # Descendants keep their path from the moved task down, under the new ancestors
+    collection.update_many(
+        {"ancestors": taskID},
+        [
+            {
+                "$set": {
+                    "ancestors": {
+                        "$concatArrays": [
+                            ancestors,
+                            {
+                                "$slice": [
+                                    "$ancestors",
+                                    {"$indexOfArray": ["$ancestors", taskID]},
+                                    {"$size": "$ancestors"},
+                                ]
+                            },
+                        ]
+                    }
+                }
+            },
+            {"$set": {"depth": {"$size": "$ancestors"}}},
+        ],
+    )
+
+
+def removeFromSubtree(taskID):
+    """
+    Removes a task from the ancestors of its descendants, for when it is deleted and its
+    children move up to its parent.
+
+    @param taskID      ObjectId of the task.
+    """
+    Task._get_collection().update_many(
+        {"ancestors": taskID}, {"$pull": {"ancestors": taskID}, "$inc": {"depth": -1}}
+    )
+
+
+def subtreeFilter(taskID) -> dict:
+    """
+    @return      Query for a task and all its descendants (uses the ancestors index). Only for
+        backfilled tasks, see subtreeQuery.
+    """
+    return {"$or": [{"_id": taskID}, {"ancestors": taskID}]}
+
+
+def subtreeQuery(taskID, projectID) -> dict:
+    """
+    Query for a task and all its descendants, whether or not the task is backfilled yet.
+
+    @param taskID      ObjectId of the task.
+    @param projectID      ObjectId of the task's project.
+    @return      subtreeFilter, or the ids of the subtree found through parentTaskID.
+    """
+    if Task._get_collection().find_one({"_id": taskID, **BACKFILLED}, {"_id": 1}) is not None:
+        return subtreeFilter(taskID)
+    return {"_id": {"$in": [taskID] + [child["_id"] for child in legacySubtree(taskID, projectID)]}}
+
+
+def pathOf(task: dict) -> list:
+    """
+    @param task      Raw task with projectID, parentTaskID, ancestors and depth.
+    @return      Its ancestors, followed up parentTaskID if it is not backfilled.
+    """
+    if "depth" in task:
+        return task.get("ancestors", [])
+
+    collection = Task._get_collection()
+    path = collection.aggregate(
+        [
+            {"$match": {"_id": task["_id"]}},
+            {
+                "$graphLookup": {
+                    "from": collection.name,
+                    "startWith": "$parentTaskID",
+                    "connectFromField": "parentTaskID",
+                    "connectToField": "_id",
+                    "as": "path",
+                    "depthField": "distance",
+                    "restrictSearchWithMatch": {"projectID": task["projectID"]},
+                }
+            },
+            {"$unwind": "$path"},
+            {"$sort": {"path.distance": -1}},  # Root first
+            {"$project": {"_id": "$path._id"}},
+        ]
+    )
+    return [ancestor["_id"] for ancestor in path]
+
+
+def legacySubtree(taskID, projectID) -> list:
+    """
+    Gets a task's descendants by following parentTaskID down the tree ($graphLookup, stops on
+    cycles), for tasks that are not backfilled.
+
+    @param taskID      ObjectId of the task.
+    @param projectID      ObjectId of the task's project (descendants are only looked for there).
+    @return      List of raw descendants with _id and parentTaskID.
+    """
+    collection = Task._get_collection()
+    return list(
+        collection.aggregate(
+            [
+                {"$match": {"_id": taskID}},
+                {
+                    "$graphLookup": {
+                        "from": collection.name,
+                        "startWith": "$_id",
+                        "connectFromField": "_id",
+                        "connectToField": "parentTaskID",
+                        "as": "descendants",
+                        "restrictSearchWithMatch": {"projectID": projectID},
+                    }
+                },
+                # $unwind right after $graphLookup avoids building one (possibly > 16MB) document
+                {"$unwind": "$descendants"},
+                {"$project": {"_id": "$descendants._id", "parentTaskID": "$descendants.parentTaskID"}},
+            ]
+        )
+    )
+
+
+def computeAncestors(parents: dict):
+    """
+    Computes every task's ancestors from parentTaskIDs alone (to backfill Task.ancestors).
+    Iterative, so it works on trees of any depth. A parent that is missing, or a cycle, ends
+    the path there.
+
+    @param parents      Dict of task id to parent id (None for root tasks).
+    @return      A tuple of (ancestors, brokenIDs): dict of task id to list of ancestor ids
+        (root first), and the ids of the tasks whose parent is missing or part of a cycle.
+    """
+    ancestors = {}
+    brokenIDs = set()
+
+    for taskID in parents:
+        # Walk up until a task whose ancestors are known, a root, or a broken link
+        chain = []
+        onChain = set()
+        current = taskID
+        prefix = None
+        while prefix is None:
+            if current in ancestors:
+                prefix = ancestors[current] + [current]
+                break
+            chain.append(current)
+            onChain.add(current)
+            parentID = parents[current]
+            if parentID is None:
+                prefix = []
+            elif parentID not in parents or parentID in onChain:
+                brokenIDs.add(current)
+                prefix = []
+            else:
+                current = parentID
+
+        # Fill in the chain from the top down
+        for chainTaskID in reversed(chain):
+            ancestors[chainTaskID] = prefix
+            prefix = prefix + [chainTaskID]
+
+    return ancestors, brokenIDs
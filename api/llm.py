@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from dotenv import load_dotenv
+import openai
+from django.conf import settings
+
+from api.models import CompletionCache
+from api.metrics import Counter
+
+
+_client = None
+_lock = threading.Lock()
+
+cacheHits = Counter("completionCache.hits")
+cacheMisses = Counter("completionCache.misses")
+
+
+def getClient() -> openai.OpenAI:
+    """
+    Gets the process' OpenAI client (made once, it keeps its HTTP connections open). Uses
+    CHATGPT_API_KEY and, if set, settings.OPENAI_BASE_URL (ex: a fake server in tests).
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            load_dotenv()
+            _client = openai.OpenAI(
+                api_key=os.getenv("CHATGPT_API_KEY"), base_url=settings.OPENAI_BASE_URL
+            )
+        return _client
+
+
+def resetClient():
+    """
+    Forgets the client so the next getClient makes a new one (ex: after changing settings).
+    """
+    global _client
+    with _lock:
+        _client = None
+
+
+def streamCompletion(messages: list, **params):
+    """
+    Streams a chat completion, so the start of the answer can be used while the rest is generated.
+
+    @param messages      Chat messages (list of {"role", "content"}).
+    @param params      Other chat.completions.create parameters (model, temperature, ...).
+    @return      Generator of the completion's text, in chunks as they arrive.
+    """
+    stream = getClient().chat.completions.create(messages=messages, stream=True, **params)
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+
+def completionKey(messages: list, **params) -> str:
+    """
+    Gets the cache key of a completion request: the same for requests that only differ in
+    whitespace (ex: the indentation of a prompt) or in the order of their parameters.
+
+    @param messages      Chat messages (list of {"role", "content"}).
+    @param params      Other chat.completions.create parameters (model, temperature, ...).
+    @return      Hex sha256 of the normalized request.
+    """
+    normalized = {
+        "messages": [
+            {"role": message["role"], "content": re.sub(r"\s+", " ", message["content"]).strip()}
+            for message in messages
+        ],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+
+def cachedStreamCompletion(messages: list, useCache: bool = True, **params):
+    """
+    streamCompletion with the complete answers saved in MongoDB (CompletionCache) by
+    completionKey, so asking again (a retry, a cloned project...) does not call OpenAI. Only
+    useful for deterministic requests (temperature 0). Hits and misses are counted in the
+    "completionCache" metrics.
+
+    @param messages      Chat messages (list of {"role", "content"}).
+    @param useCache      False to always call OpenAI (the answer is still saved for next time).
+    @param params      Other chat.completions.create parameters (model, temperature, ...).
+    @return      Generator of the completion's text, in one chunk if it was cached.
+    """
+    if not settings.COMPLETION_CACHE_ENABLED:
+        yield from streamCompletion(messages, **params)
+        return
+
+    key = completionKey(messages, **params)
+    collection = CompletionCache._get_collection()
+    if useCache:
+        cached = collection.find_one({"_id": key}, {"text": 1})
+        if cached is not None:
+            cacheHits.increment()
+            yield cached["text"]
+            return
+        cacheMisses.increment()
+
+    chunks = []
+    for text in streamCompletion(messages, **params):
+        chunks.append(text)
+        yield text
+
+    # Only complete answers get here (not if the caller stopped reading or the stream failed)
+    if chunks:
+        saveCompletion(key, params.get("model"), "".join(chunks))
+
+
+def saveCompletion(key: str, model: str, text: str):
+    """
+    Saves a completion in the cache, then deletes the oldest ones past
+    settings.COMPLETION_CACHE_MAX_ENTRIES (the TTL index deletes the expired ones).
+
+    @param key      completionKey of the request.
+    @param model      Model that answered.
+    @param text      Complete text of the answer.
+    """
+    collection = CompletionCache._get_collection()
+    collection.replace_one(
+        {"_id": key},
+        CompletionCache(id=key, model=model, text=text).to_mongo().to_dict(),
+        upsert=True,
+    )
+
+    excess = collection.estimated_document_count() - settings.COMPLETION_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = collection.find({}, {"_id": 1}).sort("createdAt", 1).limit(excess)
+        collection.delete_many({"_id": {"$in": [document["_id"] for document in oldest]}})
@@ -0,0 +1,39 @@
+import threading
+
+
+# name -> Counter. Filled in as counters are created.
+counters = {}
+
+
+class Counter:
+    """
+    A thread safe, process-local counter. Counters register themselves by name so that they
+    can be reported together with snapshot().
+
+    @example:
+        requests = Counter("myFeature.requests")
+        requests.increment()
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+        counters[name] = self
+
+    def increment(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0
+
+
+def snapshot() -> dict:
+    """
+    Gets the current value of every registered counter.
+
+    @return      Dict of counter name to value.
+    """
+    return {name: counter.value for name, counter in sorted(counters.items())}
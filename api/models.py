@@ -1,6 +1,7 @@
 import mongoengine as mongo
 from bson.objectid import ObjectId
 from datetime import datetime, timezone
+from django.conf import settings
 
 
 class User(mongo.Document):
@@ -15,6 +16,7 @@ class User(mongo.Document):
     meta = {
         "collection": "User",  # Need to specify UPPER Case
         "strict": False,  # If true, throws weird error for __v
+        "auto_create_index": False,  # Built by `manage.py ensure_indexes`
     }
 
     class Meta:
@@ -47,6 +49,10 @@ class Project(mongo.Document):
     meta = {
         "collection": "Project",  # Need to specify UPPER Case
         "strict": False,  # If true, throws weird error for __v
+        "auto_create_index": False,  # Built by `manage.py ensure_indexes`
+        "indexes": [
+            ("userIDs", "id"),  # Membership checks/project lists (paginated on _id)
+        ],
     }
 
     def create_default_task_statuses():
@@ -75,6 +81,7 @@ class Project(mongo.Document):
         order = mongo.IntField(null=False, required=True) # task order on kanban
         
     taskStatuses = mongo.EmbeddedDocumentListField(Status, default=create_default_task_statuses(), blank=True)
+    statusVersion = mongo.IntField(default=0)  # Incremented by every write to taskStatuses
 
     def clean(self):
         # Ensures all status within a project have unique ids
@@ -86,6 +93,8 @@ class Project(mongo.Document):
 class Task(mongo.Document):
     projectID = mongo.ObjectIdField()
     parentTaskID = mongo.ObjectIdField(null=True)  # Allow null values
+    ancestors = mongo.ListField(mongo.ObjectIdField())  # Root first, kept by api.hierarchy
+    depth = mongo.IntField(default=0)  # len(ancestors)
     name = mongo.StringField()
     objectives = mongo.ListField(mongo.StringField())
     scopesIncluded = mongo.ListField(mongo.StringField())
@@ -98,12 +107,20 @@ class Task(mongo.Document):
     endDate = mongo.DateField(null=True)
     # status = mongo.StringField(default='Todo', choices=('In-Progress', 'Todo', 'Done'))
     statusId = mongo.ObjectIdField(null=True, default=None)
-    priority = mongo.IntField(null=True)
+    priority = mongo.IntField(null=True)  # Old kanban order, replaced by rank (kept to migrate)
+    rank = mongo.StringField(null=True)  # Kanban order within a status, see api.ranking
     durationMinutes = mongo.IntField(null=False)
 
     meta = {
         "collection": "Task",  # Need to specify UPPER Case
         "strict": False,  # If true, throws weird error for __v
+        "auto_create_index": False,  # Built by `manage.py ensure_indexes`
+        "indexes": [
+            ("projectID", "statusId", "rank"),  # Kanban columns
+            ("projectID", "id"),  # Task lists of a project (paginated on _id)
+            "parentTaskID",  # Children of a task
+            "ancestors",  # Subtree of a task
+        ],
     }
 
 class Feedback(mongo.Document):
@@ -115,4 +132,46 @@ class Feedback(mongo.Document):
     explanation = mongo.StringField(null=True)
     meta = {
         "collection": "Feedback",  # Need to specify for it to be UPPER Case
-    }
\ No newline at end of file
+        "auto_create_index": False,  # Built by `manage.py ensure_indexes`
+        "indexes": [
+            ("projectID", "id"),  # Feedback lists (paginated on _id)
+            ("taskID", "id"),
+            "userID",
+        ],
+    }
+
+
+class GenerationJob(mongo.Document):
+    # Background task generation of a project, see api.views.v1.generatedTasks
+    projectID = mongo.ObjectIdField(required=True)
+    userID = mongo.ObjectIdField(required=True)
+    status = mongo.StringField(default="pending", choices=("pending", "running", "done", "failed"))
+    taskCount = mongo.IntField(default=0)  # Number of tasks created
+    error = mongo.StringField(null=True)
+    createdAt = mongo.DateTimeField(default=lambda: datetime.now(timezone.utc))
+    startedAt = mongo.DateTimeField(null=True)  # When a worker thread picked it up
+    finishedAt = mongo.DateTimeField(null=True)
+    meta = {
+        "collection": "GenerationJob",
+        "auto_create_index": False,  # Built by `manage.py ensure_indexes`
+        "indexes": [
+            # Jobs are only polled right after they start, MongoDB deletes them after a week
+            {"fields": ["createdAt"], "expireAfterSeconds": 7 * 24 * 60 * 60},
+        ],
+    }
+
+
+class CompletionCache(mongo.Document):
+    # LLM completions by request, see api.llm.cachedStreamCompletion
+    id = mongo.StringField(primary_key=True)  # sha256 of the normalized request
+    model = mongo.StringField()
+    text = mongo.StringField()
+    createdAt = mongo.DateTimeField(default=lambda: datetime.now(timezone.utc))
+    meta = {
+        "collection": "CompletionCache",
+        "auto_create_index": False,  # Built by `manage.py ensure_indexes`
+        "indexes": [
+            # Expiry, and oldest first when over settings.COMPLETION_CACHE_MAX_ENTRIES
+            {"fields": ["createdAt"], "expireAfterSeconds": settings.COMPLETION_CACHE_TTL_SECONDS},
+        ],
+    }
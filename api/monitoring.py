@@ -0,0 +1,72 @@
+import threading
+from contextlib import contextmanager
+from pymongo import monitoring
+
+from api.metrics import Counter
+
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    pymongo command listener that counts the commands sent to MongoDB. Registered on the client in
+    ApiConfig.connect_database. Use countQueries() to count the commands of a block of code
+    (ex: in tests, like Django's assertNumQueries).
+    """
+
+    # Commands that are not queries/writes made by our code
+    IGNORED_COMMANDS = {
+        "hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue",
+        "endSessions", "killCursors", "buildInfo",
+    }
+
+    def __init__(self):
+        self.total = Counter("mongo.commands")
+        self._local = threading.local()
+
+    def _activeCounts(self) -> list:
+        if not hasattr(self._local, "activeCounts"):
+            self._local.activeCounts = []
+        return self._local.activeCounts
+
+    def started(self, event):
+        if event.command_name in self.IGNORED_COMMANDS:
+            return
+        self.total.increment()
+        for queryCount in self._activeCounts():
+            queryCount.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class QueryCount:
+    def __init__(self):
+        self.commands = []
+
+    @property
+    def count(self) -> int:
+        return len(self.commands)
+
+
+commandCounter = CommandCounter()
+
+
+@contextmanager
+def countQueries():
+    """
+    Counts the MongoDB commands sent by the current thread inside the block.
+
+    @example:
+        with countQueries() as queries:
+            TasksAPIView.getTasks({"projectID": "1234"}, authContext)
+        print(queries.count, queries.commands)
+    """
+    queryCount = QueryCount()
+    activeCounts = commandCounter._activeCounts()
+    activeCounts.append(queryCount)
+    try:
+        yield queryCount
+    finally:
+        activeCounts.remove(queryCount)
@@ -0,0 +1,79 @@
+import base64
+import binascii
+from bson.objectid import ObjectId
+from django.conf import settings
+
+
+def encodeCursor(lastID) -> str:
+    """
+    Encodes the id of the last document of a page as an opaque, url safe cursor.
+
+    @param lastID      ObjectId (or str) of the last document returned.
+    @return      Cursor str to pass back as the 'cursor' parameter.
+    """
+    return base64.urlsafe_b64encode(ObjectId(lastID).binary).decode().rstrip("=")
+
+
+def decodeCursor(cursor: str) -> ObjectId:
+    """
+    Decodes a cursor made by encodeCursor.
+
+    @param cursor      Cursor str.
+    @return      ObjectId the next page starts after.
+    @raises ValueError      If the cursor is not valid.
+    """
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def popPaginationParameters(queryData: dict):
+    """
+    Removes the 'limit' and 'cursor' parameters from query data.
+
+    @param queryData      Dict of query parameters.
+    @return      A tuple of (limit, afterID), or None if neither parameter was passed (unpaginated).
+    @raises ValueError      If limit is not a positive int or the cursor is not valid.
+    """
+    limit = queryData.pop("limit", None)
+    cursor = queryData.pop("cursor", None)
+    if limit is None and cursor is None:
+        return None
+
+    if limit is None:
+        limit = settings.PAGE_SIZE_DEFAULT
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("Parameter 'limit' must be an int")
+    if limit < 1:
+        raise ValueError("Parameter 'limit' must be positive")
+    limit = min(limit, settings.PAGE_SIZE_MAX)
+
+    afterID = decodeCursor(cursor) if cursor else None
+    return limit, afterID
+
+
+def paginate(queryset, limit: int, afterID=None):
+    """
+    Gets one page of a queryset ordered by _id. Filtering on _id > last id (instead of skipping)
+    keeps every page as cheap as the first when an index ends in _id.
+
+    @param queryset      MongoEngine queryset (filters/projection/as_pymongo already applied).
+    @param limit      Max number of documents in the page.
+    @param afterID      ObjectId the page starts after, None for the first page.
+    @return      A tuple of (documents, nextCursor). nextCursor is None on the last page.
+    """
+    if afterID is not None:
+        queryset = queryset.filter(id__gt=afterID)
+
+    # One extra document tells whether there is a next page without a count
+    documents = list(queryset.order_by("id").limit(limit + 1))
+    if len(documents) <= limit:
+        return documents, None
+
+    documents = documents[:limit]
+    lastDocument = documents[-1]
+    lastID = lastDocument["_id"] if isinstance(lastDocument, dict) else lastDocument.id
+    return documents, encodeCursor(lastID)
@@ -0,0 +1,110 @@
+from django.conf import settings
+from pymongo import UpdateOne
+
+from api.models import Task
+
+
+# Digits in ASCII order, so ranks sort the same in Python and MongoDB (binary string comparison)
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+
+def rankBetween(before: str = None, after: str = None) -> str:
+    """
+    Makes a rank (Task.rank) that sorts strictly between two others, so a card can be moved
+    by only writing its own rank. Ranks never end with the lowest digit, so there is always room
+    before any rank.
+
+    @param before      Rank of the card before, None for the start of the column.
+    @param after      Rank of the card after, None for the end of the column.
+    @return      The new rank.
+    @raises ValueError      If before is not lower than after.
+    """
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"Rank {before!r} must be lower than {after!r}")
+
+    rank = ""
+    i = 0
+    while True:
+        low = DIGITS.index(before[i]) if before is not None and i < len(before) else 0
+        high = DIGITS.index(after[i]) if after is not None and i < len(after) else BASE
+
+        if high - low > 1:
+            return rank + DIGITS[(low + high) // 2]
+
+        # No digit strictly between: keep the lower one and look at the next position
+        rank += DIGITS[low]
+        if high > low:
+            after = None  # rank is now lower than after whatever comes next
+        i += 1
+
+
+def evenRanks(count: int) -> list:
+    """
+    Makes count ranks spaced evenly, leaving room between each (used to rebalance a column).
+
+    @param count      Number of ranks.
+    @return      Sorted list of ranks.
+    """
+    width = 2
+    while BASE**width < (count + 1) * BASE:
+        width += 1
+    step = BASE**width // (count + 1)
+
+    ranks = []
+    for i in range(1, count + 1):
+        value = i * step
+        digits = []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        # Trailing lowest digits do not change the order, drop them like rankBetween never makes them
+        ranks.append("".join(reversed(digits)).rstrip(DIGITS[0]))
+    return ranks
+
+
+def columnOrder(task: dict):
+    """
+    Sort key of a raw task document within its kanban column: by rank, then tasks without a
+    rank (new, or not migrated yet) by their old integer priority and creation.
+    """
+    rank = task.get("rank")
+    priority = task.get("priority")
+    return (
+        rank is None,
+        rank or "",
+        priority is None,
+        priority or 0,
+        task.get("_id"),
+    )
+
+
+def rebalanceColumn(projectID, statusID) -> int:
+    """
+    Gives every task of a kanban column a new, evenly spaced rank (keeping their order). Run when
+    ranks get longer than settings.RANK_MAX_LENGTH, and to migrate integer priorities to ranks.
+    A task moved while this runs keeps the rank it was moved to.
+
+    @param projectID      ObjectId of the project.
+    @param statusID      ObjectId of the status (None for tasks without a status).
+    @return      Number of tasks updated.
+    """
+    collection = Task._get_collection()
+    tasks = sorted(
+        collection.find(
+            {"projectID": projectID, "statusId": statusID}, {"rank": 1, "priority": 1}
+        ),
+        key=columnOrder,
+    )
+    operations = [
+        UpdateOne({"_id": task["_id"], "rank": task.get("rank")}, {"$set": {"rank": rank}})
+        for task, rank in zip(tasks, evenRanks(len(tasks)))
+        if task.get("rank") != rank
+    ]
+    if not operations:
+        return 0
+    return collection.bulk_write(operations, ordered=False).modified_count
+
+
+def needsRebalance(rank: str) -> bool:
+    return len(rank) > settings.RANK_MAX_LENGTH
@@ -18,6 +18,7 @@ class ProjectSerializer(DocumentSerializer):
     class Meta:
         model = Project
         fields = '__all__'
+        read_only_fields = ("statusVersion",)  # See api.views.v1.statuses
         # Default to all fields
 
     def create(self, validated_data):
@@ -33,6 +34,7 @@ class ProjectSerializer(DocumentSerializer):
         
     def update(self, instance, validated_data):
         # Extract the embedded document data
+        statusesWritten = 'taskStatuses' in validated_data
         status_data_list = validated_data.pop('taskStatuses', [])
         
         # Update the main document fields
@@ -62,6 +64,9 @@ class ProjectSerializer(DocumentSerializer):
         # Add the new embedded documents to the main document
         for status_data in status_data_list:
             instance.taskStatuses.append(Project.Status(**status_data))
+        if statusesWritten:
+            # Any write of taskStatuses (even an empty list) drops the cached statuses
+            instance.statusVersion = (instance.statusVersion or 0) + 1
         
         # Save the main document
         instance.save()
@@ -72,6 +77,7 @@ class TaskSerializer(DocumentSerializer):
     class Meta:
         model = Task
         # Default to all fields
+        read_only_fields = ("ancestors", "depth")  # Follow parentTaskID, see api.hierarchy
 
 class FeedbackSerializer(DocumentSerializer):
     class Meta:
@@ -82,3 +88,4 @@ class GeneratedTaskSerializer(serializers.Serializer):
     projectID = serializers.CharField(required=True)
     name = serializers.CharField(required=True)  # project name
     description = serializers.CharField(allow_blank=True, allow_null=True)
+    useCache = serializers.BooleanField(required=False, default=True)  # See api.llm.cachedStreamCompletion
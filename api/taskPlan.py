@@ -0,0 +1,127 @@
+import re
+from bson.objectid import ObjectId
+
+
+# "1. Task", "  1.2. Subtask", "1.2.3 Subtask" (not "2024 was...")
+TASK_LINE = re.compile(r"^\s*(\d+(?:\.\d+)+|\d+(?=\.))\.?\s+(.+?)\s*$")
+# "[30 minutes]", "[1.5 hours]", ...
+DURATION = re.compile(r"\s*\[(\d+(?:\.\d+)?)\s*(minute|hour|day|week)(?:s)?\]")
+MINUTES_PER_UNIT = {"minute": 1, "hour": 60, "day": 8 * 60, "week": 5 * 8 * 60}
+
+
+def parseTaskLine(line: str):
+    """
+    Parses one line of a generated plan.
+
+    @param line      Line of the completion, ex: "  1.2. Write the report [2 hours]".
+    @return      A tuple of (number path ex: ("1", "2"), name, duration in minutes or None), or
+        None if the line is not a task.
+    """
+    durationMinutes = None
+    duration = DURATION.search(line)
+    if duration:
+        durationMinutes = int(MINUTES_PER_UNIT[duration.group(2)] * float(duration.group(1)))
+        line = line[: duration.start()]
+
+    match = TASK_LINE.match(line)
+    if not match:
+        return None
+    return tuple(match.group(1).split(".")), match.group(2), durationMinutes
+
+
+class TaskPlanParser:
+    """
+    Turns a generated plan (numbered lines, see GeneratedTasksAPIView.generateTasks) into raw Task
+    documents while it is streamed: every complete line gives its task right away, linked to its
+    parent with ids made here, so tasks can be saved before the plan is finished.
+
+    @example:
+        parser = TaskPlanParser(root)
+        for text in streamCompletion(messages):
+            save(parser.feed(text))
+        save(parser.close())
+        updateDurations(parser.rollUpDurations())
+    """
+
+    def __init__(self, root: dict):
+        """
+        @param root      Raw document of the task every top level task goes under.
+        """
+        self.root = root
+        self._buffer = ""
+        self._tasks = {}  # number path -> raw task document (the last one if a number repeats)
+        self._allTasks = []  # In the order they were parsed, parents first
+        self._children = {root["_id"]: []}
+        self._ownMinutes = {}  # task id -> duration of the line
+
+    def feed(self, text: str) -> list:
+        """
+        @param text      Next chunk of the completion.
+        @return      Raw documents of the tasks completed by this chunk, parents first.
+        """
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        return self._parseLines(lines)
+
+    def close(self) -> list:
+        """
+        @return      Raw document of the last task, if the completion did not end with a newline.
+        """
+        lines, self._buffer = [self._buffer], ""
+        return self._parseLines(lines)
+
+    def _parseLines(self, lines: list) -> list:
+        tasks = []
+        for line in lines:
+            parsed = parseTaskLine(line)
+            if parsed is None:
+                continue
+            path, name, durationMinutes = parsed
+
+            # Closest listed ancestor ("1.2.3" goes under "1.2", or "1" if "1.2" was skipped)
+            parent = self.root
+            for end in range(len(path) - 1, 0, -1):
+                if path[:end] in self._tasks:
+                    parent = self._tasks[path[:end]]
+                    break
+
+            ancestors = parent["ancestors"] + [parent["_id"]]
+            task = {
+                "_id": ObjectId(),
+                "projectID": self.root["projectID"],
+                "parentTaskID": parent["_id"],
+                "ancestors": ancestors,
+                "depth": len(ancestors),
+                "name": name,
+                "durationMinutes": durationMinutes or 0,
+            }
+            self._tasks[path] = task
+            self._allTasks.append(task)
+            self._children[parent["_id"]].append(task)
+            self._children[task["_id"]] = []
+            self._ownMinutes[task["_id"]] = durationMinutes or 0
+            tasks.append(task)
+        return tasks
+
+    @property
+    def topLevelTasks(self) -> list:
+        return self._children[self.root["_id"]]
+
+    def rollUpDurations(self) -> dict:
+        """
+        Sets the durations once the whole plan is known: a task with subtasks takes as long as
+        all of them together (its own estimate is only used if they have none), like the root.
+        Updates the documents returned by feed/close.
+
+        @return      Dict of task id to duration in minutes, for the root and every task whose
+            duration changed since it was returned (so since it was saved).
+        """
+        changed = {}
+        # Children come after their parents, so sum them bottom up without recursion
+        for task in reversed([self.root, *self._allTasks]):
+            subtaskMinutes = sum(child["durationMinutes"] for child in self._children[task["_id"]])
+            minutes = subtaskMinutes or self._ownMinutes.get(task["_id"], 0)
+            if task is self.root or minutes != task["durationMinutes"]:
+                task["durationMinutes"] = minutes
+                changed[task["_id"]] = minutes
+        return changed
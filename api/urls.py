@@ -28,11 +28,21 @@ urlpatterns = [
         views.tasks.TasksAPIView.as_view(),
         name=f"{API_VERSION}-tasks-list",
     ),
+    path(
+        f"{API_VERSION}/tasks/export/",
+        views.taskExport.TaskExportAPIView.as_view(),
+        name=f"{API_VERSION}-tasks-export",
+    ),
     path(
         f"{API_VERSION}/generatedTasks/",
         views.generatedTasks.GeneratedTasksAPIView.as_view(),
         name=f"{API_VERSION}-generated-tasks",
     ),
+    path(
+        f"{API_VERSION}/generatedTasks/<str:jobID>/",
+        views.generatedTasks.GenerationJobAPIView.as_view(),
+        name=f"{API_VERSION}-generated-tasks-job",
+    ),
     path(
         f"{API_VERSION}/kanban/",
         views.kanban.KanbanAPIView.as_view(),
@@ -42,6 +52,11 @@ urlpatterns = [
         f"{API_VERSION}/feedback/",
         views.feedback.FeedbackAPIView.as_view(),
         name=f"{API_VERSION}-feedback"
+    ),
+    path(
+        f"{API_VERSION}/metrics/",
+        views.metrics.MetricsAPIView.as_view(),
+        name=f"{API_VERSION}-metrics"
     )
 ]
 
@@ -1,7 +1,89 @@
 import os
+import threading
 import jwt
+import mongoengine as mongo
 from dotenv import load_dotenv
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
+from django.core.exceptions import ImproperlyConfigured
+
+
+class Keyring:
+    """
+    Holds the secrets used to sign API keys (JWT) and to encrypt them at rest (Fernet).
+    Built once per process (see getKeyring) instead of re-reading the .env on every call.
+
+    To rotate keys without downtime, set API_SECRET to the new secret and add the old one to
+    API_SECRET_PREVIOUS (comma separated). New keys are signed/encrypted with API_SECRET, while
+    keys made with a previous secret still decode/decrypt.
+    """
+
+    def __init__(self, secret: str, previousSecrets: list = None):
+        """
+        @param secret      Current secret (32 url-safe base64-encoded bytes).
+        @param previousSecrets      Older secrets that are still accepted.
+        """
+        self.jwtSecrets = [secret, *(previousSecrets or [])]
+        self.fernet = MultiFernet(
+            [Fernet(toFernetKey(jwtSecret)) for jwtSecret in self.jwtSecrets]
+        )
+
+    @property
+    def jwtSecret(self) -> str:
+        return self.jwtSecrets[0]
+
+    @classmethod
+    def fromEnvironment(cls):
+        """
+        Builds a keyring from API_SECRET and API_SECRET_PREVIOUS.
+
+        @return      A new Keyring.
+        """
+        load_dotenv()
+        secret = os.getenv("API_SECRET")
+        if not secret:
+            raise ImproperlyConfigured("API_SECRET is not set.")
+        previousSecrets = [
+            previous.strip()
+            for previous in os.getenv("API_SECRET_PREVIOUS", "").split(",")
+            if previous.strip()
+        ]
+        return cls(secret, previousSecrets)
+
+
+_keyring = None
+_keyringLock = threading.Lock()
+
+
+def toFernetKey(secret: str) -> bytes:
+    """
+    .Env does NOT read "=" properly but fernet requires it, so re-adds the base64 padding.
+
+    @param secret      The secret as read from the environment.
+    @return      The secret as a Fernet key.
+    """
+    secret = secret.rstrip("=")
+    return (secret + "=" * (-len(secret) % 4)).encode()
+
+
+def loadKeyring() -> Keyring:
+    """
+    (Re)builds the process keyring from the environment. Called at startup by ApiConfig.ready().
+
+    @return      The new keyring.
+    """
+    global _keyring
+    with _keyringLock:
+        _keyring = Keyring.fromEnvironment()
+    return _keyring
+
+
+def getKeyring() -> Keyring:
+    """
+    Gets the process keyring, building it on first use.
+
+    @return      The keyring.
+    """
+    return _keyring or loadKeyring()
 
 
 def getAuthorizationToken(request) -> str:
@@ -27,14 +109,11 @@ def createEncodedApiKey(userID: str) -> str:
     @param userID: The user ID for to encode.
     @return: The encoded API key for the user
     """
-
-    load_dotenv()
-    secretKey = os.getenv("API_SECRET")
     payload = {
         "userID": userID,
     }
 
-    encodedApiKey = jwt.encode(payload, secretKey, algorithm="HS256")
+    encodedApiKey = jwt.encode(payload, getKeyring().jwtSecret, algorithm="HS256")
     return encodedApiKey
 
 
@@ -49,10 +128,16 @@ def decodeApiKey(apiKey: str) -> str:
     @example:
         userID = decodeApiKey("1234").get("userID")
     """
-    load_dotenv()
-    secretKey = os.getenv("API_SECRET")
+    *otherSecrets, lastSecret = getKeyring().jwtSecrets
+
+    # Keys signed before a rotation only match a previous secret, so try each in turn
+    for secretKey in otherSecrets:
+        try:
+            return jwt.decode(apiKey, secretKey, algorithms=["HS256"])
+        except jwt.InvalidSignatureError:
+            continue
 
-    decodedApiKey = jwt.decode(apiKey, secretKey, algorithms=["HS256"])
+    decodedApiKey = jwt.decode(apiKey, lastSecret, algorithms=["HS256"])
 
     return decodedApiKey
 
@@ -64,11 +149,7 @@ def encryptApiKey(apiKey: str) -> str:
     @param apiKey: The unencrypted API key to be encrypted.
     @return: The encrypted API key as a string.
     """
-    fernetSecretKey = (
-        os.getenv("API_SECRET") + "="
-    )  # .Env does NOT read "=" properly but fernet requires it
-    fernet = Fernet(fernetSecretKey.encode())
-    encryptedApiKey = fernet.encrypt(apiKey.encode()).decode()
+    encryptedApiKey = getKeyring().fernet.encrypt(apiKey.encode()).decode()
 
     return encryptedApiKey
 
@@ -80,10 +161,68 @@ def decryptApiKey(apiKey: str) -> str:
     @param apiKey: The encrypted API key that needs to be decrypted.
     @return: The decrypted API key as a string (still is encoded w/ jwt).
     """
-    fernetSecretKey = (
-        os.getenv("API_SECRET") + "="
-    )  # .Env does NOT read "=" properly but fernet requires it
-    fernet = Fernet(fernetSecretKey.encode())
-    decryptedApiKey = fernet.decrypt(apiKey).decode()
+    decryptedApiKey = getKeyring().fernet.decrypt(apiKey).decode()
 
     return decryptedApiKey
+
+
+def popFieldsParameter(queryData: dict, model) -> list:
+    """
+    Removes the 'fields' parameter (ex: "id,name,parentTaskID") from query data and checks every
+    field exists on the model. "id" is always included.
+
+    @param queryData      Dict of query parameters. 'fields' may be a comma separated str or a list.
+    @param model      MongoEngine document class the fields belong to.
+    @return      List of field names, or None if no 'fields' parameter was passed.
+    @raises ValueError      If a field does not exist on the model.
+    """
+    fields = queryData.pop("fields", None)
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+
+    fields = [field.strip() for field in fields if field.strip()]
+    unknownFields = [field for field in fields if field not in model._fields]
+    if unknownFields:
+        raise ValueError(f"Unknown field(s): {', '.join(unknownFields)}")
+
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+
+def toMongoValues(model, data: dict):
+    """
+    Validates and converts field values to what MongoDB stores (ex: for a $set), using the model's
+    MongoEngine fields directly instead of building a document or a serializer.
+
+    @param model      MongoEngine document class.
+    @param data      Dict of field name to value (ex: from a request). Must not contain 'id'.
+    @return      A tuple of (values, errors). values maps db field names to the converted values,
+        errors maps field names to a list of error messages (empty if all are valid).
+    """
+    values = {}
+    errors = {}
+    for name, value in data.items():
+        field = model._fields.get(name)
+        if field is None or name == model._meta.get("id_field"):
+            errors[name] = ["Unknown or read only field."]
+            continue
+
+        if value is None:
+            if field.null:
+                values[field.db_field] = None
+            else:
+                errors[name] = ["This field may not be null."]
+            continue
+
+        try:
+            value = field.to_python(value)
+            field.validate(value)
+        except (mongo.ValidationError, TypeError, ValueError) as e:
+            errors[name] = [str(e)]
+            continue
+        values[field.db_field] = field.to_mongo(value)
+
+    return values, errors
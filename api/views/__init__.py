@@ -1 +1 @@
-from .v1 import users, projects, tasks, generatedTasks, kanban, feedback, statuses
+from .v1 import users, projects, tasks, taskExport, generatedTasks, kanban, feedback, statuses, metrics
@@ -8,7 +8,8 @@ from django.core.exceptions import ObjectDoesNotExist
 from api.decorators import apiKeyRequired
 from api.serializers import FeedbackSerializer
 from api.models import Feedback
-from api.utils import getAuthorizationToken, decodeApiKey
+from api.auth import getAuthContext
+from api.pagination import popPaginationParameters, paginate
 
 
 @method_decorator(
@@ -34,15 +35,19 @@ class FeedbackAPIView(APIView):
                 - taskID (objectID str)
                 or
                 - userID (objectID str)
+            Optional:
+                - limit (int) Max number of feedback objects per page. Paginates the response.
+                - cursor (str) The 'next' value of the previous page. Paginates the response.
 
         @return A Response object containing a JSON array of serialized  objects that
-        match the query parameters.
+        match the query parameters. If paginated, {"results": [...], "next": cursor or null}.
 
         @example Javascript:
             fetch('quayside.app/api/v1/feedback?userIDs=1234');
+            fetch('quayside.app/api/v1/feedback?projectID=1234&limit=50');
         """
         responseData, httpStatus = self.getFeedback(
-            request.query_params.dict(), getAuthorizationToken(request)
+            request.query_params.dict(), getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -55,7 +60,6 @@ class FeedbackAPIView(APIView):
                 - userID (objectID str) [OPTIONAL]
                 - projectID (objectID str)
                 - taskID (objectID str) [OPTIONAL]
-        @param {str} authorizationToken - JWT authorization token.
 
         @return A Response object containing a JSON array of the created feedback object.
 
@@ -69,7 +73,7 @@ class FeedbackAPIView(APIView):
 
         """
         responseData, httpStatus = self.createFeedback(
-            request.data, getAuthorizationToken(request)
+            request.data, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -98,35 +102,46 @@ class FeedbackAPIView(APIView):
         """
 
         responseData, httpStatus = self.deleteFeedback(
-            request.query_params, getAuthorizationToken(request)
+            request.query_params, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
     @staticmethod
-    def getFeedback(feedbackData, authorizationToken):
+    def getFeedback(feedbackData, authContext):
         """
         Service API function that can be called internally as well as through the API to get
         project data based on input data.
 
         @param feedbackData      Dict for a singular feedback object.
-        @param authorizationToken      JWT authorization token.
+            May contain 'limit' and/or 'cursor' to get one page as {"results": [...], "next": cursor}.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
         #TODO: use auth token to check if user is admin
+        try:
+            page = popPaginationParameters(feedbackData)
+        except ValueError as e:
+            return {"message": str(e)}, status.HTTP_400_BAD_REQUEST
 
         try:
-            if len(feedbackData) == 1:
+            if len(feedbackData) != 1:
                 return { "message": "Need to have ONLY a id, taskID, or projectID property." }, status.HTTP_400_BAD_REQUEST
             
-            feedback_objs = []
+            feedback_objs = Feedback.objects.none()
 
             if "id" in feedbackData:  
-                feedback_objs = Feedback.objects.get(id=feedbackData["id"])  
+                feedback_objs = Feedback.objects.filter(id=feedbackData["id"])  
             elif "taskID" in feedbackData:  
                 feedback_objs = Feedback.objects.filter(taskID=feedbackData["taskID"])  
             elif "projectID" in feedbackData:  
                 feedback_objs = Feedback.objects.filter(projectID=feedbackData["projectID"])  
 
+            if page:
+                feedback_objs, nextCursor = paginate(feedback_objs, *page)
+                serializer = FeedbackSerializer(feedback_objs, many=True)
+                return {"results": serializer.data, "next": nextCursor}, status.HTTP_200_OK
+
+            feedback_objs = list(feedback_objs)
             if not feedback_objs:
                 return {
                     "message": "No feedback was found or you do not have authorization."
@@ -138,17 +153,17 @@ class FeedbackAPIView(APIView):
             return {"message": e}, status.HTTP_500_INTERNAL_SERVER_ERROR
 
     @staticmethod
-    def createFeedback(feedbackData, authorizationToken):
+    def createFeedback(feedbackData, authContext):
         """
         Service API function that can be called internally as well as through the API to create
         feedback based on input data.
 
         @param feedbackData      Dict for a single feedback dict.
-        @param authorizationToken      JWT authorization token.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
 
-        userID = decodeApiKey(authorizationToken).get("userID")
+        userID = authContext.userID
         if "userID" in feedbackData and feedbackData["userID"] != userID:
             return { "message": "Not authorized to create feedback." }, status.HTTP_401_UNAUTHORIZED
 
@@ -166,12 +181,12 @@ class FeedbackAPIView(APIView):
         return {"message":serializer.errors}, status.HTTP_400_BAD_REQUEST
 
     @staticmethod
-    def deleteFeedback(feedbackData, authorizationToken):
+    def deleteFeedback(feedbackData, authContext):
         """
         Service API function that can be called internally as well as through the API to delete feedback.
 
         @param feedbackData      Dict for a singular feedback object
-        @param authorizationToken      JWT authorization token.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
         #TODO: make use auth token to check if user is admin
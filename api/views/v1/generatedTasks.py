@@ -1,17 +1,23 @@
-import os
-import re
-import sys
-from dotenv import load_dotenv
-import openai
+import time
+from datetime import datetime, timedelta, timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
 from django.utils.decorators import method_decorator
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne
 
+from api.models import Task, GenerationJob
 from api.serializers import GeneratedTaskSerializer
-from api.views.v1.tasks import TasksAPIView
+from api.encoders import getEncoder
+from api.llm import cachedStreamCompletion
+from api.taskPlan import TaskPlanParser
+from api.hierarchy import subtreeFilter, removeFromSubtree
 from api.decorators import apiKeyRequired
-from api.utils import getAuthorizationToken
+from api.auth import getAuthContext
+from api import background
 
 
 # Dispatch protects all HTTP requests coming in
@@ -23,38 +29,117 @@ class GeneratedTasksAPIView(APIView):
 
     def post(self, request):
         """
-        Generate and saves tasks for a project.
+        Starts generating and saving tasks for a project in the background.
         Requires 'apiToken' passed in auth header or cookies.
 
         @param {HttpRequest} request - The request object.
             The request body should include:
             - name: A string with the name/description of the project.
             - projectID: A string of the project ID.
+            - useCache: Optional, false to generate new tasks even if the same project was
+              generated before (by default the saved answer is reused, see api.llm).
 
-        @returns {Response} - A Response object containing a JSON array of serialized Task objects.
+        @returns {Response} - A Response object containing {"jobID", "status"} (HTTP 202). Poll
+            GET generatedTasks/<jobID>/ until its status is "done" or "failed".
 
 
         @example Javascript:
 
-            fetch('quayside.app/api/v1/GeneratedTasks', {
+            fetch('quayside.app/api/v1/generatedTasks/', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ name: 'New Project', projectID: '12345' }),
             });
         """
-        responseData, httpStatus = self.generateTasks(
-            request.data, getAuthorizationToken(request)
+        responseData, httpStatus = self.startGeneration(
+            request.data, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
     @staticmethod
-    def generateTasks(projectData, authorizationToken):
+    def startGeneration(projectData, authContext):
+        """
+        Service API function that can be called internally as well as through the API to start
+        a task generation job (see generateTasks) on the process' "generation" pool, so no request
+        waits for OpenAI.
+
+        @param projectData      Dict that requires 'name' and 'projectID' keys.
+        @param authContext      AuthContext of the requesting user.
+        @return      A tuple of ({"jobID", "status"}, http_status).
+        """
+        serializer = GeneratedTaskSerializer(data=projectData)
+        if not serializer.is_valid():
+            return {"message": serializer.errors}, status.HTTP_400_BAD_REQUEST
+
+        projectData = dict(serializer.validated_data)
+        try:
+            projectID = ObjectId(projectData["projectID"])
+        except InvalidId:
+            return {"message": "Parameter 'projectID' must be an objectId"}, status.HTTP_400_BAD_REQUEST
+
+        if not authContext.canAccessProject(projectID):
+            return {
+                "message": "User not authorized to create task(s) for this project"
+            }, status.HTTP_403_FORBIDDEN
+
+        job = GenerationJob(projectID=projectID, userID=ObjectId(authContext.userID))
+        job.save()
+        background.submitTo(
+            "generation", GeneratedTasksAPIView.runGenerationJob, job.id, projectData, authContext
+        )
+        return {"jobID": str(job.id), "status": job.status}, status.HTTP_202_ACCEPTED
+
+    @staticmethod
+    def runGenerationJob(jobID, projectData, authContext):
+        """
+        Runs generateTasks for a job and records the outcome on the job. Runs in a background
+        thread.
+
+        @param jobID      ObjectId of the GenerationJob.
+        @param projectData      Dict passed to generateTasks.
+        @param authContext      AuthContext of the user who started the job.
+        """
+        collection = GenerationJob._get_collection()
+        started = collection.update_one(
+            {"_id": jobID, "status": "pending"},
+            {"$set": {"status": "running", "startedAt": datetime.now(timezone.utc)}},
+        )
+        if not started.matched_count:
+            return  # Timed out while pending (see getGenerationJob)
+
+        def onProgress(taskCount):
+            collection.update_one({"_id": jobID}, {"$set": {"taskCount": taskCount}})
+
+        # Only while running, so a job reported as timed out stays failed
+        def finish(values):
+            values["finishedAt"] = datetime.now(timezone.utc)
+            collection.update_one({"_id": jobID, "status": "running"}, {"$set": values})
+
+        try:
+            data, httpsCode = GeneratedTasksAPIView.generateTasks(
+                projectData, authContext, onProgress
+            )
+        except Exception as e:
+            finish({"status": "failed", "error": str(e)})
+            raise
+
+        if httpsCode == status.HTTP_201_CREATED:
+            finish({"status": "done"})  # taskCount is already up to date (onProgress)
+        else:
+            finish({"status": "failed", "error": str(data.get("message"))})
+
+    @staticmethod
+    def generateTasks(projectData, authContext, onProgress=None):
         """
         Service API function that can be called internally as well as through the API to generate
-        and save tasks.
-        @param {dict} projectData -  Requires 'name' and 'projectID' keys.
-        @param authorizationToken      JWT authorization token.
-        @returns {tuple} - A tuple containing the list of created tasks and the HTTP status code.
+        and save tasks. The completion is streamed and tasks are saved as their lines arrive.
+        @param {dict} projectData -  Requires 'name' and 'projectID' keys, 'useCache' (default
+            True) reuses the saved completion of an identical request.
+        @param authContext      AuthContext of the requesting user.
+        @param onProgress      Optional function called with the number of tasks saved so far
+            after every write.
+        @returns {tuple} - A tuple containing the root and top level tasks (only the top level task
+            if there is one, it is the root then) and the HTTP status code.
         """
 
         # Check
@@ -63,21 +148,54 @@ class GeneratedTasksAPIView(APIView):
             return {"message":serializer.errors}, status.HTTP_400_BAD_REQUEST
 
         projectName = serializer.validated_data["name"]
-        projectID = serializer.validated_data["projectID"]
+        try:
+            projectID = ObjectId(serializer.validated_data["projectID"])
+        except InvalidId:
+            return {"message": "Parameter 'projectID' must be an objectId"}, status.HTTP_400_BAD_REQUEST
+
+        # Checked once here, the tasks are saved directly (not through TasksAPIView.createTasks)
+        if not authContext.canAccessProject(projectID):
+            return {
+                "message": "User not authorized to create task(s) for this project"
+            }, status.HTTP_403_FORBIDDEN
+
         projectDescription = serializer.validated_data["description"]
-        totalProjectMinutes = 0
-
-        # Load ChatGPT creds
-        load_dotenv()
-        openai.api_key = os.getenv("CHATGPT_API_KEY")
-
-        # Call ChatGPT
-        completion = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an assistant for quayside.app, a project management team. 
+
+        # Generated tasks go under a root task named after the project (ids are made here so the
+        # tree is linked up front). The number of top level tasks is only known at the end, so the
+        # root is always saved first and removed if there is only one (it becomes the root)
+        root = {
+            "_id": ObjectId(),
+            "projectID": projectID,
+            "parentTaskID": None,
+            "ancestors": [],
+            "depth": 0,
+            "name": projectName,
+            "durationMinutes": 0,
+        }
+        parser = TaskPlanParser(root)
+        collection = Task._get_collection()
+
+        # Save the tasks as their lines arrive, batched so there is at most one write every
+        # GENERATION_FLUSH_SECONDS (the first one right away)
+        pending = [root]
+        saved = 0
+        lastFlush = 0
+
+        def flush():
+            nonlocal pending, saved, lastFlush
+            if pending:
+                collection.insert_many(pending)
+                saved += len(pending)
+                pending = []
+                if onProgress:
+                    onProgress(saved)
+            lastFlush = time.monotonic()
+
+        messages = [
+            {
+                "role": "system",
+                "content": """You are an assistant for quayside.app, a project management team. 
                     You are given as input a project or task that a single person or a team 
                     wants to take on. Divide the task into as many subtasks as are needed and list them 
                     hierarchically in the format where task 1 has subtasks 1.1, 1.2,...
@@ -86,143 +204,143 @@ class GeneratedTasksAPIView(APIView):
                     provide a time estimation in minutes in square brackets with the label "minutes". Do not give a minute range.
                     Make sure that every task is on one line after the number and has a time estimation. 
                     NEVER create new paragraphs within a task or subtask.
-                    """,
-                },
-                {"role": "user", "content": f"Project Name: {projectName}\nProject Description: {projectDescription}"},
-            ],
-            temperature=0,
-            max_tokens=1024,
-            top_p=1,
-            frequency_penalty=0,
-            presence_penalty=0,
-        )
-
-        generatedString = completion.choices[0].message.content
-
-
-        # Parse response into tasks with durations
-        newTasks = []
-        lines = generatedString.split("\n")
-
-        degreeOfSeparation = 1
-        subtasks = []
-
-        for line in reversed(lines):
-            strDuration = re.search(r"\[(\d+(?:\.\d+)?)\s*(minute|hour|day|week)(?:s)?\]", line) # parses duration from text between brackets returned by OpenAI
-
-            # minimum minutes
-            durationMinutes = 0
-            if strDuration:
-                line = line[0 : line.rfind(" [")]
-
-            primaryTaskMatch = re.match(r"^(\d+)\.\s(.+)", line)
-            subTaskMatch = re.match(r"^\s+(\d+\.(\d+|\d+\.)+)?\s(.+)", line)
-            
-            if strDuration:
-                type = strDuration.group(2)
-
-                if type.find("week") != -1:
-                    durationMinutes = int(5 * 8 * 60 * float(strDuration.group(1)))
-                elif type.find("day") != -1:
-                    durationMinutes = int(8 * 60 * float(strDuration.group(1)))
-                elif type.find("hour") != -1:
-                    durationMinutes = int(60 * float(strDuration.group(1)))
-                else:
-                    durationMinutes = int(strDuration.group(1))
-
-            if primaryTaskMatch or subTaskMatch:
-                allTaskNumbers = (subTaskMatch[1] if subTaskMatch else primaryTaskMatch[1]).split(".")
-
-                if (allTaskNumbers[-1] == ""):
-                    allTaskNumbers.pop(-1)
-
-            if subTaskMatch:
-                if degreeOfSeparation == 1:
-                    degreeOfSeparation = len(allTaskNumbers)
-
-                subTaskText = subTaskMatch[3]
-                
-                currentSubtask = {
-                    "id": allTaskNumbers[-1],
-                    "name": subTaskText,
-                    "parent": allTaskNumbers[-2],
-                    "durationMinutes": durationMinutes
-                }
-
-                if degreeOfSeparation > len(allTaskNumbers) or degreeOfSeparation == 1:
-                    degreeOfSeparation = len(allTaskNumbers) # aka degreeOfSeparation -= 1
-
-                    totalMinutes = 0
-                    for task in subtasks:
-                        totalMinutes += task["durationMinutes"]
-
-                    currentSubtask["durationMinutes"] = totalMinutes
-                    currentSubtask["subtasks"] = subtasks[:]
-                    subtasks.clear()
-
-                subtasks.insert(0, currentSubtask)
-                    
-            elif primaryTaskMatch:
-                taskText = primaryTaskMatch[2]
-
-                totalMinutes = 0
-                for task in subtasks:
-                    totalMinutes += task["durationMinutes"]
-                    
-                totalProjectMinutes += totalMinutes if totalMinutes > 0 else durationMinutes
-                
-                newTasks.insert(0, 
-                    {
-                        "id": allTaskNumbers[0],
-                        "name": taskText,
-                        "parent": "root",
-                        "durationMinutes": totalMinutes if totalMinutes > 0 else durationMinutes,
-                        "subtasks": subtasks[:],
-                    }
-                )
-
-                subtasks.clear()
-
-        # Save tasks
-
-        # Function for Parsing Tasks. TODO: do this in 1 db write??
-        def parseTask(task: dict, parentID: str, projectID: str):
-            data, httpsCode = TasksAPIView.createTasks(
-                {
-                    "projectID": projectID,
-                    "parentTaskID": parentID,
-                    "name": task["name"],
-                    "durationMinutes": task["durationMinutes"]
-                },
-                authorizationToken,
+                """,
+            },
+            {"role": "user", "content": f"Project Name: {projectName}\nProject Description: {projectDescription}"},
+        ]
+
+        # Call ChatGPT, parsing the answer while it streams
+        try:
+            for text in cachedStreamCompletion(
+                messages,
+                useCache=serializer.validated_data["useCache"],
+                model="gpt-3.5-turbo",
+                temperature=0,
+                max_tokens=1024,
+                top_p=1,
+                frequency_penalty=0,
+                presence_penalty=0,
+            ):
+                pending.extend(parser.feed(text))
+                if pending and time.monotonic() - lastFlush >= settings.GENERATION_FLUSH_SECONDS:
+                    flush()
+            pending.extend(parser.close())
+            flush()
+
+            # Parents take as long as their subtasks, only known at the end
+            durations = parser.rollUpDurations()
+            collection.bulk_write(
+                [
+                    UpdateOne({"_id": taskID}, {"$set": {"durationMinutes": minutes}})
+                    for taskID, minutes in durations.items()
+                ],
+                ordered=False,
             )
-            if httpsCode != status.HTTP_201_CREATED:
-                return data, httpsCode
-            taskData = data[0]
-            if "subtasks" in task:
-                for subtask in task["subtasks"]:
-                    parseTask(subtask, taskData["id"], projectID)
-            return taskData
 
-        createdTasks = []
+            topLevelTasks = parser.topLevelTasks
+            if len(topLevelTasks) == 1:
+                GeneratedTasksAPIView.promoteToRoot(topLevelTasks[0], root)
+                createdTasks = topLevelTasks
+            else:
+                createdTasks = [root, *topLevelTasks]
+        except Exception:
+            # Do not leave a partial tree behind (OpenAI dropped the stream, a write failed...),
+            # a retry makes a new root
+            collection.delete_many(subtreeFilter(root["_id"]))
+            raise
 
-        # Create a root task if one does not exist
-        rootID = None
-        if len(newTasks) != 1:
-            data, httpsCode = TasksAPIView.createTasks(
+        return getEncoder(Task).encodeMany(createdTasks), status.HTTP_201_CREATED
 
-                {"projectID": projectID, "name": projectName, "durationMinutes": totalProjectMinutes}, authorizationToken
+    @staticmethod
+    def promoteToRoot(task, root):
+        """
+        Replaces the generated root by its only top level task: the task (saved, like its
+        subtree) gets no parent and the root is deleted.
 
-            )
-            if httpsCode != status.HTTP_201_CREATED:
-                return data, httpsCode
-            taskData = data[0]
+        @param task      Raw document of the top level task, updated too.
+        @param root      Raw document of the generated root.
+        """
+        collection = Task._get_collection()
+        collection.update_one({"_id": task["_id"]}, {"$set": {"parentTaskID": None}})
+        collection.delete_one({"_id": root["_id"]})
+        # Last, so a failure before it still leaves the whole tree under subtreeFilter(root)
+        removeFromSubtree(root["_id"])
+        task.update({"parentTaskID": None, "ancestors": [], "depth": 0})
 
-            rootID = taskData["id"]
-            createdTasks.append(taskData)
 
-        for task in newTasks:
-            taskData = parseTask(task, rootID, projectID)
-            createdTasks.append(taskData)
+# Dispatch protects all HTTP requests coming in
+@method_decorator(apiKeyRequired, name="dispatch")
+class GenerationJobAPIView(APIView):
+    """
+    Progress of a task generation job started by GeneratedTasksAPIView. Requires apiKey.
+    """
+
+    def get(self, request, jobID):
+        """
+        Gets the progress of a task generation job. Requires 'apiToken' passed in auth header or
+        cookies.
+
+        @param {HttpRequest} request - The request object.
+        @param {str} jobID - The job id returned by POST.
+
+        @returns {Response} - A Response object containing the job: id, projectID, status
+            ("pending", "running", "done" or "failed"), taskCount, error, createdAt, startedAt,
+            finishedAt.
+
+        @example Javascript:
 
-        return createdTasks, status.HTTP_201_CREATED
+            fetch('quayside.app/api/v1/generatedTasks/1234/');
+        """
+        responseData, httpStatus = self.getGenerationJob(
+            {"id": jobID}, getAuthContext(request)
+        )
+        return Response(responseData, status=httpStatus)
+
+    @staticmethod
+    def getGenerationJob(jobData, authContext):
+        """
+        Service API function that can be called internally as well as through the API to get
+        a task generation job.
+
+        @param jobData      Dict with the job 'id'.
+        @param authContext      AuthContext of the requesting user.
+        @return      A tuple of (response_data, http_status).
+        """
+        try:
+            job = GenerationJob._get_collection().find_one({"_id": ObjectId(jobData["id"])})
+        except (KeyError, TypeError, InvalidId):
+            return {"message": "Parameter 'id' must be an objectId"}, status.HTTP_400_BAD_REQUEST
+
+        if job is None or not authContext.canAccessProject(job["projectID"]):
+            return {"message": "Generation job not found"}, status.HTTP_404_NOT_FOUND
+
+        if GenerationJobAPIView.timedOut(job):
+            # The process running the job died (jobs only live in memory while they run). Saved,
+            # unless the job moved on meanwhile, so later polls (and the job) agree
+            values = {"status": "failed", "error": "Task generation timed out",
+                      "finishedAt": datetime.now(timezone.utc)}
+            job = GenerationJob._get_collection().find_one_and_update(
+                {"_id": job["_id"], "status": job["status"]},
+                {"$set": values},
+                return_document=ReturnDocument.AFTER,
+            ) or GenerationJob._get_collection().find_one({"_id": job["_id"]})
+
+        return getEncoder(GenerationJob).encode(job), status.HTTP_200_OK
+
+    @staticmethod
+    def timedOut(job) -> bool:
+        """
+        @param job      Raw GenerationJob document.
+        @return      True if the job is running for longer than GENERATION_JOB_TIMEOUT_SECONDS,
+            or still waiting for a thread GENERATION_JOB_PENDING_TIMEOUT_SECONDS after it was made.
+        """
+        if job["status"] == "running":
+            since = job.get("startedAt") or job["createdAt"]
+            seconds = settings.GENERATION_JOB_TIMEOUT_SECONDS
+        elif job["status"] == "pending":
+            since = job["createdAt"]
+            seconds = settings.GENERATION_JOB_PENDING_TIMEOUT_SECONDS
+        else:
+            return False
+        elapsed = datetime.now(timezone.utc) - since.replace(tzinfo=timezone.utc)
+        return elapsed > timedelta(seconds=seconds)
@@ -3,13 +3,16 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.utils.decorators import method_decorator
 
-from api.models import Task
-from api.serializers import TaskSerializer
+from api.models import Project, Task
+from api.encoders import getEncoder
 from api.decorators import apiKeyRequired
-from api.views.v1.tasks import TasksAPIView
 from api.views.v1.statuses import StatusesAPIView
-from api.utils import getAuthorizationToken
+from api.auth import getAuthContext
+from api.ranking import rankBetween, columnOrder, rebalanceColumn, needsRebalance
+from api import background
+from api.utils import toMongoValues
 from bson.objectid import ObjectId
+from pymongo import UpdateOne
 
 
 @method_decorator(apiKeyRequired, name="dispatch")
@@ -32,6 +35,7 @@ class KanbanAPIView(APIView):
         @param {HttpRequest} request - The request object.
             Query Parameters:
                 - projectID (objectId str)
+                - limit (int) Max number of tasks returned per column (taskCounts has the totals).
 
 
         @return: A Response object containing projects tasks grouped by status.
@@ -52,14 +56,17 @@ class KanbanAPIView(APIView):
                     [taskObject, taskObject, taskObject, taskObject],
                     # tasks that have a statusId of 444
                     [taskObject, taskObject, taskObject, taskObject]
-                ]
+                ],
+                # number of tasks in each column (more than in taskLists if limit was passed)
+                "taskCounts": [4, 4, 4]
             }
         
         @example Javascript:
 
             fetch('quayside.app/api/v1/kanban?projectID=1234');
+            fetch('quayside.app/api/v1/kanban?projectID=1234&limit=50');
         """
-        responseData, httpStatus = self.getKanban(request.query_params, getAuthorizationToken(request))
+        responseData, httpStatus = self.getKanban(request.query_params, getAuthContext(request))
         return Response(responseData, status=httpStatus)
     
     def put(self, request):
@@ -68,11 +75,10 @@ class KanbanAPIView(APIView):
         Requires 'apiToken' passed in auth header or cookies.
 
         @param {HttpRequest} request - The request object.
-            The request body can contain:
+            The request body must contain:
                 - id (objectId str) [REQUIRED]
-                - name (str)
-                - order (int)
-                - color (str)
+                - statusId (objectId str) [REQUIRED] Status (column) the task moves to.
+                - priority (int or null) [REQUIRED] Position in the column, null for the end.
 
         @return: A response object with the changes made or an error message
         
@@ -81,91 +87,79 @@ class KanbanAPIView(APIView):
             fetch('quayside.app/api/v1/kanban', {
                 method: 'PUT',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({id: '1234', status: 'Todo', order: 4})
+                body: JSON.stringify({id: '1234', statusId: '5678', priority: 4})
             })
 
         """
-        responseData, httpStatus = self.updateKanban(request.data)
+        responseData, httpStatus = self.updateKanban(request.data, getAuthContext(request))
         return Response(responseData, status=httpStatus)
     
     @staticmethod
-    def getKanban(taskData, authorizationToken):
+    def getKanban(taskData, authContext):
         """
         Service API function that can be called internally as well as through the API to get a kanban.
         Gets kanban based on projectID within taskData.
 
-        @param taskData     Dict of parameters. Only projectID considered.
+        @param taskData     Dict of parameters. projectID and (optional) limit of tasks per column.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
         if "projectID" not in taskData:
             return "Error: paramter 'projectID' required.", status.HTTP_400_BAD_REQUEST
+
+        if not authContext.canAccessProject(taskData.get("projectID")):
+            return {
+                "message": "User not authorized to view this kanban"
+            }, status.HTTP_403_FORBIDDEN
+
+        limit = taskData.get("limit")
+        if limit is not None:
+            try:
+                limit = int(limit)
+                if limit < 1:
+                    raise ValueError
+            except (TypeError, ValueError):
+                return {"message": "Parameter 'limit' must be a positive int"}, status.HTTP_400_BAD_REQUEST
         
+        projectID = taskData.get("projectID")
         try:
-            tasks = list(Task.objects.filter(projectID=taskData.get("projectID")))
-        except Task.DoesNotExist:
-            return "Tasks not found for the specified projectID.", status.HTTP_404_NOT_FOUND
-        
-        try:
-            data, httpsCode = StatusesAPIView.getStatuses({"projectID": tasks[0]["projectID"]}, authorizationToken)
+            data, httpsCode = StatusesAPIView.getStatuses({"projectID": projectID}, authContext)
 
             if httpsCode != status.HTTP_200_OK:
                 print(f"Project GET failed: {data.get('message')}")
                 return data, httpsCode
-            
-            tasks_by_status = {}
-
-            # Sort each status by the 'order' number which is used to define the order of kanban columns from left to right
-            tasks_by_status["statuses"] = sorted(data, key=lambda status: status.get("order"))
-            # include a status with an id of Noneto the front of the status array to account for the case where
-            # a task does not have a status id associated with it or it is set to the default value None
-            tasks_by_status["statuses"].insert(0, {'id': None})
-
-            # Create a dictionary that maps each statusId from the sorted status dictionaries with an index
-            status_id_order_dict = { ObjectId(stat['id']) if stat['id'] != None else None: index for index, stat in enumerate(tasks_by_status["statuses"]) }
-
-            # removing None from status ids since it's only added for creating a statusId mapping
-            del tasks_by_status["statuses"][0]
-
-            # Creates a sorted list of tasks using the custom statusId mapping. If a statusId associated with
-            # a task doesn't existing in the mapping, is None, or non-existent it's at the start of the list
-            # and it will appear on the leftmost column
-
-            sorted_tasks = sorted(tasks, key=lambda task: status_id_order_dict[None if 'statusId' not in task or task.statusId not in status_id_order_dict.keys() else task['statusId']])
-
-            tasks_by_status["taskLists"] = []
-
-            # creates an empty task lists for each status type
-            for stat in data:
-                tasks_by_status["taskLists"].append([])
 
-            currentStatusId = list(status_id_order_dict.keys())[-1]
-            statusIndex = len(tasks_by_status["taskLists"]) - 1
-
-            # putting the sorted task objects into columns lists from right to left 
-            for i, task in reversed(list(enumerate(sorted_tasks))):
-
-                # while a task doesn't go into the current selected column
-                while currentStatusId != task.statusId and statusIndex >= 1:
-                    statusIndex -= 1
-                    currentStatusId = list(status_id_order_dict.keys())[statusIndex+1]
-
-                # instead of adding all remaining tasks indiviually into the leftmost column, dump them all at the same time
-                if (statusIndex < 1):
-                    tasks_by_status["taskLists"][statusIndex] = sorted_tasks
-                    break
-            
-                tasks_by_status["taskLists"][statusIndex].append(sorted_tasks.pop(i))
-
-            for i, taskList in enumerate(tasks_by_status["taskLists"]):
-                KanbanAPIView.normalizeTaskPriorityAndStatus(taskList, ObjectId(tasks_by_status["statuses"][i]["id"]))
-                serialized_data = TaskSerializer(taskList, many=True)
-                
-                tasks_by_status["taskLists"][i] = serialized_data.data
-
-            if not tasks_by_status["taskLists"]:
+            # Statuses come sorted by 'order', which is the order of kanban columns from left to right
+            statuses = data
+            statusIDs = [ObjectId(stat["id"]) for stat in statuses]
+            if not statusIDs:
                 return "No tasks found for the specified projectID.", status.HTTP_404_NOT_FOUND
 
-            return tasks_by_status, status.HTTP_200_OK
+            columns = {
+                column["_id"]: column
+                for column in Task._get_collection().aggregate(
+                    KanbanAPIView.kanbanPipeline(ObjectId(projectID), statusIDs, limit),
+                    allowDiskUse=True,
+                )
+            }
+
+            # Raw documents + encoder instead of MongoEngine documents + TaskSerializer (same output)
+            encoder = getEncoder(Task)
+            taskLists = []
+            taskCounts = []
+            dirtyTasks = []
+            for statusID in statusIDs:
+                column = columns.get(statusID, {"tasks": [], "count": 0})
+                taskList, operations = KanbanAPIView.normalizeTaskPriorityAndStatus(column["tasks"], statusID)
+                taskLists.append(encoder.encodeMany(taskList))
+                taskCounts.append(column["count"])
+                dirtyTasks.extend(operations)
+
+            # The response is already normalized, saving it can wait (and is skipped on conflicts)
+            if dirtyTasks:
+                background.submit(KanbanAPIView.saveNormalizedTasks, dirtyTasks)
+
+            return {"statuses": statuses, "taskLists": taskLists, "taskCounts": taskCounts}, status.HTTP_200_OK
             
         except Exception as e:
             print("Error:", e)
@@ -173,16 +167,50 @@ class KanbanAPIView(APIView):
 
         
     @staticmethod
-    def updateKanban(taskData):
+    def kanbanPipeline(projectID, statusIDs, limit=None):
+        """
+        Aggregation that builds a kanban's columns in MongoDB: one document per status with its
+        tasks in column order (see api.ranking.columnOrder) and their count. Tasks without a
+        statusId, or with one not in statusIDs, go in the first (leftmost) column.
+
+        @param projectID      ObjectId of the project.
+        @param statusIDs      ObjectIds of the statuses, in column order.
+        @param limit      Max number of tasks per column, None for all.
+        @return      The pipeline (list of stages).
+        """
+        # With a limit, a column never holds more than `limit` tasks ($firstN keeps the first ones
+        # of the sorted input, MongoDB 5.2+), however many the status has
+        tasks = {"$push": "$$ROOT"} if limit is None else {"$firstN": {"input": "$$ROOT", "n": limit}}
+        return [
+            {"$match": {"projectID": projectID}},
+            # Same order as columnOrder (MongoDB sorts null/missing first, so flag them)
+            {"$addFields": {
+                "_unranked": {"$eq": [{"$ifNull": ["$rank", None]}, None]},
+                "_noPriority": {"$eq": [{"$ifNull": ["$priority", None]}, None]},
+            }},
+            {"$sort": {"_unranked": 1, "rank": 1, "_noPriority": 1, "priority": 1, "_id": 1}},
+            {"$project": {"_unranked": 0, "_noPriority": 0}},
+            {"$group": {
+                "_id": {"$cond": [{"$in": ["$statusId", statusIDs]}, "$statusId", statusIDs[0]]},
+                "tasks": tasks,
+                "count": {"$sum": 1},
+            }},
+        ]
+
+    @staticmethod
+    def updateKanban(taskData, authContext):
         """
         Service API function that can be called internally as well as through the API to get a kanban.
         Updates kanban based on task id, status, and priority.
+        The task gets a rank (see api.ranking) between the cards at its new position, so only the
+        moved task is written, whatever the column size.
 
         @param:
             taskData (dict): Dict of parameters. Contains id, status, and priority.
                 id (string): Id of the task to update.
                 statusId (string): Reference to a status.
-                priority (int): The priority to update task to.
+                priority (int): Position to move the task to in the column. None puts it at the end.
+            authContext (AuthContext): AuthContext of the requesting user.
                 
         @return:
             A tuple of (response_data, http_status).
@@ -196,69 +224,135 @@ class KanbanAPIView(APIView):
         if 'statusId' not in taskData:
             return "Error: parameter 'status' required.", status.HTTP_400_BAD_REQUEST
         
+        values, errors = toMongoValues(
+            Task, {"statusId": taskData.get("statusId"), "priority": taskData.get("priority")}
+        )
+        if errors:
+            return {"message": errors}, status.HTTP_400_BAD_REQUEST
 
         task_id = taskData.get('id')
-        try:
-            updating_task = Task.objects.get(id=task_id)
-        except Task.DoesNotExist:
+        updating_task = Task.objects(id=task_id).only("projectID").as_pymongo().first()
+        if updating_task is None:
             return "Task not found with the provided ID.", status.HTTP_404_NOT_FOUND
 
-        project = updating_task.projectID
-        old_statusId = updating_task.statusId
-        old_priority = updating_task.priority
-        new_status_id = taskData.get('statusId')
-        new_priority = taskData.get('priority')
-
-        old_status_tasks = Task.objects.filter(
-            projectID=project, 
-            statusId=old_statusId, 
-            priority__gt=old_priority
-        ) # .update(priority = F['priority'] - 1)
-
-        new_status_tasks = Task.objects.filter(
-            projectID=project,
-            statusId=new_status_id,
-            priority__gte=new_priority
-        ) # .update(priority = F['priority'] + 1)
-
-        # TODO: find a better way to save a list of objects at once.
-        # Everything I tried didn't work with mongoengine.
-        for task in old_status_tasks:
-            task.priority -= 1
-            task.save()
-
-        for task in new_status_tasks:
-            task.priority += 1
-            task.save()
-
-        updating_task.statusId = new_status_id 
-        updating_task.priority = new_priority
-        updating_task.save()
+        if not authContext.canAccessProject(updating_task.get("projectID")):
+            return {
+                "message": "User not authorized to edit this kanban"
+            }, status.HTTP_403_FORBIDDEN
+
+        project = updating_task.get("projectID")
+        new_status_id = values["statusId"]
+        new_priority = values["priority"]
+
+        # The card can only go in one of the project's columns
+        if new_status_id is None or Project._get_collection().find_one(
+            {"_id": project, "taskStatuses.id": new_status_id}, {"_id": 1}
+        ) is None:
+            return {
+                "message": "Parameter 'statusId' must be the id of one of the project's statuses"
+            }, status.HTTP_400_BAD_REQUEST
+
+        try:
+            new_rank = KanbanAPIView.rankAtPosition(
+                project, new_status_id, new_priority, updating_task["_id"]
+            )
+        except ValueError:
+            # Cards with the same rank at that position (ex: merged from a deleted status)
+            rebalanceColumn(project, new_status_id)
+            new_rank = KanbanAPIView.rankAtPosition(
+                project, new_status_id, new_priority, updating_task["_id"]
+            )
+
+        Task._get_collection().update_one(
+            {"_id": updating_task["_id"]},
+            {"$set": {"statusId": new_status_id, "rank": new_rank}},
+        )
+
+        if needsRebalance(new_rank):
+            background.submit(rebalanceColumn, project, new_status_id)
 
         return "Kanban successfully updated.", status.HTTP_200_OK
-        
+
     @staticmethod
-    def normalizeTaskPriorityAndStatus(taskList, status_id):
+    def rankAtPosition(projectID, statusId, position, taskID):
         """
-        Normalize the priority of tasks within each status group.
-        Ensures all tasks have an integer priority value.
-        Also ensures priority starts at 0 and is spaced evenly by 1.
+        Makes the rank a task needs to be at a position of a column (with one query for the ranks
+        of the cards around it).
+
+        @param projectID      ObjectId of the project.
+        @param statusId      ObjectId of the status (column).
+        @param position      Index in the column (without the task), None for the end.
+        @param taskID      ObjectId of the task being moved (ignored in the column).
+        @return      The rank.
+        @raises ValueError      If the cards around the position have the same rank.
+        """
+        column = Task._get_collection().find(
+            {
+                "projectID": projectID,
+                "statusId": statusId,
+                "_id": {"$ne": taskID},
+                "rank": {"$ne": None},
+            },
+            {"rank": 1},
+        )
+
+        if position is None:  # After the last card
+            last = list(column.sort("rank", -1).limit(1))
+            return rankBetween(last[0]["rank"] if last else None, None)
+
+        if position <= 0:  # Before the first card
+            first = list(column.sort("rank", 1).limit(1))
+            return rankBetween(None, first[0]["rank"] if first else None)
+
+        neighbours = [task["rank"] for task in column.sort("rank", 1).skip(position - 1).limit(2)]
+        if not neighbours:  # Past the end of the column
+            return KanbanAPIView.rankAtPosition(projectID, statusId, None, taskID)
+        return rankBetween(neighbours[0], neighbours[1] if len(neighbours) > 1 else None)
 
-        Source for sorting list, pushing none values to end:
-        https://stackoverflow.com/questions/18411560/sort-list-while-pushing-none-values-to-the-end
+    @staticmethod
+    def normalizeTaskPriorityAndStatus(taskList, status_id):
+        """
+        Normalize the order and status of tasks within each status group, in memory (no writes).
+        Tasks without a rank (new or not migrated from the integer priority) get one after the
+        ranked tasks, and priority is set to the position in the column for the response.
 
         Args:
-            tasks_by_status (dict): Dictionary containing tasks grouped by status.
+            taskList (list): Raw task documents (as_pymongo) of one status group. Changed in place.
+            status_id (ObjectId): Id of the status of the group.
 
         Returns:
-            dict: Updated tasks grouped by status with normalized priorities.
+            tuple: (the tasks in column order, list of pymongo UpdateOne for the tasks whose
+            rank or status changed). Each update only applies if the task still has the rank
+            and status it was read with, so it never overwrites a concurrent move.
         """
 
-        taskList = sorted(taskList, key = lambda x: x["priority"] if x.priority != None else 0)
-        
-        # Space priority evenly.
+        taskList = sorted(taskList, key=columnOrder)
+        operations = []
+        previousRank = None
+
         for index, task in enumerate(taskList):
-            if (task.priority != index) or ('statusId' not in task) or (task.statusId != status_id):
-                task.priority = index
-                task.statusId = status_id
-                task.save()
+            rank = task.get("rank")
+            if rank is None:
+                rank = rankBetween(previousRank, None)
+
+            if (rank != task.get("rank")) or (task.get("statusId") != status_id):
+                operations.append(UpdateOne(
+                    {"_id": task["_id"], "rank": task.get("rank"), "statusId": task.get("statusId")},
+                    {"$set": {"rank": rank, "statusId": status_id}},
+                ))
+                task["rank"] = rank
+                task["statusId"] = status_id
+
+            task["priority"] = index  # Position in the column, kept in responses for clients
+            previousRank = rank
+
+        return taskList, operations
+
+    @staticmethod
+    def saveNormalizedTasks(operations):
+        """
+        Persists the normalization done by getKanban with a single unordered bulk_write.
+
+        @param operations      List of pymongo UpdateOne from normalizeTaskPriorityAndStatus.
+        """
+        Task._get_collection().bulk_write(operations, ordered=False)
@@ -0,0 +1,29 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from django.utils.decorators import method_decorator
+
+from api import metrics
+from api.decorators import apiKeyRequired
+
+
+# dispatch protects all HTTP requests coming in
+@method_decorator(apiKeyRequired, name="dispatch")
+class MetricsAPIView(APIView):
+    """
+    Reports process-local counters (cache hits/misses, etc.).
+    """
+
+    def get(self, request):
+        """
+        Retrieves the counters of the worker process that handled the request.
+        Requires 'apiToken' passed in auth header or cookies.
+
+        @param {HttpRequest} request - The request object.
+
+        @return A Response object containing a JSON object of counter name to value.
+
+        @example Javascript:
+            fetch('quayside.app/api/v1/metrics');
+        """
+        return Response(metrics.snapshot(), status=status.HTTP_200_OK)
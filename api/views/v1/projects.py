@@ -2,14 +2,18 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
 from django.utils.decorators import method_decorator
 from django.core.exceptions import ObjectDoesNotExist
 
 from api.decorators import apiKeyRequired
 from api.serializers import ProjectSerializer
-from api.views.v1.tasks import TasksAPIView
-from api.models import Project
-from api.utils import getAuthorizationToken, decodeApiKey
+from api.encoders import getEncoder
+from api.models import Project, Task, Feedback
+from api.database import runInTransaction
+from api.auth import getAuthContext, invalidateMemberships
+from api.utils import popFieldsParameter
+from api.pagination import popPaginationParameters, paginate
 
 
 @method_decorator(
@@ -50,15 +54,19 @@ class ProjectsAPIView(APIView):
                 - informationLinks (list[str])
                 - completionStatus (str)
                 - teams (list[ObjectId])
+                - fields (comma separated str) Only returns these fields (id always included).
+                - limit (int) Max number of projects per page. Paginates the response.
+                - cursor (str) The 'next' value of the previous page. Paginates the response.
 
         @return A Response object containing a JSON array of serialized Project objects that
-        match the query parameters.
+        match the query parameters. If paginated, {"results": [...], "next": cursor or null}.
 
         @example Javascript:
             fetch('quayside.app/api/v1/projects?userIDs=1234');
+            fetch('quayside.app/api/v1/projects?userIDs=1234&fields=name');
         """
         responseData, httpStatus = self.getProjects(
-            request.query_params.dict(), getAuthorizationToken(request)
+            request.query_params.dict(), getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -90,7 +98,6 @@ class ProjectsAPIView(APIView):
                 - informationLinks (list[str])
                 - completionStatus (str)
                 - teams (list[ObjectId])
-        @param {str} authorizationToken - JWT authorization token.
 
         @return A Response object containing a JSON array of the created project.
 
@@ -104,7 +111,7 @@ class ProjectsAPIView(APIView):
 
         """
         responseData, httpStatus = self.createProjects(
-            request.data, getAuthorizationToken(request)
+            request.data, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -150,7 +157,7 @@ class ProjectsAPIView(APIView):
 
         """
         responseData, httpStatus = self.updateProject(
-            request.data, getAuthorizationToken(request)
+            request.data, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -162,7 +169,8 @@ class ProjectsAPIView(APIView):
             The query parameters MUST be:
                 - id (objectID str) [REQUIRED]
 
-        @return: A Response object with a success or an error message.
+        @return: A Response object with a success or an error message. On success, "deleted" has
+            the number of documents deleted per collection: {"projects", "tasks", "feedback"}.
 
         @example javascript:
 
@@ -172,24 +180,32 @@ class ProjectsAPIView(APIView):
         """
 
         responseData, httpStatus = self.deleteProjects(
-            request.query_params, getAuthorizationToken(request)
+            request.query_params, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
     @staticmethod
-    def getProjects(projectData, authorizationToken):
+    def getProjects(projectData, authContext):
         """
         Service API function that can be called internally as well as through the API to get
         project data based on input data.
 
         @param projectData      Dict for a single project.
-        @param authorizationToken      JWT authorization token.
+            May contain 'fields' (comma separated str or list) to only load/return those fields.
+            May contain 'limit' and/or 'cursor' to get one page as {"results": [...], "next": cursor}.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
+        try:
+            fields = popFieldsParameter(projectData, Project)
+            page = popPaginationParameters(projectData)
+        except ValueError as e:
+            return {"message": str(e)}, status.HTTP_400_BAD_REQUEST
+
         try:
 
             # Only get project where user is a contributor
-            userID = decodeApiKey(authorizationToken).get("userID")
+            userID = authContext.userID
 
             if "userIDs" not in projectData:
                 projectData["userIDs"] = []
@@ -200,26 +216,36 @@ class ProjectsAPIView(APIView):
 
             projects = Project.objects.filter(
                 userIDs__all=projectData.pop("userIDs"), **projectData
-            )  # Query mongo
+            )
+            if fields:
+                projects = projects.only(*fields)
+            # Raw documents + encoder instead of MongoEngine documents + ProjectSerializer
+            projects = projects.as_pymongo()
+            encoder = getEncoder(Project, fields)
+
+            if page:
+                projects, nextCursor = paginate(projects, *page)
+                return {"results": encoder.encodeMany(projects), "next": nextCursor}, status.HTTP_200_OK
+
+            projects = list(projects)  # Query mongo
 
             if not projects:
                 return {
                     "message": "No projects were found or you do not have authorization."
                 }, status.HTTP_400_BAD_REQUEST
-            serializer = ProjectSerializer(projects, many=True)
-            return serializer.data, status.HTTP_200_OK
+            return encoder.encodeMany(projects), status.HTTP_200_OK
         except Exception as e:
             print("Error:", e)
             return {"message": e}, status.HTTP_500_INTERNAL_SERVER_ERROR
 
     @staticmethod
-    def updateProject(projectData, authorizationToken):
+    def updateProject(projectData, authContext):
         """
         Service API function that can be called internally as well as through the API to update
         project data based on input data.
 
         @param projectData      Dict for a single project.
-        @param authorizationToken      JWT authorization token.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
         if "_id" in projectData:
@@ -233,32 +259,34 @@ class ProjectsAPIView(APIView):
             return "Project not found", status.HTTP_404_NOT_FOUND
 
         # Check if userID is in the project's list of UserIDs
-        userID = decodeApiKey(authorizationToken).get("userID")
+        userID = authContext.userID
         if ObjectId(userID) not in project["userIDs"]:
             return {
                 "message": "User not authorized to edit this project"
             }, status.HTTP_403_FORBIDDEN
 
+        previousUserIDs = list(project["userIDs"])
         serializer = ProjectSerializer(data=projectData, instance=project, partial=True)
 
         if serializer.is_valid():
             serializer.save()  # Updates projects
+            invalidateMemberships({*previousUserIDs, *project["userIDs"]})
             return serializer.data, status.HTTP_200_OK
 
         print(serializer.errors)
         return serializer.errors, status.HTTP_400_BAD_REQUEST
 
     @staticmethod
-    def createProjects(projectData, authorizationToken):
+    def createProjects(projectData, authContext):
         """
         Service API function that can be called internally as well as through the API to create
         project(s) based on input data.
 
         @param projectData      Dict for a single project dict or list of dicts for multiple tasks.
-        @param authorizationToken      JWT authorization token.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
-        userID = decodeApiKey(authorizationToken).get("userID")
+        userID = authContext.userID
         if "userIDs" not in projectData or projectData["userIDs"] != [userID]:
             return {
                 "message": "Request data must contain a list of userIDs with only your user ID present."
@@ -275,40 +303,59 @@ class ProjectsAPIView(APIView):
 
         if serializer.is_valid():
             serializer.save()  # Save the project(s) to the database
+            invalidateMemberships([userID])
             # Returns data including new primary key
             return serializer.data, status.HTTP_201_CREATED
 
         return {"message":serializer.errors}, status.HTTP_400_BAD_REQUEST
 
     @staticmethod
-    def deleteProjects(projectData, authorizationToken):
+    def deleteProjects(projectData, authContext):
         """
         Service API function that can be called internally as well as through the API to delete
-        project and all associated tasks.
+        project and all associated tasks and feedback (in one transaction where the server
+        supports them).
 
         @param projectData      Dict for a single project
-        @param authorizationToken      JWT authorization token.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
         if "id" not in projectData:
             return {"message": "Parameter 'id' required"}, status.HTTP_400_BAD_REQUEST
-        ID = projectData["id"]
-        project = Project.objects.get(id=ID)
+        try:
+            projectID = ObjectId(projectData["id"])
+        except (InvalidId, TypeError):
+            return {"message": "Parameter 'id' must be an objectId"}, status.HTTP_400_BAD_REQUEST
 
-        userID = decodeApiKey(authorizationToken).get("userID")
-        if ObjectId(userID) not in project["userIDs"]:
+        project = Project._get_collection().find_one({"_id": projectID}, {"userIDs": 1})
+        if project is None:
+            return {"message": "No project found to delete."}, status.HTTP_404_NOT_FOUND
+
+        userID = ObjectId(authContext.userID)
+        if userID not in project.get("userIDs", []):
             return {
                 "message": "Not authorized to delete project."
             }, status.HTTP_401_UNAUTHORIZED
 
-        message, httpsCode = TasksAPIView.deleteTasks(
-            {"projectID": ID}, authorizationToken
-        )
-        if httpsCode != status.HTTP_200_OK and httpsCode != status.HTTP_404_NOT_FOUND:
-            return message, httpsCode
-
-        numberObjectsDeleted = project.delete()
-        if numberObjectsDeleted == 0:
-            return "No project found to delete.", status.HTTP_404_NOT_FOUND
-
-        return "Project Deleted Successfully", status.HTTP_200_OK
+        def deleteCascade(session):
+            # The project first, still filtered on the user: nothing else is deleted if it is gone
+            if not Project._get_collection().delete_one(
+                {"_id": projectID, "userIDs": userID}, session=session
+            ).deleted_count:
+                return None
+            return {
+                "projects": 1,
+                "tasks": Task._get_collection()
+                .delete_many({"projectID": projectID}, session=session)
+                .deleted_count,
+                "feedback": Feedback._get_collection()
+                .delete_many({"projectID": projectID}, session=session)
+                .deleted_count,
+            }
+
+        deleted = runInTransaction(deleteCascade)
+        invalidateMemberships(project.get("userIDs", []))
+        if deleted is None:
+            return {"message": "No project found to delete."}, status.HTTP_404_NOT_FOUND
+
+        return {"message": "Project Deleted Successfully", "deleted": deleted}, status.HTTP_200_OK
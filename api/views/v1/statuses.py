@@ -2,15 +2,24 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
 from django.utils.decorators import method_decorator
-from django.core.exceptions import ObjectDoesNotExist
 
 from api.decorators import apiKeyRequired
-from api.serializers import ProjectSerializer
-from api.views.v1.tasks import TasksAPIView
 from api.models import Project
-from api.utils import getAuthorizationToken, decodeApiKey
-from api.views.v1.projects import ProjectsAPIView
+from api.auth import getAuthContext
+from api.utils import toMongoValues
+from api.encoders import getEncoder
+from api.cache import TTLCache
+
+
+# projectID -> (statusVersion, statuses sorted by order), checked against the version on every read
+statusCache = TTLCache(
+    "projectStatuses",
+    maxSize=settings.STATUS_CACHE_SIZE,
+    ttl=settings.STATUS_CACHE_TTL_SECONDS,
+)
 
 
 @method_decorator(
@@ -38,7 +47,7 @@ class StatusesAPIView(APIView):
             fetch('quayside.app/api/v1/statuses?projectID=1234');
         """
         responseData, httpStatus = self.getStatuses(
-            request.query_params.dict(), getAuthorizationToken(request)
+            request.query_params.dict(), getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -47,14 +56,13 @@ class StatusesAPIView(APIView):
         Creates status(es). Requires 'apiToken' passed in auth header or cookies.
 
         @param {HttpRequest} request - The request object.
-            The request body can contain:
-                - id (objectID str)
+            The request body must contain:
+                - projectID (objectID str)
                 - name (str)
                 - color (str)
-                - order (str)
-        @param {str} authorizationToken - JWT authorization token.
+                - order (int)
 
-        @return A response telling you if the status was created.
+        @return A response telling you if the status was created (and its id).
 
         @example javascript:
 
@@ -65,36 +73,35 @@ class StatusesAPIView(APIView):
             });
 
         """
-        responseData, httpStatus = self.createProjects(
-            request.data, getAuthorizationToken(request)
+        responseData, httpStatus = self.createStatus(
+            request.data, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
     def put(self, request):
         """
-        Updates a single project.
+        Updates a single status of a project (only the fields passed).
         Requires 'apiToken' passed in auth header or cookies.
 
-
         @param {HttpRequest} request - The request object.
-                @param {HttpRequest} request - The request object.
             The request body can contain:
-                - id (objectID str)
+                - projectID (objectID str) [REQUIRED]
+                - id (objectID str) [REQUIRED]
                 - name (str)
                 - color (str)
-                - order (str)
-        @return: A Response object with the updated task data or an error message.
+                - order (int)
+        @return: A Response object with a success or an error message.
 
         @example javascript
-            await fetch(`/api/v1/statuses?id=1234`, {
+            await fetch(`/api/v1/statuses`, {
                 method: 'PUT',
                 headers: { 'Content-Type': 'application/json'},
-                body: JSON.stringify({ "projectID": "5AC9942376", "name":  "backlog", "color": "A4279", "order":  2 }),
+                body: JSON.stringify({ "projectID": "5AC9942376", "id": "1234", "name":  "backlog", "order":  2 }),
             });
 
         """
         responseData, httpStatus = self.updateStatus(
-            request.data, getAuthorizationToken(request)
+            request.data, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -104,184 +111,231 @@ class StatusesAPIView(APIView):
 
         @param {HttpRequest} request - The request object.
             The query parameters MUST be:
+                - projectID (objectID str) [REQUIRED]
                 - id (objectID str) [REQUIRED]
 
         @return: A Response object with a success or an error message.
 
         @example javascript:
 
-            fetch(`/api/v1/statuses?id=1234`, {
+            fetch(`/api/v1/statuses?projectID=5AC9942376&id=1234`, {
                 method: 'DELETE',
             });
         """
 
         responseData, httpStatus = self.deleteStatus(
-            request.query_params, getAuthorizationToken(request)
+            request.query_params, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
     @staticmethod
-    def getStatuses(statusData, authorizationToken):
+    def getStatuses(statusData, authContext):
         """
         Service API function that can be called internally as well as through the API to get
-        project data based on input data.
+        a project's statuses, sorted by order. One read of the project's taskStatuses only, that
+        leaves them out when the cached statuses are still current (see statusCache).
 
-        @param projectData      Dict for a single project.
-        @param authorizationToken      JWT authorization token.
+        @param statusData      Dict with the projectID.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
 
+        if not authContext.canAccessProject(statusData.get("projectID")):
+            return {
+                "message": "User not authorized to access this project's statuses"
+            }, status.HTTP_403_FORBIDDEN
+
         try:
-            # Only get project where user is a contributor
-            data, httpsCode = ProjectsAPIView.getProjects(
-                {"id": statusData["projectID"] }, authorizationToken
+            query = StatusesAPIView.projectFilter(statusData, authContext)
+        except ValueError as e:
+            return {"message": str(e)}, status.HTTP_400_BAD_REQUEST
+
+        # The query always checks the membership (and that the project still exists), but only
+        # returns the statuses if they changed since they were cached (statusVersion only grows)
+        cached = statusCache.get(query["_id"])
+        taskStatuses = 1
+        if cached is not None:
+            taskStatuses = {
+                "$cond": [
+                    {"$gt": [{"$ifNull": ["$statusVersion", 0]}, cached[0]]},
+                    {"$ifNull": ["$taskStatuses", []]},
+                    "$$REMOVE",
+                ]
+            }
+        project = Project._get_collection().find_one(
+            query, {"_id": 0, "taskStatuses": taskStatuses, "statusVersion": 1}
+        )
+
+        if project is None:
+            return {
+                "message": "User not authorized to access this project's statuses"
+            }, status.HTTP_403_FORBIDDEN
+        if cached is None or "taskStatuses" in project:
+            statuses = sorted(
+                getEncoder(Project.Status).encodeMany(project.get("taskStatuses", [])),
+                key=lambda stat: stat["order"],
             )
-            data = data[0]
-
-            if httpsCode != status.HTTP_200_OK and httpsCode != status.HTTP_404_NOT_FOUND:
-                return data["message"], httpsCode
-            
-            if "taskStatuses" not in data or not data["taskStatuses"]:
-                return { "message": "No status associated with project" }, status.HTTP_404_NOT_FOUND
-            
-            return data["taskStatuses"], status.HTTP_200_OK
-        except Exception as e:
-            print("Error:", e)
-            return {"message": e}, status.HTTP_500_INTERNAL_SERVER_ERROR
+            cached = (project.get("statusVersion", 0), statuses)
+            statusCache.set(query["_id"], cached)
+
+        if not cached[1]:
+            return {"message": "No status associated with project"}, status.HTTP_404_NOT_FOUND
+        # Copies, the cached statuses are shared
+        return [dict(stat) for stat in cached[1]], status.HTTP_200_OK
 
     @staticmethod
-    def updateStatus(statusData, authorizationToken):
+    def projectFilter(statusData, authContext) -> dict:
         """
-        Service API function that can be called internally as well as through the API to update
-        project data based on input data.
+        Filter for the project in statusData, only matching if the user is one of its members, so
+        each status write is a single update that is also its own authorization check.
+
+        @raises ValueError      If projectID is missing or not an objectId.
+        """
+        try:
+            return {
+                "_id": ObjectId(statusData["projectID"]),
+                "userIDs": ObjectId(authContext.userID),
+            }
+        except (KeyError, TypeError, InvalidId) as e:
+            raise ValueError("Parameter 'projectID' required (objectId str)") from e
 
-        @param projectData      Dict for a single project.
-        @param authorizationToken      JWT authorization token.
+    @staticmethod
+    def notUpdatedResponse(query, statusID=None, name=None):
+        """
+        Explains why a status write filtered on query matched no project. Only read on failure.
+
+        @param query      Filter from projectFilter.
+        @param statusID      ObjectId of the status that had to exist, if any.
+        @param name      Status name that had to be free, if any.
         @return      A tuple of (response_data, http_status).
         """
+        project = Project._get_collection().find_one(
+            {"_id": query["_id"]}, {"userIDs": 1, "taskStatuses": 1}
+        )
+        if project is None or query["userIDs"] not in project.get("userIDs", []):
+            return {
+                "message": "User not authorized to access this project's statuses"
+            }, status.HTTP_403_FORBIDDEN
+
+        statuses = project.get("taskStatuses", [])
+        if statusID is not None and not any(stat.get("id") == statusID for stat in statuses):
+            return {"message": "No status associated with project"}, status.HTTP_404_NOT_FOUND
+        if name is not None and any(
+            stat.get("name") == name and stat.get("id") != statusID for stat in statuses
+        ):
+            return {"message": "Status with name already exists"}, status.HTTP_403_FORBIDDEN
+        return {"message": "Project changed while updating, try again"}, status.HTTP_409_CONFLICT
 
+    @staticmethod
+    def updateStatus(statusData, authContext):
+        """
+        Service API function that can be called internally as well as through the API to update
+        a project's status, with one $set on that status only.
+
+        @param statusData      Dict with the projectID, the status id and the fields to change.
+        @param authContext      AuthContext of the requesting user.
+        @return      A tuple of (response_data, http_status).
+        """
         try:
-            # Only get project where user is a contributor
-            data, httpsCode = ProjectsAPIView.getProjects(
-                {"id": statusData["projectID"]}, authorizationToken
-            )
-            data=data[0]
-
-            if httpsCode != status.HTTP_200_OK and httpsCode != status.HTTP_404_NOT_FOUND:
-                return data["message"], httpsCode
-
-            if "taskStatuses" not in data or not data["taskStatuses"]:
-                return {
-                    "message": "No status associated with project"
-                }, status.HTTP_204_NO_CONTENT
-            
-            for stat in data["taskStatuses"]:
-                if stat["id"] == statusData["id"]:
-                    statusData.pop("projectID")
-                    stat = statusData
-                    serializer = ProjectSerializer(data=data)
-
-                    if serializer.is_valid():
-                        serializer.save()  # Updates projects
-                        return {"message": "Successfully updated status"}, status.HTTP_200_OK
-
-                    return serializer.errors, status.HTTP_400_BAD_REQUEST
-
-            return {"message": "Failed to update status"}, status.HTTP_200_OK
-        
-        except Exception as e:
-            print("Error:", e)
-            return {"message": e}, status.HTTP_500_INTERNAL_SERVER_ERROR
+            query = StatusesAPIView.projectFilter(statusData, authContext)
+            statusID = ObjectId(statusData["id"])
+        except (KeyError, TypeError, InvalidId, ValueError):
+            return {
+                "message": "Parameters 'projectID' and 'id' required (objectId str)"
+            }, status.HTTP_400_BAD_REQUEST
+
+        values, errors = toMongoValues(
+            Project.Status,
+            {key: value for key, value in statusData.items() if key not in ("id", "projectID")},
+        )
+        if errors:
+            return {"message": errors}, status.HTTP_400_BAD_REQUEST
+        if not values:
+            return {"message": "No status fields to update"}, status.HTTP_400_BAD_REQUEST
+
+        query["taskStatuses.id"] = statusID
+        if "name" in values:
+            # No other status may have the new name
+            query["taskStatuses"] = {
+                "$not": {"$elemMatch": {"name": values["name"], "id": {"$ne": statusID}}}
+            }
+
+        result = Project._get_collection().update_one(
+            query,
+            {
+                "$set": {f"taskStatuses.$[status].{key}": value for key, value in values.items()},
+                "$inc": {"statusVersion": 1},
+            },
+            array_filters=[{"status.id": statusID}],
+        )
+        if not result.matched_count:
+            return StatusesAPIView.notUpdatedResponse(query, statusID, values.get("name"))
+
+        return {"message": "Successfully updated status"}, status.HTTP_200_OK
 
     @staticmethod
-    def createStatus(statusData, authorizationToken):
+    def createStatus(statusData, authContext):
         """
-        Service API function that can be called internally as well as through the API to create
-        project(s) based on input data.
+        Service API function that can be called internally as well as through the API to add a
+        status to a project, with one $push.
 
-        @param projectData      Dict for a single project dict or list of dicts for multiple tasks.
-        @param authorizationToken      JWT authorization token.
+        @param statusData      Dict with the projectID and the new status' name, color and order.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
         try:
-            # Only get project where user is a contributor
-            data, httpsCode = ProjectsAPIView.getProjects(
-                {"id": statusData["projectID"]}, authorizationToken
-            )
-            data=data[0]
-
-            if httpsCode != status.HTTP_200_OK and httpsCode != status.HTTP_404_NOT_FOUND:
-                return data["message"], httpsCode
-
-            if "taskStatuses" not in data or not data["taskStatuses"]:
-                return {
-                    "message": "No status associated with project"
-                }, status.HTTP_204_NO_CONTENT
-            
-            for stat in data["taskStatuses"]:
-                if stat["name"] == statusData["name"]:
-                    return {
-                        "message": "Status with name already exists"
-                    }, status.HTTP_403_FORBIDDEN
-                
-                statusData.pop("projectID")
-                data["taskStatuses"].append(statusData)
-
-            serializer = ProjectSerializer(data=data)
-
-            if serializer.is_valid():
-                serializer.save()  # Updates projects
-                return {"message":"Successfully created status"}, status.HTTP_200_OK
-            
-            return {"message":serializer.errors}, status.HTTP_400_BAD_REQUEST
-
-        except Exception as e:
-            print("Error:", e)
-            return {"message": e}, status.HTTP_500_INTERNAL_SERVER_ERROR
+            query = StatusesAPIView.projectFilter(statusData, authContext)
+        except ValueError as e:
+            return {"message": str(e)}, status.HTTP_400_BAD_REQUEST
+
+        values, errors = toMongoValues(
+            Project.Status,
+            {key: value for key, value in statusData.items() if key not in ("id", "projectID")},
+        )
+        for name in ("name", "color", "order"):
+            if name not in values and name not in errors:
+                errors[name] = ["This field is required."]
+        if errors:
+            return {"message": errors}, status.HTTP_400_BAD_REQUEST
+
+        newStatus = {"id": ObjectId(), **values}
+        query["taskStatuses.name"] = {"$ne": values["name"]}
+        result = Project._get_collection().update_one(
+            query, {"$push": {"taskStatuses": newStatus}, "$inc": {"statusVersion": 1}}
+        )
+        if not result.matched_count:
+            return StatusesAPIView.notUpdatedResponse(query, name=values["name"])
+
+        return {
+            "message": "Successfully created status",
+            "id": str(newStatus["id"]),
+        }, status.HTTP_200_OK
 
     @staticmethod
-    def deleteStatus(statusData, authorizationToken):
+    def deleteStatus(statusData, authContext):
         """
         Service API function that can be called internally as well as through the API to delete
-        project and all associated tasks.
+        a project's status, with one $pull. Its tasks show in the first kanban column until they
+        are moved.
 
-        @param projectData      Dict for a single project
-        @param authorizationToken      JWT authorization token.
+        @param statusData      Dict with the projectID and the status id.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
         try:
-            # Only get project where user is a contributor
-            data, httpsCode = ProjectsAPIView.getProjects(
-                {"id": statusData["projectID"]}, authorizationToken
-            )
-            data=data[0]
-
-            if httpsCode != status.HTTP_200_OK and httpsCode != status.HTTP_404_NOT_FOUND:
-                return data["message"], httpsCode
-
-            if "taskStatuses" not in data or not data["taskStatuses"]:
-                return {
-                    "message": "No status associated with project"
-                }, status.HTTP_204_NO_CONTENT
-            
-            taskFound = False
-            for i, stat in enumerate(data["taskStatuses"]):
-                if stat["id"] == statusData["id"]:
-                    data["taskStatuses"].pop(i)
-                    taskFound = True
-                    break
-
-            if not taskFound:
-                return { "message": "No status associated with project" }, status.HTTP_404_NOT_FOUND
-
-            serializer = ProjectSerializer(data=data)
-
-            if serializer.is_valid():
-                serializer.save()  # Updates projects
-                return {"message":"Successfully deleted status"}, status.HTTP_200_OK
-            
-            return {"message":serializer.errors}, status.HTTP_400_BAD_REQUEST
-
-        except Exception as e:
-            print("Error:", e)
-            return {"message": e}, status.HTTP_500_INTERNAL_SERVER_ERROR
+            query = StatusesAPIView.projectFilter(statusData, authContext)
+            statusID = ObjectId(statusData["id"])
+        except (KeyError, TypeError, InvalidId, ValueError):
+            return {
+                "message": "Parameters 'projectID' and 'id' required (objectId str)"
+            }, status.HTTP_400_BAD_REQUEST
+
+        query["taskStatuses.id"] = statusID
+        result = Project._get_collection().update_one(
+            query,
+            {"$pull": {"taskStatuses": {"id": statusID}}, "$inc": {"statusVersion": 1}},
+        )
+        if not result.matched_count:
+            return StatusesAPIView.notUpdatedResponse(query, statusID)
+
+        return {"message": "Successfully deleted status"}, status.HTTP_200_OK
@@ -0,0 +1,128 @@
+import csv
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from django.utils.decorators import method_decorator
+
+from api.models import Task
+from api.encoders import getEncoder
+from api.decorators import apiKeyRequired
+from api.auth import getAuthContext
+from api.utils import popFieldsParameter
+
+
+class EchoBuffer:
+    """
+    File-like object for csv.writer that returns the line instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+# dispatch protects all HTTP requests coming in
+@method_decorator(apiKeyRequired, name="dispatch")
+class TaskExportAPIView(APIView):
+    """
+    Streams all the tasks of a project.
+    """
+
+    CONTENT_TYPES = {
+        "ndjson": "application/x-ndjson",
+        "csv": "text/csv",
+    }
+
+    def get(self, request):
+        """
+        Streams every task of a project as newline delimited JSON (one task per line, same shape
+        as GET /api/v1/tasks) or CSV. Tasks are read from MongoDB in batches while the response is
+        sent, so memory use does not grow with the project size.
+        Requires 'apiToken' passed in auth header or cookies.
+
+        @param {HttpRequest} request - The request object.
+            Query Parameters:
+                - projectID (objectId str) [REQUIRED]
+                - fileType (str) "ndjson" (default) or "csv". List values are JSON arrays in CSV.
+                - fields (comma separated str) Only exports these fields (id always included).
+
+        @return: A StreamingHttpResponse of the tasks or a Response with an error message.
+
+        @example Javascript:
+            fetch('quayside.app/api/v1/tasks/export?projectID=1234&fileType=csv');
+        """
+        queryData = request.query_params.dict()
+        fileType = queryData.pop("fileType", "ndjson")
+        if fileType not in self.CONTENT_TYPES:
+            return Response(
+                {"message": "Parameter 'fileType' must be 'ndjson' or 'csv'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if "projectID" not in queryData:
+            return Response(
+                {"message": "Parameter 'projectID' required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not getAuthContext(request).canAccessProject(queryData["projectID"]):
+            return Response(
+                {"message": "User not authorized to export this project"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            fields = popFieldsParameter(queryData, Task)
+        except ValueError as e:
+            return Response({"message": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        tasks = self.iterateTasks(queryData["projectID"], fields)
+        lines = self.csvLines(tasks, fields) if fileType == "csv" else self.ndjsonLines(tasks)
+
+        response = StreamingHttpResponse(lines, content_type=self.CONTENT_TYPES[fileType])
+        response["Content-Disposition"] = (
+            f'attachment; filename="tasks-{queryData["projectID"]}.{fileType}"'
+        )
+        return response
+
+    @staticmethod
+    def iterateTasks(projectID, fields=None):
+        """
+        Reads the tasks of a project with a raw pymongo cursor, settings.EXPORT_BATCH_SIZE at a
+        time, and yields them encoded like TaskSerializer.
+
+        @param projectID      ID of the project.
+        @param fields      List of fields to export, None for all fields.
+        """
+        encoder = getEncoder(Task, fields)
+        projection = [dbField for _, dbField, _, _ in encoder.fields] if fields else None
+
+        # Filter through MongoEngine so projectID is validated/converted like other endpoints
+        query = Task.objects(projectID=projectID)._query
+        cursor = Task._get_collection().find(
+            query, projection, batch_size=settings.EXPORT_BATCH_SIZE
+        )
+        try:
+            for rawTask in cursor:
+                yield encoder.encode(rawTask)
+        finally:
+            cursor.close()  # Client disconnected or done
+
+    @staticmethod
+    def ndjsonLines(tasks):
+        for task in tasks:
+            yield json.dumps(task) + "\n"
+
+    @staticmethod
+    def csvLines(tasks, fields=None):
+        columns = fields or list(Task._fields_ordered)
+        writer = csv.writer(EchoBuffer())
+        yield writer.writerow(columns)
+        for task in tasks:
+            yield writer.writerow(
+                [
+                    json.dumps(task[column]) if isinstance(task[column], list) else task[column]
+                    for column in columns
+                ]
+            )
@@ -1,20 +1,33 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from bson.objectid import ObjectId
 from django.utils.decorators import method_decorator
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
-from api.models import Task, Project
+from api.models import Task
 from api.serializers import TaskSerializer
+from api.encoders import getEncoder
 from api.decorators import apiKeyRequired
-from api.utils import getAuthorizationToken, decodeApiKey
+from api.auth import getAuthContext
+from api.utils import popFieldsParameter, toMongoValues
+from api.pagination import popPaginationParameters, paginate
+from api.hierarchy import (
+    ancestorsUnder,
+    assignAncestors,
+    moveSubtree,
+    removeFromSubtree,
+    subtreeQuery,
+)
 
 
 # dispatch protects all HTTP requests coming in
 @method_decorator(apiKeyRequired, name="dispatch")
 class TasksAPIView(APIView):
     """
-    Create, get, update, and delete tasks.
+    Create, get, update (one or many), and delete tasks.
     """
 
     def get(self, request):
@@ -26,6 +39,8 @@ class TasksAPIView(APIView):
             Query Parameters:
                 - id (objectId str)
                 - parentTaskID (objectId str)
+                - ancestors (objectId str) Gets the whole subtree under this task.
+                - depth (int)
                 - name (str)
                 - objectives (list[str])
                 - scopesIncluded (list[str])
@@ -39,17 +54,23 @@ class TasksAPIView(APIView):
                 - startDate (date, 'YYYY-MM-DD')
                 - endDate (date, 'YYYY-MM-DD')
                 - durationMinutes (int)
+                - fields (comma separated str) Only returns these fields (id always included).
+                - limit (int) Max number of tasks per page. Paginates the response.
+                - cursor (str) The 'next' value of the previous page. Paginates the response.
 
 
         @return: A Response object containing a JSON array of serialized Task objects that
-        match the query parameters.
+        match the query parameters. If paginated, {"results": [...], "next": cursor or null}.
 
         @example Javascript:
             fetch('quayside.app/api/v1/tasks?parentTaskID=1234');
+            fetch('quayside.app/api/v1/tasks?ancestors=1234&fields=name,parentTaskID');
+            fetch('quayside.app/api/v1/tasks?projectID=1234&fields=name,parentTaskID,statusId');
+            fetch('quayside.app/api/v1/tasks?projectID=1234&limit=100&cursor=ZKx8...');
         """
 
         responseData, httpStatus = self.getTasks(
-            request.query_params.dict(), getAuthorizationToken(request)
+            request.query_params.dict(), getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -86,7 +107,7 @@ class TasksAPIView(APIView):
             });
         """
         responseData, httpStatus = self.createTasks(
-            request.data, getAuthorizationToken(request)
+            request.data, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -100,7 +121,7 @@ class TasksAPIView(APIView):
                 @param {HttpRequest} request - The request object.
             The request body can contain:
                 - id (objectId str) [REQUIRED]
-                - parentTaskID (objectId str)
+                - parentTaskID (objectId str) Moves the task with its subtree.
                 - name (str)
                 - objectives (list[str])
                 - scopesIncluded (list[str])
@@ -125,7 +146,33 @@ class TasksAPIView(APIView):
 
         """
         responseData, httpStatus = self.updateTask(
-            request.data, getAuthorizationToken(request)
+            request.data, getAuthContext(request)
+        )
+        return Response(responseData, status=httpStatus)
+
+    def patch(self, request):
+        """
+        Updates many tasks at once. Each item only needs the fields that change.
+        Requires 'apiToken' passed in auth header or cookies.
+
+        @param {HttpRequest} request - The request object.
+            The request body must be a list of objects containing:
+                - id (objectId str) [REQUIRED]
+                - any field accepted by PUT (except id and parentTaskID)
+
+        @return: A Response object with a list of {id, status[, message]} in request order.
+            Status is 200 if every task was updated, 207 if some were not.
+
+        @example javascript
+            await fetch(`/api/v1/tasks/`, {
+                method: 'PATCH',
+                headers: { 'Content-Type': 'application/json'},
+                body: JSON.stringify([{id: '1234', statusId: '5678'}, {id: '1235', endDate: '2024-05-01'}]),
+            });
+
+        """
+        responseData, httpStatus = self.updateTasks(
+            request.data, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
@@ -152,45 +199,66 @@ class TasksAPIView(APIView):
         """
 
         responseData, httpStatus = self.deleteTasks(
-            request.query_params, getAuthorizationToken(request)
+            request.query_params, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
     @staticmethod
-    def getTasks(taskData, authorizationToken):
+    def getTasks(taskData, authContext):
         """
         Service API function that can be called internally as well as through the API to get tasks
         Gets tasks based on  input parameters.
 
         @param taskData      Dict for a single task or list of dicts for multiple tasks.
-        @param authorizationToken      JWT authorization token.
+            May contain 'fields' (comma separated str or list) to only load/return those fields.
+            May contain 'limit' and/or 'cursor' to get one page as {"results": [...], "next": cursor}.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
-        userID = decodeApiKey(authorizationToken).get("userID")
-        
-        # Only get tasks for projects that contain the user
-        projectIDs = [
-            str(project.id) for project in Project.objects.filter(userIDs=userID)
-        ]
-
-        tasks = Task.objects.filter(**taskData, projectID__in=projectIDs)
+        try:
+            fields = popFieldsParameter(taskData, Task)
+            page = popPaginationParameters(taskData)
+        except ValueError as e:
+            return {"message": str(e)}, status.HTTP_400_BAD_REQUEST
+
+        # Only get tasks for projects that contain the user. One project is checked on its own, so
+        # a project just shared by another worker process is found (canAccessProject reloads on a miss)
+        if "projectID" in taskData:
+            if not authContext.canAccessProject(taskData["projectID"]):
+                return {
+                    "message": "No tasks were found or you do not have authorization."
+                }, status.HTTP_400_BAD_REQUEST
+            tasks = Task.objects.filter(**taskData)
+        else:
+            tasks = Task.objects.filter(**taskData, projectID__in=authContext.projectIDs)
+        if fields:
+            tasks = tasks.only(*fields)
+        # Raw documents + encoder instead of MongoEngine documents + TaskSerializer (same output)
+        tasks = tasks.as_pymongo()
+        encoder = getEncoder(Task, fields)
+
+        if page:
+            tasks, nextCursor = paginate(tasks, *page)
+            return {"results": encoder.encodeMany(tasks), "next": nextCursor}, status.HTTP_200_OK
+
+        tasks = list(tasks)
 
         if not tasks:
             return {
                 "message": "No tasks were found or you do not have authorization."
             }, status.HTTP_400_BAD_REQUEST
 
-        serializer = TaskSerializer(tasks, many=True)
-        return serializer.data, status.HTTP_200_OK
+        return encoder.encodeMany(tasks), status.HTTP_200_OK
 
     @staticmethod
-    def createTasks(taskData, authorizationToken):
+    def createTasks(taskData, authContext):
         """
         Service API function that can be called internally as well as through the API to create tasks
         Creates a single task or multiple tasks based on the input data.
 
 
         @param taskData      Dict for a single task or list of dicts for multiple tasks.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
 
@@ -198,7 +266,6 @@ class TasksAPIView(APIView):
         if not isinstance(taskData, list):
             taskData = [taskData]
 
-        userID = decodeApiKey(authorizationToken).get("userID")
         projectIDs = set()
 
         for task in taskData:
@@ -211,27 +278,28 @@ class TasksAPIView(APIView):
             projectIDs.add(task["projectID"])
 
         # Only allow tasks for projects that contains the user
-        authorizedProjectCount = Project.objects.filter(
-            id__in=projectIDs, userIDs=userID
-        ).count()
-        if authorizedProjectCount != len(projectIDs):
+        if not all(authContext.canAccessProject(projectID) for projectID in projectIDs):
             return {
                 "message": "User not authorized to create task(s) for at least one project"
             }, status.HTTP_403_FORBIDDEN
 
         serializer = TaskSerializer(data=taskData, many=True)
         if serializer.is_valid():
+            try:
+                assignAncestors(serializer.validated_data)  # Read only, set before saving
+            except ValueError as e:
+                return {"message": str(e)}, status.HTTP_400_BAD_REQUEST
             serializer.save()  # Save the task(s) to the database
             return serializer.data, status.HTTP_201_CREATED
         return serializer.errors, status.HTTP_400_BAD_REQUEST
 
     @staticmethod
-    def updateTask(taskData, authorizationToken):
+    def updateTask(taskData, authContext):
         """
         Service API function that can be called internally as well as through the API to update task.
 
         @param taskData      Dict for a single task.
-        @param authorizationToken      JWT authorization token.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
         if "id" not in taskData:
@@ -242,29 +310,149 @@ class TasksAPIView(APIView):
         except Task.DoesNotExist:
             return None, status.HTTP_404_NOT_FOUND
 
-        # Check if userID is in the project the task belongs to
-        userID = decodeApiKey(authorizationToken).get("userID")
-        project = Project.objects.get(id=task["projectID"])
-        if ObjectId(userID) not in project["userIDs"]:
+        # Check if userID is in the project the task belongs to (and the one it moves to)
+        if not authContext.canAccessProject(task["projectID"], fresh=True) or (
+            "projectID" in taskData
+            and not authContext.canAccessProject(taskData["projectID"], fresh=True)
+        ):
             return {
                 "message": "User not authorized to edit this task"
             }, status.HTTP_403_FORBIDDEN
 
+        # Moving the task moves its whole subtree
+        ancestors = None
+        if "parentTaskID" in taskData:
+            try:
+                ancestors = ancestorsUnder(
+                    taskData["parentTaskID"], taskData.get("projectID", task.projectID), task.id
+                )
+            except ValueError as e:
+                return {"message": str(e)}, status.HTTP_400_BAD_REQUEST
+
         serializer = TaskSerializer(data=taskData, instance=task, partial=True)
 
         if serializer.is_valid():
+            if ancestors is not None and ancestors != task.ancestors:
+                moveSubtree(task.id, ancestors)
+                task.ancestors = ancestors
+                task.depth = len(ancestors)
             serializer.save()  # Updates tasks
             return serializer.data, status.HTTP_200_OK
 
         return {"message":serializer.errors}, status.HTTP_400_BAD_REQUEST
 
     @staticmethod
-    def deleteTasks(taskData, authorizationToken):
+    def updateTasks(taskData, authContext):
+        """
+        Service API function that can be called internally as well as through the API to update
+        many tasks. Reads every task's projectID in one query, checks authorization once per
+        project, validates the fields without building documents and writes everything with one
+        unordered bulk_write.
+
+        @param taskData      List of dicts, each with an 'id' and the fields to set.
+        @param authContext      AuthContext of the requesting user.
+        @return      A tuple of (response_data, http_status). response_data is a list of
+            {"id", "status"[, "message"]} in the same order as taskData.
+        """
+        if not isinstance(taskData, list) or not taskData:
+            return {
+                "message": "Request data must be a non-empty list of tasks"
+            }, status.HTTP_400_BAD_REQUEST
+
+        results = [None] * len(taskData)
+        taskIDs = {}  # index -> ObjectId
+        for i, task in enumerate(taskData):
+            try:
+                taskIDs[i] = ObjectId(task["id"])
+            except (KeyError, TypeError, InvalidId):
+                results[i] = {
+                    "id": task.get("id") if isinstance(task, dict) else None,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "message": "Parameter 'id' required (objectId str)",
+                }
+
+        # One query for the project of every task
+        projectIDs = {
+            rawTask["_id"]: rawTask.get("projectID")
+            for rawTask in Task.objects(id__in=list(taskIDs.values()))
+            .only("projectID")
+            .as_pymongo()
+        }
+
+        canAccess = {}  # projectID -> bool, so each project is checked once
+
+        def canAccessProject(projectID):
+            if projectID not in canAccess:
+                canAccess[projectID] = authContext.canAccessProject(projectID, fresh=True)
+            return canAccess[projectID]
+
+        operations = []
+        operationIndexes = []  # index in taskData of each operation
+        seenIDs = set()
+        for i, taskID in taskIDs.items():
+            result = {"id": str(taskID), "status": status.HTTP_200_OK}
+            results[i] = result
+            fields = {key: value for key, value in taskData[i].items() if key != "id"}
+
+            # Moving a task rewrites its subtree, which the single $set per task can not do
+            hierarchyFields = [key for key in ("parentTaskID", "ancestors", "depth") if key in fields]
+            if hierarchyFields:
+                result.update(
+                    status=status.HTTP_400_BAD_REQUEST,
+                    message={key: ["Can not be updated in bulk, use PUT."] for key in hierarchyFields},
+                )
+                continue
+
+            if taskID in seenIDs:
+                result.update(status=status.HTTP_400_BAD_REQUEST, message="Duplicate id")
+                continue
+            seenIDs.add(taskID)
+
+            if taskID not in projectIDs:
+                result.update(status=status.HTTP_404_NOT_FOUND, message="Task not found")
+                continue
+
+            values, errors = toMongoValues(Task, fields)
+            if errors:
+                result.update(status=status.HTTP_400_BAD_REQUEST, message=errors)
+                continue
+
+            # The task's project and the one it moves to
+            if not canAccessProject(projectIDs[taskID]) or (
+                "projectID" in values and not canAccessProject(values["projectID"])
+            ):
+                result.update(
+                    status=status.HTTP_403_FORBIDDEN, message="User not authorized to edit this task"
+                )
+                continue
+
+            if values:
+                # projectID in the filter so a task moved since it was read is not written
+                operations.append(
+                    UpdateOne({"_id": taskID, "projectID": projectIDs[taskID]}, {"$set": values})
+                )
+                operationIndexes.append(i)
+
+        if operations:
+            try:
+                Task._get_collection().bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                for writeError in e.details["writeErrors"]:
+                    results[operationIndexes[writeError["index"]]].update(
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR, message=writeError["errmsg"]
+                    )
+
+        if all(result["status"] == status.HTTP_200_OK for result in results):
+            return results, status.HTTP_200_OK
+        return results, status.HTTP_207_MULTI_STATUS
+
+    @staticmethod
+    def deleteTasks(taskData, authContext):
         """
         Service API function that can be called internally as well as through the API to delete tasks.
 
         @param taskData      Dict for a single task.
-        @param authorizationToken      JWT authorization token.
+        @param authContext      AuthContext of the requesting user.
         @return      A tuple of (response_data, http_status).
         """
 
@@ -275,40 +463,31 @@ class TasksAPIView(APIView):
                 status.HTTP_400_BAD_REQUEST,
             )
 
-        userID = decodeApiKey(authorizationToken).get("userID")
         numberObjectsDeleted = 0
         if "id" in taskData:
             task = Task.objects.get(id=taskData["id"])
             # Check if userID is in the project the task belongs to
-            project = Project.objects.get(id=task["projectID"])
-            if ObjectId(userID) not in project["userIDs"]:
+            if not authContext.canAccessProject(task["projectID"], fresh=True):
                 return {
                     "message": "User not authorized to delete this task"
                 }, status.HTTP_403_FORBIDDEN
             
+            collection = Task._get_collection()
             if taskData.get("deleteChildren", "false") == "true":
-                numberObjectsDeleted = deleteAllChildren(taskData["id"])
+                numberObjectsDeleted = collection.delete_many(
+                    subtreeQuery(task.id, task.projectID)
+                ).deleted_count
             else:
-                childTasks = Task.objects(parentTaskID=task["id"])
-                for childTask in childTasks:
-                    message, httpsCode = TasksAPIView.updateTask(
-                        {"id": childTask["id"], "parentTaskID": task["parentTaskID"]},
-                        authorizationToken,
-                    )
-                    if httpsCode != status.HTTP_200_OK:
-                        print(
-                            f"Error moving children while deleting task: {message.get('message')}"
-                        )
-                        return (
-                            f"Error moving children while deleting task: {message.get('message')}",
-                            status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        )
-
-                numberObjectsDeleted = Task.objects(id=taskData["id"]).delete()
+                # Children move up to the deleted task's parent
+                collection.update_many(
+                    {"parentTaskID": task.id, "projectID": task.projectID},
+                    {"$set": {"parentTaskID": task.parentTaskID}},
+                )
+                removeFromSubtree(task.id)
+                numberObjectsDeleted = collection.delete_one({"_id": task.id}).deleted_count
         else:  # projectIDs
             # Check if userID is in the project
-            project = Project.objects.get(id=taskData["projectID"])
-            if ObjectId(userID) not in project["userIDs"]:
+            if not authContext.canAccessProject(taskData["projectID"], fresh=True):
                 return {
                     "message": "User not authorized to delete these task(s)"
                 }, status.HTTP_403_FORBIDDEN
@@ -321,17 +500,3 @@ class TasksAPIView(APIView):
             return {"message": "No tasks found to delete."}, status.HTTP_404_NOT_FOUND
 
         return {"message":"Task(s) Deleted Successfully"}, status.HTTP_200_OK
-
-@staticmethod
-def deleteAllChildren(taskID):
-    """
-    Recursively deletes a task and all its children, and returns the total count of deleted objects.
-    @param taskID: ID of task to delete along with all its children.
-    @return: Total number of tasks deleted.
-    """
-    numberObjectsDeleted = 0
-    children = Task.objects(parentTaskID=taskID)
-    for child in children:
-        numberObjectsDeleted += deleteAllChildren(child.id)
-    numberObjectsDeleted += Task.objects(id=taskID).delete()
-    return numberObjectsDeleted
\ No newline at end of file
@@ -7,8 +7,8 @@ from django.utils.decorators import method_decorator
 
 from api.models import User
 from api.serializers import UserSerializer
-from api.decorators import apiKeyRequired
-from api.utils import getAuthorizationToken, decodeApiKey
+from api.decorators import apiKeyRequired, invalidateUserTokens
+from api.auth import getAuthContext
 
 
 # dispatch protects all HTTP requests coming in
@@ -47,7 +47,7 @@ class UsersAPIView(APIView):
             queryParams = request.query_params.dict()
 
             responseData, httpStatus = self.getUsers(
-                queryParams, getAuthorizationToken(request)
+                queryParams, getAuthContext(request)
             )
 
             return Response(responseData, httpStatus)
@@ -127,12 +127,12 @@ class UsersAPIView(APIView):
 
         """
         responseData, httpStatus = self.updateUser(
-            request.data, getAuthorizationToken(request)
+            request.data, getAuthContext(request)
         )
         return Response(responseData, status=httpStatus)
 
     @staticmethod
-    def updateUser(userData, authorizationToken):
+    def updateUser(userData, authContext):
         """
         Service API function that can be called internally as well as through the API to update
         a user based on input data.
@@ -145,7 +145,7 @@ class UsersAPIView(APIView):
                 "message": "Error: Parameter 'id' required"
             }, status.HTTP_400_BAD_REQUEST
 
-        userID = decodeApiKey(authorizationToken).get("userID")
+        userID = authContext.userID
         if userID != userData["id"]:
             return {
                 "message": "Unauthorized to update that user."
@@ -160,12 +160,15 @@ class UsersAPIView(APIView):
 
         if serializer.is_valid():
             serializer.save()  # Updates users
+            # Old tokens must go through the full check again
+            if "apiKey" in userData:
+                invalidateUserTokens(userData["id"])
             return serializer.data, status.HTTP_200_OK
 
         return serializer.errors, status.HTTP_400_BAD_REQUEST
 
     @staticmethod
-    def getUsers(userData, authorizationToken=None):
+    def getUsers(userData, authContext=None):
         """
         Service API function that can be called internally as well as through the API to get a user.
 
@@ -175,7 +178,7 @@ class UsersAPIView(APIView):
 
         if not isinstance(userData, list):
             # If authorized user is getting information about their self, return all data
-            userID = decodeApiKey(authorizationToken).get("userID")
+            userID = authContext.userID
             if "id" in userData and userID == userData["id"]:
                 if not userData.get("id") and not userData.get("email"):
                     return {
@@ -1,10 +1,8 @@
-import os
-import jwt
 from rest_framework import status
-from dotenv import load_dotenv
 from django.http import HttpResponseServerError
 
 from api.views.v1.users import UsersAPIView
+from api.auth import AuthContext
 from app.forms import NewProjectForm
 
 
@@ -12,32 +10,39 @@ def global_context(request):
     """
     Sets context variables used by EVERY HTML template.
     Currently sets the userID and api version url.
+    Resolved once per request: later calls (views, the template context processor) reuse the
+    result stored on request.globalContext.
 
     @param {HttpRequest} request - The request object.
     @returns {dict} - A dictionary with the API URL and the user ID,
         where the user ID is an empty string if not authenticated.
     """
+    context = getattr(request, "globalContext", None)
+    if context is not None:
+        return context
 
     # Get userID from jwt if they are logged in
-    load_dotenv()
-    secretKey = os.getenv("API_SECRET")
     token = request.COOKIES.get("apiToken")
 
     userID = ""
     username = ""
     if token:
-        decoded = jwt.decode(token, secretKey, algorithms=["HS256"])
-        userID = decoded.get("userID")
+        # Reuse the context apiKeyRequired verified instead of decoding again
+        authContext = getattr(request, "authContext", None)
+        if authContext is None or authContext.token != token:
+            authContext = AuthContext.fromToken(token)
+        userID = authContext.userID
 
-        data, httpsCode = UsersAPIView.getUsers({"id": userID}, token)
+        data, httpsCode = UsersAPIView.getUsers({"id": userID}, authContext)
         if httpsCode != status.HTTP_200_OK:
             print(f"User update failed: {data.get('message')}")
             return HttpResponseServerError(f"An error occurred: {data.get('message')}")
         username = data[0].get("username")
 
-    return {
+    request.globalContext = {
         "apiUrl": "/api/v1",
         "userID": userID,
         "username": username,
         "newProjectForm": NewProjectForm(),
     }
+    return request.globalContext
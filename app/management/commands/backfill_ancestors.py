@@ -0,0 +1,71 @@
+from bson.objectid import ObjectId
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from api.models import Task
+from api.hierarchy import computeAncestors
+
+
+class Command(BaseCommand):
+    help = """Sets Task.ancestors and Task.depth from parentTaskID for every task whose values are
+        missing or wrong, one project at a time. Tasks whose parent is missing (or part of a
+        parentTaskID cycle) are reported and get the ancestors above the broken link only."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project",
+            help="Only backfill the tasks of this project (id).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be updated.",
+        )
+
+    def handle(self, *args, **options):
+        apps.get_app_config("api").ensure_connection()
+        collection = Task._get_collection()
+        if options["project"]:
+            projectIDs = [ObjectId(options["project"])]
+        else:
+            projectIDs = collection.distinct("projectID")
+
+        updated = 0
+        for projectID in projectIDs:
+            tasks = {
+                task["_id"]: task
+                for task in collection.find(
+                    {"projectID": projectID}, {"parentTaskID": 1, "ancestors": 1, "depth": 1}
+                )
+            }
+            ancestors, brokenIDs = computeAncestors(
+                {taskID: task.get("parentTaskID") for taskID, task in tasks.items()}
+            )
+            for taskID in brokenIDs:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"task {taskID} of project {projectID}: parent "
+                        f"{tasks[taskID].get('parentTaskID')} is missing or in a cycle"
+                    )
+                )
+
+            operations = [
+                UpdateOne(
+                    {"_id": taskID},
+                    {"$set": {"ancestors": taskAncestors, "depth": len(taskAncestors)}},
+                )
+                for taskID, taskAncestors in ancestors.items()
+                if tasks[taskID].get("ancestors") != taskAncestors
+                or tasks[taskID].get("depth") != len(taskAncestors)
+            ]
+            if operations and not options["dry_run"]:
+                collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            if operations:
+                self.stdout.write(f"project {projectID}: {len(operations)} task(s)")
+
+        verb = "would be updated" if options["dry_run"] else "updated"
+        self.stdout.write(
+            self.style.SUCCESS(f"{len(projectIDs)} project(s) checked, {updated} task(s) {verb}.")
+        )
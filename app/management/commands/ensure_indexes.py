@@ -0,0 +1,73 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from api.models import User, Project, Task, Feedback, GenerationJob, CompletionCache
+
+# Every model whose meta["indexes"] should exist in MongoDB
+MODELS = [User, Project, Task, Feedback, GenerationJob, CompletionCache]
+
+
+def indexKey(fields) -> tuple:
+    """
+    Normalizes an index key ([("field", 1), ...]) so declared and existing indexes compare equal.
+    """
+    return tuple((field, direction) for field, direction in fields)
+
+
+class Command(BaseCommand):
+    help = """Creates the MongoDB indexes declared in api.models (meta["indexes"] and unique fields)
+        and reports the ones it created. Indexes that exist but are no longer declared are reported,
+        and dropped if --drop is passed. Builds are non-blocking (MongoDB 4.2+ never holds an
+        exclusive lock for the whole build; older servers get background=True)."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop indexes that are not declared in api.models.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be created/dropped.",
+        )
+
+    def handle(self, *args, **options):
+        apps.get_app_config("api").ensure_connection()
+        created = dropped = 0
+
+        for model in MODELS:
+            collection = model._get_collection()
+            existing = {
+                indexKey(info["key"]): name
+                for name, info in collection.index_information().items()
+            }
+            declared = {indexKey(spec["fields"]): spec for spec in model._meta["index_specs"]}
+
+            for key, spec in declared.items():
+                if key in existing:
+                    continue
+                indexOptions = {
+                    option: value for option, value in spec.items() if option != "fields"
+                }
+                if not options["dry_run"]:
+                    name = collection.create_index(list(key), background=True, **indexOptions)
+                else:
+                    name = "_".join(f"{field}_{direction}" for field, direction in key)
+                created += 1
+                self.stdout.write(f"created  {collection.name}.{name}")
+
+            for key, name in existing.items():
+                if name == "_id_" or key in declared:
+                    continue
+                if options["drop"]:
+                    if not options["dry_run"]:
+                        collection.drop_index(name)
+                    dropped += 1
+                    self.stdout.write(f"dropped  {collection.name}.{name}")
+                else:
+                    self.stdout.write(f"undeclared {collection.name}.{name} (use --drop to remove)")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{created} index(es) created, {dropped} dropped.")
+        )
@@ -0,0 +1,56 @@
+from bson.objectid import ObjectId
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import Task
+from api.ranking import rebalanceColumn
+
+
+class Command(BaseCommand):
+    help = """Gives evenly spaced kanban ranks (Task.rank) to every kanban column that needs it:
+        columns with a rank longer than settings.RANK_MAX_LENGTH, or with tasks that have no rank
+        yet (this also migrates the old integer priorities, keeping their order). Columns are
+        rebalanced one at a time and can be safely rebalanced while in use."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project",
+            help="Only rebalance the columns of this project (id).",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebalance every column, even if its ranks are fine.",
+        )
+
+    def handle(self, *args, **options):
+        apps.get_app_config("api").ensure_connection()
+        match = {}
+        if options["project"]:
+            match["projectID"] = ObjectId(options["project"])
+        if not options["all"]:
+            match["$or"] = [
+                {"rank": None},
+                {"rank": {"$regex": f"^.{{{settings.RANK_MAX_LENGTH + 1},}}"}},
+            ]
+
+        columns = Task._get_collection().aggregate(
+            [
+                {"$match": match},
+                {"$group": {"_id": {"projectID": "$projectID", "statusId": "$statusId"}}},
+            ]
+        )
+
+        rebalanced = updated = 0
+        for column in columns:
+            projectID = column["_id"].get("projectID")
+            statusID = column["_id"].get("statusId")
+            count = rebalanceColumn(projectID, statusID)
+            rebalanced += 1
+            updated += count
+            self.stdout.write(f"rebalanced {projectID} / {statusID}: {count} task(s)")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{rebalanced} column(s) rebalanced, {updated} task(s) updated.")
+        )
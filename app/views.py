@@ -13,14 +13,14 @@ from django.http import Http404, HttpResponseRedirect, HttpResponseServerError
 from django.views.generic.base import TemplateView
 
 # api imports
-from api.decorators import apiKeyRequired
+from api.decorators import apiKeyRequired, invalidateToken
 from api.models import User
+from api.auth import AuthContext, getAuthContext
 from api.utils import (
     decryptApiKey,
     createEncodedApiKey,
     encryptApiKey,
     getAuthorizationToken,
-    decodeApiKey,
 )
 from api.views.v1.feedback import FeedbackAPIView
 from api.views.v1.tasks import TasksAPIView
@@ -46,6 +46,7 @@ def redirectOffSite(request):
 
 
 def logout(request):
+    invalidateToken(getAuthorizationToken(request))
     response = redirect("/")
     response.delete_cookie("apiToken")
     response.delete_cookie("csrftoken")
@@ -75,7 +76,7 @@ def projectGraphView(request, projectID):
 
     # Check if project exists
     data, httpsCode = ProjectsAPIView.getProjects(
-        {"id": projectID}, getAuthorizationToken(request)
+        {"id": projectID}, getAuthContext(request)
     )
     
 
@@ -90,8 +91,13 @@ def projectGraphView(request, projectID):
                                 "projectData": data[0], **generateTaskFeedbackForm(request)}
     )
 
-@apiKeyRequired
 def generateTaskFeedbackForm(request):
+    """
+    Context for the task feedback form. Only call from views already wrapped in apiKeyRequired.
+
+    @param {HttpRequest} request - The request object.
+    @returns {dict} - The userID and the TaskFeedbackForm class.
+    """
     payload = {
         "userID": global_context(request).get("userID"),
         "TaskFeedbackForm": TaskFeedbackForm
@@ -102,7 +108,7 @@ def generateTaskFeedbackForm(request):
 def createTaskFeedback(request, projectID):
 
     data, httpsCode = ProjectsAPIView.getProjects(
-        {"id": projectID}, getAuthorizationToken(request)
+        {"id": projectID}, getAuthContext(request)
     )
 
 
@@ -114,7 +120,7 @@ def createTaskFeedback(request, projectID):
             newData = form.cleaned_data
             newData["projectID"] = projectID
             print("PROJ ID:", projectID)
-            currentUserID = decodeApiKey(getAuthorizationToken(request)).get("userID")
+            currentUserID = getAuthContext(request).userID
             newData['userID'] = currentUserID
 
             # Remove blank task IDs (bc not required)
@@ -122,7 +128,7 @@ def createTaskFeedback(request, projectID):
                 del newData["taskID"]
 
             message, httpsCode = FeedbackAPIView.createFeedback(
-                newData, getAuthorizationToken(request)
+                newData, getAuthContext(request)
             )
 
             if httpsCode != status.HTTP_201_CREATED:
@@ -197,13 +203,13 @@ def editProjectView(request, projectID):
 
                 userIDs = [user["id"] for user in contributorData]
 
-            currentUserID = decodeApiKey(getAuthorizationToken(request)).get("userID")
+            currentUserID = getAuthContext(request).userID
             if currentUserID not in userIDs:
                 userIDs.append(currentUserID)
 
             newData["userIDs"] = userIDs
             message, httpsCode = ProjectsAPIView.updateProject(
-                newData, getAuthorizationToken(request)
+                newData, getAuthContext(request)
             )
             if httpsCode != status.HTTP_200_OK:
                 print(f"Task update failed: {message}")
@@ -214,7 +220,7 @@ def editProjectView(request, projectID):
     # If a GET (or any other method) we"ll create a blank form
     else:
         projectData, httpsCode = ProjectsAPIView.getProjects(
-            {"id": projectID}, getAuthorizationToken(request)
+            {"id": projectID}, getAuthContext(request)
         )
         if httpsCode != status.HTTP_200_OK:
             print(f"Project GET failed: {projectData.get('message')}")
@@ -226,7 +232,7 @@ def editProjectView(request, projectID):
 
         # Get contributor emails
         contributorString = ""
-        currentUserID = decodeApiKey(getAuthorizationToken(request)).get("userID")
+        currentUserID = getAuthContext(request).userID
         userIDs = projectData.get("userIDs")
 
         contributorIDs = [{"id": ID} for ID in userIDs if ID != currentUserID]
@@ -301,7 +307,7 @@ def taskView(request, projectID:str, viewType:str, taskID:str=None, parentTaskID
     
     # Needed for both post + get
     data, statusCode = ProjectsAPIView.getProjects(
-        {"id": projectID}, getAuthorizationToken(request)
+        {"id": projectID}, getAuthContext(request)
     )
     if statusCode != status.HTTP_200_OK:
         print(f"Project fetch failed: {data.get('message')}")
@@ -309,7 +315,7 @@ def taskView(request, projectID:str, viewType:str, taskID:str=None, parentTaskID
     projectData = data[0]
 
     userDataList, statusCode = UsersAPIView.getUsers(
-        [{"id": id} for id in projectData.get("userIDs")], getAuthorizationToken(request))
+        [{"id": id} for id in projectData.get("userIDs")], getAuthContext(request))
     if statusCode != status.HTTP_200_OK:
         print(f"Users fetch failed: {userDataList.get('message')}")
         return HttpResponseServerError(f"An error occurred: {userDataList.get('message')}")
@@ -358,14 +364,14 @@ def taskView(request, projectID:str, viewType:str, taskID:str=None, parentTaskID
             if taskID:
                 newData["id"] = taskID
                 message, status_code = TasksAPIView.updateTask(
-                    newData, getAuthorizationToken(request)
+                    newData, getAuthContext(request)
                 )
                 if status_code != status.HTTP_200_OK:
                     print(f"Task update failed: {message}")
                     return HttpResponseServerError(f"An error occurred: {message}")
             else:
                 message, httpsCode = TasksAPIView.createTasks(
-                    newData, getAuthorizationToken(request)
+                    newData, getAuthContext(request)
                 )
                 if httpsCode != status.HTTP_201_CREATED:
                     print(f"Task creation failed: {message}")
@@ -382,7 +388,7 @@ def taskView(request, projectID:str, viewType:str, taskID:str=None, parentTaskID
         taskData = None
         if taskID:
             data, statusCode = TasksAPIView.getTasks(
-                {"id": taskID}, getAuthorizationToken(request)
+                {"id": taskID}, getAuthContext(request)
             )
             if statusCode != status.HTTP_200_OK:
                 print(f"Task fetch failed: {data.get('message')}")
@@ -401,7 +407,7 @@ def taskView(request, projectID:str, viewType:str, taskID:str=None, parentTaskID
 
             
         taskView.statusData, statusCode = StatusesAPIView.getStatuses(
-            {"projectID": projectID}, getAuthorizationToken(request))
+            {"projectID": projectID}, getAuthContext(request))
         if statusCode != status.HTTP_200_OK:
             print(f"Task fetch failed: {data.get('message')}")
             return HttpResponseServerError(f"An error occurred: {data.get('message')}")
@@ -460,9 +466,8 @@ def createProjectView(request):
 
     """
 
-    # Gets userID from global context
-    context = global_context(request)
-    userId = context.get("userID")
+    # Gets userID from the verified token (no user lookup needed)
+    userId = getAuthContext(request).userID
 
     # If this is a POST request, process the form data
     if request.method == "POST":
@@ -477,7 +482,7 @@ def createProjectView(request):
                     "name": name,
                     "description": description, 
                     "userIDs": [userId]
-                }, getAuthorizationToken(request)
+                }, getAuthContext(request)
             )
             if httpsCode != status.HTTP_201_CREATED:
                 print(f"Project Creation failed: {projectData.get('message')}")
@@ -487,22 +492,25 @@ def createProjectView(request):
 
             projectID = projectData.get("id")
 
-            message, httpsCode = GeneratedTasksAPIView.generateTasks(
+            # Tasks are generated in the background, the graph page waits for the job
+            jobData, httpsCode = GeneratedTasksAPIView.startGeneration(
                 {
                     "projectID": projectID, 
                     "name": name,
                     "description": description,
                 }
-            , getAuthorizationToken(request)
+            , getAuthContext(request)
             )
-            if httpsCode != status.HTTP_201_CREATED:
-                print(f"Task generation failed: {projectData.get('message')}")
+            if httpsCode != status.HTTP_202_ACCEPTED:
+                print(f"Task generation failed: {jobData.get('message')}")
                 return HttpResponseServerError(
-                    f"Could not generate tasks: {message.get('message')}"
+                    f"Could not generate tasks: {jobData.get('message')}"
                 )
 
             # Redirect to project
-            return HttpResponseRedirect(f"/project/{projectID}/graph")
+            return HttpResponseRedirect(
+                f"/project/{projectID}/graph?generationJob={jobData['jobID']}"
+            )
 
     # If a GET (or any other method), create a blank form
     # else:
@@ -741,7 +749,7 @@ class Callback(TemplateView):
                     "id": userInfo["id"],
                     "apiKey": encryptedApiKey,
                 },
-                apiToken,
+                AuthContext.fromToken(apiToken),
             )
             if httpsCode != status.HTTP_200_OK:
                 print(f"User update failed: {message}")
@@ -759,7 +767,7 @@ class Callback(TemplateView):
                     "id": userInfo["id"],
                     "username": username,
                 },
-                apiToken,
+                AuthContext.fromToken(apiToken),
             )
             if httpsCode != status.HTTP_200_OK:
                 print(f"User update failed: {message}")
@@ -0,0 +1,123 @@
+"""
+Benchmark of moving a kanban card to the top of its column, comparing the old updateKanban
+(load and save() every task after the old/new positions) with the current one (read the ranks
+around the new position + one update_one). The old cost grows with the column size, the new one
+does not.
+
+Needs a MongoDB: run from the repo root against a local/dev database (never production), ex:
+    MONGO_URI=mongodb://localhost:27017/quayside-benchmark python -m benchmarks.kanban
+The tasks it creates are deleted at the end.
+"""
+import os
+import time
+
+import django
+from bson.objectid import ObjectId
+from django.apps import apps
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "quayside.settings")
+django.setup()
+
+from api.auth import AuthContext  # noqa: E402
+from api.models import Project, Task  # noqa: E402
+from api.monitoring import countQueries  # noqa: E402
+from api.ranking import evenRanks  # noqa: E402
+from api.views.v1.kanban import KanbanAPIView  # noqa: E402
+
+
+COLUMN_SIZES = [10, 100, 1000]
+MOVES = 5
+
+
+def updateKanbanBefore(taskData):
+    """
+    The old updateKanban: one save() per shifted task.
+    """
+    updating_task = Task.objects.get(id=taskData["id"])
+    old_status_tasks = Task.objects.filter(
+        projectID=updating_task.projectID,
+        statusId=updating_task.statusId,
+        priority__gt=updating_task.priority,
+    )
+    new_status_tasks = Task.objects.filter(
+        projectID=updating_task.projectID,
+        statusId=taskData["statusId"],
+        priority__gte=taskData["priority"],
+    )
+    for task in old_status_tasks:
+        task.priority -= 1
+        task.save()
+    for task in new_status_tasks:
+        task.priority += 1
+        task.save()
+    updating_task.statusId = taskData["statusId"]
+    updating_task.priority = taskData["priority"]
+    updating_task.save()
+
+
+def createColumn(projectID, statusID, size):
+    Task.objects.insert(
+        [
+            Task(
+                projectID=projectID,
+                statusId=statusID,
+                name=f"Task {i}",
+                priority=i,
+                rank=rank,
+                durationMinutes=0,
+            )
+            for i, rank in enumerate(evenRanks(size))
+        ],
+        load_bulk=False,
+    )
+
+
+def timeMoves(move, projectID, statusID):
+    """
+    Moves the last card of the column to the top MOVES times.
+
+    @return      A tuple of (ms per move, commands per move).
+    """
+    elapsed = 0
+    commands = 0
+    for _ in range(MOVES):
+        lastTask = Task.objects(projectID=projectID).order_by("-rank").only("id").first()
+        with countQueries() as queries:
+            start = time.perf_counter()
+            move({"id": str(lastTask.id), "statusId": str(statusID), "priority": 0})
+            elapsed += time.perf_counter() - start
+        commands += queries.count
+    return elapsed / MOVES * 1e3, commands / MOVES
+
+
+def main():
+    apps.get_app_config("api").ensure_connection()  # Only done by requests otherwise
+    userID = ObjectId()
+    project = Project(name="Kanban benchmark", userIDs=[userID], taskStatuses=[])
+    project.taskStatuses.append(Project.Status(name="Todo", color="323232", order=1))
+    project.save()
+    statusID = project.taskStatuses[0].id
+    authContext = AuthContext(userID)
+
+    try:
+        for size in COLUMN_SIZES:
+            Task.objects(projectID=project.id).delete()
+            createColumn(project.id, statusID, size)
+
+            beforeMs, beforeCommands = timeMoves(updateKanbanBefore, project.id, statusID)
+            afterMs, afterCommands = timeMoves(
+                lambda taskData: KanbanAPIView.updateKanban(taskData, authContext),
+                project.id,
+                statusID,
+            )
+            print(
+                f"{size:>5} cards   before {beforeMs:8.1f} ms/move ({beforeCommands:6.0f} commands)"
+                f"   after {afterMs:6.1f} ms/move ({afterCommands:2.0f} commands)"
+            )
+    finally:
+        Task.objects(projectID=project.id).delete()
+        project.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Micro-benchmark of the API key helpers in api.utils, comparing the old per-call setup
+(load_dotenv + new Fernet on every call) with the process keyring.
+
+Run from the repo root:
+    python -m benchmarks.keyring
+"""
+import os
+import timeit
+
+import jwt
+from dotenv import load_dotenv
+from cryptography.fernet import Fernet
+
+from api import utils
+
+
+ITERATIONS = 2000
+SECRET = Fernet.generate_key().decode().rstrip("=")
+
+
+def decodeApiKeyBefore(apiKey):
+    load_dotenv()
+    secretKey = os.getenv("API_SECRET")
+    return jwt.decode(apiKey, secretKey, algorithms=["HS256"])
+
+
+def decryptApiKeyBefore(apiKey):
+    fernetSecretKey = os.getenv("API_SECRET") + "="
+    fernet = Fernet(fernetSecretKey.encode())
+    return fernet.decrypt(apiKey).decode()
+
+
+def report(name, before, after):
+    beforeUs = before / ITERATIONS * 1e6
+    afterUs = after / ITERATIONS * 1e6
+    print(f"{name:<16} before {beforeUs:8.1f} us/call   after {afterUs:8.1f} us/call   ({beforeUs / afterUs:.1f}x)")
+
+
+def main():
+    os.environ["API_SECRET"] = SECRET
+    utils.loadKeyring()
+
+    apiKey = utils.createEncodedApiKey("65f0c0ffee0000000000beef")
+    encryptedApiKey = utils.encryptApiKey(apiKey)
+
+    report(
+        "decodeApiKey",
+        timeit.timeit(lambda: decodeApiKeyBefore(apiKey), number=ITERATIONS),
+        timeit.timeit(lambda: utils.decodeApiKey(apiKey), number=ITERATIONS),
+    )
+    report(
+        "decryptApiKey",
+        timeit.timeit(lambda: decryptApiKeyBefore(encryptedApiKey), number=ITERATIONS),
+        timeit.timeit(lambda: utils.decryptApiKey(encryptedApiKey), number=ITERATIONS),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark of the task list read path, comparing MongoEngine documents + TaskSerializer
+(the old getTasks) with raw pymongo documents + api.encoders (the current one).
+No database is needed: the raw documents are generated in memory.
+
+Run from the repo root (same environment as manage.py):
+    python -m benchmarks.serialization
+"""
+import os
+import timeit
+from datetime import date
+
+import django
+from bson.objectid import ObjectId
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "quayside.settings")
+django.setup()
+
+from api.encoders import getEncoder  # noqa: E402
+from api.models import Task, Project  # noqa: E402
+from api.serializers import TaskSerializer, ProjectSerializer  # noqa: E402
+
+
+DOCUMENTS = 1000
+ITERATIONS = 5
+
+
+def rawTasks(count):
+    projectID = ObjectId()
+    return [
+        Task(
+            id=ObjectId(),
+            projectID=projectID,
+            parentTaskID=ObjectId(),
+            name=f"Task {i}",
+            objectives=["Objective 1", "Objective 2"],
+            contributorIDs=[ObjectId()],
+            description="Description",
+            startDate=date(2024, 1, 2),
+            statusId=ObjectId(),
+            priority=i,
+            durationMinutes=60,
+        ).to_mongo().to_dict()
+        for i in range(count)
+    ]
+
+
+def rawProjects(count):
+    return [
+        Project(
+            id=ObjectId(),
+            name=f"Project {i}",
+            userIDs=[ObjectId()],
+            objectives=["Objective 1", "Objective 2"],
+            risks=["Risk"],
+            taskStatuses=[Project.Status(name="Todo", color="323232", order=1)],
+        ).to_mongo().to_dict()
+        for i in range(count)
+    ]
+
+
+def report(name, before, after):
+    beforeMs = before / ITERATIONS * 1e3
+    afterMs = after / ITERATIONS * 1e3
+    print(
+        f"{name:<20} before {beforeMs:8.1f} ms   after {afterMs:8.1f} ms   ({beforeMs / afterMs:.1f}x)"
+    )
+
+
+def compare(name, documentClass, serializerClass, rawDocuments):
+    encoder = getEncoder(documentClass)
+    assert encoder.encodeMany(rawDocuments) == serializerClass(
+        [documentClass._from_son(rawDocument) for rawDocument in rawDocuments], many=True
+    ).data
+
+    report(
+        f"{DOCUMENTS} {name}",
+        timeit.timeit(
+            lambda: serializerClass(
+                [documentClass._from_son(rawDocument) for rawDocument in rawDocuments], many=True
+            ).data,
+            number=ITERATIONS,
+        ),
+        timeit.timeit(lambda: encoder.encodeMany(rawDocuments), number=ITERATIONS),
+    )
+
+
+def main():
+    compare("tasks", Task, TaskSerializer, rawTasks(DOCUMENTS))
+    compare("projects", Project, ProjectSerializer, rawProjects(DOCUMENTS))
+
+
+if __name__ == "__main__":
+    main()
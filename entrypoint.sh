@@ -1,4 +1,4 @@
 #!/bin/bash
 set -e
 python manage.py collectstatic --noinput
-exec gunicorn --bind 0.0.0.0:8080 --workers 2 --timeout 90 quayside.wsgi:application
+exec gunicorn --config gunicorn.conf.py --bind 0.0.0.0:8080 --workers 2 --timeout 90 quayside.wsgi:application
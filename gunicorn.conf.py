@@ -0,0 +1,22 @@
+"""
+Gunicorn settings/hooks. Loaded by entrypoint.sh (gunicorn --config gunicorn.conf.py).
+"""
+import os
+
+
+def post_fork(server, worker):
+    """
+    Runs in each worker right after it is forked. Sets up Django (if the app was not preloaded)
+    and warms the worker's own MongoDB pool so its first request does not pay for the SRV DNS
+    lookup and TLS handshake.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "quayside.settings")
+
+    import django
+    from django.apps import apps
+
+    django.setup()
+    try:
+        apps.get_app_config("api").warm_pool()
+    except Exception as e:  # The worker still connects lazily on its first query
+        server.log.warning(f"Could not warm MongoDB pool for worker {worker.pid}: {e}")
@@ -135,3 +135,60 @@ STATICFILES_FINDERS = [
     "django.contrib.staticfiles.finders.AppDirectoriesFinder",
     "compressor.finders.CompressorFinder",
 ]
+
+# Verified API token cache used by api.decorators.apiKeyRequired (per process)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+
+# User -> member project ids cache used for authorization (per process). Writes in this process
+# invalidate it right away; other workers see changes after at most the TTL.
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "4096"))
+MEMBERSHIP_CACHE_TTL_SECONDS = int(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", "30"))
+
+# Project -> task statuses cache used by api.views.v1.statuses (per process). Entries are checked
+# against Project.statusVersion on every read, the TTL only bounds how long unused ones are kept.
+STATUS_CACHE_SIZE = int(os.getenv("STATUS_CACHE_SIZE", "4096"))
+STATUS_CACHE_TTL_SECONDS = int(os.getenv("STATUS_CACHE_TTL_SECONDS", "3600"))
+
+# MongoDB connection (see api.apps.ApiConfig.connect_database). Each can be overridden by an env
+# variable of the same name. MONGO_URI (env only) replaces the whole connection string.
+MONGO_HOST = "quayside-cluster.ry3otj1.mongodb.net"
+MONGO_DATABASE = "quayside"
+MONGO_MAX_POOL_SIZE = 20  # Per worker process
+MONGO_MIN_POOL_SIZE = 2  # Idle connections kept open so requests skip the TLS handshake
+MONGO_MAX_IDLE_TIME_MS = 5 * 60 * 1000
+MONGO_SERVER_SELECTION_TIMEOUT_MS = 5000
+MONGO_SOCKET_TIMEOUT_MS = 30000
+
+# Keyset pagination of list endpoints (see api.pagination)
+PAGE_SIZE_DEFAULT = 100  # Used when only a cursor is passed
+PAGE_SIZE_MAX = 1000
+
+# Tasks read from MongoDB per round trip by the streaming task export
+EXPORT_BATCH_SIZE = 500
+
+# Threads per process for api.background (deferred writes such as kanban normalization)
+BACKGROUND_WORKERS = 2
+
+# Threads per process for task generation jobs (api.background "generation" pool). Each job mostly
+# waits on OpenAI. Jobs running for longer than the timeout (from startedAt), or still pending
+# (waiting for a free thread) long after they were created, are marked as failed: the process
+# running them died.
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "4"))
+GENERATION_JOB_TIMEOUT_SECONDS = int(os.getenv("GENERATION_JOB_TIMEOUT_SECONDS", "300"))
+GENERATION_JOB_PENDING_TIMEOUT_SECONDS = int(os.getenv("GENERATION_JOB_PENDING_TIMEOUT_SECONDS", "3600"))
+# Generated tasks are saved as the completion streams in, at most one write per this many seconds
+GENERATION_FLUSH_SECONDS = float(os.getenv("GENERATION_FLUSH_SECONDS", "0.5"))
+
+# OpenAI API base URL (see api.llm), None for the default. Tests point it at a fake server.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Completions cached in MongoDB by request (api.llm.cachedStreamCompletion). Identical generation
+# requests (temperature 0) then skip OpenAI. Entries expire after the TTL (changing it needs
+# `manage.py ensure_indexes --drop` then `ensure_indexes`) and the oldest are deleted past the cap.
+COMPLETION_CACHE_ENABLED = os.getenv("COMPLETION_CACHE_ENABLED", "True") == "True"
+COMPLETION_CACHE_TTL_SECONDS = int(os.getenv("COMPLETION_CACHE_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "10000"))
+
+# Kanban ranks (Task.rank, see api.ranking) longer than this trigger a rebalance of their column
+RANK_MAX_LENGTH = 24
@@ -0,0 +1,76 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+FIXTURES = Path(__file__).parent / "fixtures" / "completions"
+
+
+def loadRecording(name: str) -> dict:
+    """
+    @param name      File name (without .json) in tests/fixtures/completions.
+    @return      The recorded completion: {"model", "deltas": [text chunks in the order received]}.
+    """
+    with open(FIXTURES / f"{name}.json", encoding="utf-8") as file:
+        return json.load(file)
+
+
+class FakeOpenAIServer:
+    """
+    Local HTTP server that answers chat completion requests by replaying a recorded streamed
+    completion (server-sent events, like the OpenAI API), so streaming can be tested offline.
+
+    @example:
+        with FakeOpenAIServer(loadRecording("projectPlan")) as server:
+            openai.OpenAI(api_key="test", base_url=server.baseURL)...
+    """
+
+    def __init__(self, recording: dict):
+        self.recording = recording
+        self.requests = []  # JSON bodies received
+        fakeServer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                fakeServer.requests.append(json.loads(body))
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for delta in fakeServer.recording["deltas"]:
+                    self.sendEvent(fakeServer.chunk({"content": delta}, None))
+                self.sendEvent(fakeServer.chunk({}, "stop"))
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def sendEvent(self, data: dict):
+                self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def baseURL(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def chunk(self, delta: dict, finishReason) -> dict:
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": self.recording["model"],
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finishReason}],
+        }
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
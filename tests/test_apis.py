@@ -1,7 +1,11 @@
 import pytest
+from django.apps import apps
+from django.test import SimpleTestCase
 from rest_framework.exceptions import ValidationError
-from api.models import Project, User
+from api.auth import AuthContext
+from api.models import Project, User, Task, Feedback
 from api.serializers import ProjectSerializer, StatusSerializer
+from api.views.v1.projects import ProjectsAPIView
 
 @pytest.mark.django_db
 def test_update_project_with_task_statuses():
@@ -103,3 +107,41 @@ def test_update_project_with_no_task_statuses():
     assert updated_project.description == "This is an updated test project."
     assert updated_project.taskStatuses == []
 
+
+class TestDeleteProject(SimpleTestCase):
+    """
+    Runs against the MongoDB collections (the project, its tasks and feedback are real documents).
+    """
+
+    def setUp(self):
+        apps.get_app_config("api").ensure_connection()  # Done by the first request otherwise
+        self.user = User.objects.create(email="cascade@example.com")
+        self.project = Project.objects.create(name="Test Project", userIDs=[self.user.id], taskStatuses=[])
+        self.otherProject = Project.objects.create(
+            name="Other Project", userIDs=[self.user.id], taskStatuses=[]
+        )
+        for project in (self.project, self.otherProject):
+            root = Task.objects.create(projectID=project.id, name="Root", durationMinutes=0)
+            Task.objects.create(projectID=project.id, parentTaskID=root.id, name="Child", durationMinutes=0)
+            Feedback.objects.create(userID=self.user.id, projectID=project.id, taskID=root.id)
+
+    def tearDown(self):
+        for project in (self.project, self.otherProject):
+            Task.objects(projectID=project.id).delete()
+            Feedback.objects(projectID=project.id).delete()
+            Project.objects(id=project.id).delete()
+        self.user.delete()
+
+    def test_delete_project_leaves_no_tasks_or_feedback_behind(self):
+        response, httpStatus = ProjectsAPIView.deleteProjects(
+            {"id": str(self.project.id)}, AuthContext(self.user.id)
+        )
+
+        self.assertEqual(httpStatus, 200, response)
+        self.assertEqual(response["deleted"], {"projects": 1, "tasks": 2, "feedback": 1})
+        self.assertEqual(Project.objects(id=self.project.id).count(), 0)
+        self.assertEqual(Task.objects(projectID=self.project.id).count(), 0)
+        self.assertEqual(Feedback.objects(projectID=self.project.id).count(), 0)
+        # Only that project's documents are deleted
+        self.assertEqual(Task.objects(projectID=self.otherProject.id).count(), 2)
+        self.assertEqual(Feedback.objects(projectID=self.otherProject.id).count(), 1)
@@ -0,0 +1,153 @@
+import os
+from unittest import mock
+
+import jwt
+from bson.objectid import ObjectId
+from cryptography.fernet import Fernet, InvalidToken
+from django.test import RequestFactory, SimpleTestCase
+
+from api.auth import AuthContext, getAuthContext, projectMembershipCache
+from api.decorators import verifiedTokenCache
+from api.views.v1.projects import ProjectsAPIView
+from api.utils import (
+    createEncodedApiKey,
+    decodeApiKey,
+    decryptApiKey,
+    encryptApiKey,
+    loadKeyring,
+    toFernetKey,
+)
+
+
+def makeSecret() -> str:
+    # Like API_SECRET in .env, without the base64 padding
+    return Fernet.generate_key().decode().rstrip("=")
+
+
+class TestCanAccessProject(SimpleTestCase):
+    def setUp(self):
+        self.userID = str(ObjectId())
+        self.projectID = ObjectId()
+        patcher = mock.patch("api.auth.Project")
+        self.memberships = patcher.start().objects.return_value.scalar
+        self.addCleanup(patcher.stop)
+        self.addCleanup(projectMembershipCache.invalidate, self.userID)
+
+    def test_a_cached_grant_is_trusted_unless_fresh(self):
+        # Cached by an earlier request, then removed from the project by another worker
+        projectMembershipCache.set(self.userID, frozenset([self.projectID]))
+        self.memberships.return_value = []
+
+        self.assertTrue(AuthContext(self.userID).canAccessProject(self.projectID))
+        self.memberships.assert_not_called()
+        self.assertFalse(AuthContext(self.userID).canAccessProject(self.projectID, fresh=True))
+        self.memberships.assert_called_once()
+
+    def test_fresh_checks_query_once_per_request(self):
+        otherProjectID = ObjectId()
+        self.memberships.return_value = [self.projectID, otherProjectID]
+        authContext = AuthContext(self.userID)
+
+        self.assertTrue(authContext.canAccessProject(self.projectID, fresh=True))
+        self.assertTrue(authContext.canAccessProject(otherProjectID, fresh=True))
+        self.assertFalse(authContext.canAccessProject(ObjectId(), fresh=True))
+        self.assertEqual(self.memberships.call_count, 1)
+
+
+class TestKeyring(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(loadKeyring)  # Runs last, with the original environment back
+        self.oldSecret = makeSecret()
+        self.newSecret = makeSecret()
+
+    def useSecrets(self, secret: str, previous: str = ""):
+        patcher = mock.patch.dict(os.environ, {"API_SECRET": secret, "API_SECRET_PREVIOUS": previous})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return loadKeyring()
+
+    def test_to_fernet_key_restores_the_padding(self):
+        key = Fernet.generate_key()
+        self.assertEqual(toFernetKey(key.decode().rstrip("=")), key)
+        self.assertEqual(toFernetKey(key.decode()), key)
+
+    def test_keys_made_before_a_rotation_still_work(self):
+        self.useSecrets(self.oldSecret)
+        oldToken = createEncodedApiKey("user1")
+        oldEncrypted = encryptApiKey(oldToken)
+
+        keyring = self.useSecrets(self.newSecret, f"{makeSecret()}, {self.oldSecret}")
+
+        self.assertEqual(keyring.jwtSecret, self.newSecret)
+        self.assertEqual(decodeApiKey(oldToken)["userID"], "user1")
+        self.assertEqual(decryptApiKey(oldEncrypted), oldToken)
+
+    def test_new_keys_use_the_primary_secret(self):
+        self.useSecrets(self.newSecret, self.oldSecret)
+        token = createEncodedApiKey("user1")
+        encrypted = encryptApiKey(token)
+
+        self.assertEqual(jwt.decode(token, self.newSecret, algorithms=["HS256"])["userID"], "user1")
+        with self.assertRaises(jwt.InvalidSignatureError):
+            jwt.decode(token, self.oldSecret, algorithms=["HS256"])
+        self.assertEqual(Fernet(toFernetKey(self.newSecret)).decrypt(encrypted.encode()).decode(), token)
+        with self.assertRaises(InvalidToken):
+            Fernet(toFernetKey(self.oldSecret)).decrypt(encrypted.encode())
+
+    def test_keys_of_retired_secrets_are_rejected(self):
+        self.useSecrets(self.oldSecret)
+        oldToken = createEncodedApiKey("user1")
+
+        self.useSecrets(self.newSecret)
+
+        with self.assertRaises(jwt.InvalidSignatureError):
+            decodeApiKey(oldToken)
+
+
+class TestAuthContextPerRequest(SimpleTestCase):
+    def setUp(self):
+        verifiedTokenCache.clear()
+        self.addCleanup(verifiedTokenCache.clear)
+        self.userID = str(ObjectId())
+        self.token = "token"
+
+        self.decode = mock.patch("api.decorators.decodeApiKey", return_value={"userID": self.userID}).start()
+        mock.patch("api.decorators.decryptApiKey", return_value=self.token).start()
+        users = mock.patch("api.decorators.User").start()
+        users.objects.filter.return_value.first.return_value = {"apiKey": "encrypted"}
+        self.fromToken = mock.patch.object(AuthContext, "fromToken").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_view_builds_one_context_and_passes_it_to_the_service(self):
+        contexts = []
+
+        def createProjects(projectData, authContext):
+            contexts.append(authContext)
+            return [], 201
+
+        request = RequestFactory().post("/api/v1/projects/", {}, HTTP_AUTHORIZATION=self.token)
+        with mock.patch.object(ProjectsAPIView, "createProjects", side_effect=createProjects):
+            response = ProjectsAPIView.as_view()(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.decode.assert_called_once_with(self.token)
+        self.fromToken.assert_not_called()
+        self.assertIs(contexts[0], request.authContext)
+        self.assertEqual((contexts[0].userID, contexts[0].token), (self.userID, self.token))
+
+    def test_get_auth_context_reuses_the_attached_context(self):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=self.token)
+        authContext = AuthContext(self.userID, self.token)
+        request.authContext = authContext
+
+        self.assertIs(getAuthContext(request), authContext)
+        self.assertIs(getAuthContext(request), authContext)
+        self.fromToken.assert_not_called()
+
+    def test_get_auth_context_decodes_an_unwrapped_request_once(self):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=self.token)
+
+        first = getAuthContext(request)
+
+        self.assertIs(getAuthContext(request), first)
+        self.fromToken.assert_called_once_with(self.token)
@@ -0,0 +1,37 @@
+from unittest import mock
+from django.test import SimpleTestCase
+from api.cache import TTLCache
+
+
+class TestTTLCache(SimpleTestCase):
+    def test_hits_and_misses_are_counted(self):
+        cache = TTLCache("testCache.counts", maxSize=2, ttl=60)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.hits.value, 1)
+        self.assertEqual(cache.misses.value, 1)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache("testCache.lru", maxSize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+
+    def test_entries_expire(self):
+        cache = TTLCache("testCache.ttl", maxSize=2, ttl=10)
+        with mock.patch("api.cache.time.monotonic", return_value=100):
+            cache.set("a", 1)
+        with mock.patch("api.cache.time.monotonic", return_value=111):
+            self.assertIsNone(cache.get("a"))
+
+    def test_invalidate_where(self):
+        cache = TTLCache("testCache.invalidate", maxSize=10, ttl=60)
+        cache.set("token1", "user1")
+        cache.set("token2", "user1")
+        cache.set("token3", "user2")
+        self.assertEqual(cache.invalidateWhere(lambda _, userID: userID == "user1"), 2)
+        self.assertEqual(cache.get("token3"), "user2")
@@ -0,0 +1,93 @@
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api import llm
+from tests.fakeOpenAI import FakeOpenAIServer, loadRecording
+
+
+MESSAGES = [
+    {"role": "system", "content": "You plan projects.\n    List the tasks."},
+    {"role": "user", "content": "Project Name: Website"},
+]
+
+
+class TestCompletionKey(SimpleTestCase):
+    def test_ignores_whitespace_and_parameter_order(self):
+        key = llm.completionKey(MESSAGES, model="gpt-3.5-turbo", temperature=0)
+        reformatted = [
+            {"role": "system", "content": "  You plan projects. List the tasks.\n"},
+            {"role": "user", "content": "Project Name:   Website"},
+        ]
+
+        self.assertEqual(llm.completionKey(reformatted, temperature=0, model="gpt-3.5-turbo"), key)
+        self.assertNotEqual(llm.completionKey(MESSAGES, model="gpt-4", temperature=0), key)
+        self.assertNotEqual(llm.completionKey(MESSAGES, model="gpt-3.5-turbo", temperature=1), key)
+        self.assertNotEqual(
+            llm.completionKey(MESSAGES[:1] + [{"role": "user", "content": "Project Name: Blog"}],
+                              model="gpt-3.5-turbo", temperature=0),
+            key,
+        )
+
+
+class TestCachedStreamCompletion(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"CHATGPT_API_KEY": "test"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(llm.resetClient)
+
+        self.collection = mock.MagicMock()
+        self.collection.estimated_document_count.return_value = 1
+        patcher = mock.patch.object(llm.CompletionCache, "_get_collection", return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.recording = loadRecording("websitePlan")
+        self.text = "".join(self.recording["deltas"])
+
+    def complete(self, server, **params) -> str:
+        with override_settings(OPENAI_BASE_URL=server.baseURL):
+            llm.resetClient()
+            return "".join(llm.cachedStreamCompletion(MESSAGES, model="gpt-3.5-turbo", **params))
+
+    def test_saves_a_miss_and_answers_a_hit_without_openai(self):
+        hits, misses = llm.cacheHits.value, llm.cacheMisses.value
+        self.collection.find_one.return_value = None
+
+        with FakeOpenAIServer(self.recording) as server:
+            self.assertEqual(self.complete(server), self.text)
+            key, document = self.collection.replace_one.call_args.args
+            self.assertEqual(key, {"_id": llm.completionKey(MESSAGES, model="gpt-3.5-turbo")})
+            self.assertEqual(document["text"], self.text)
+
+            self.collection.find_one.return_value = {"_id": key["_id"], "text": self.text}
+            self.assertEqual(self.complete(server), self.text)
+
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual((llm.cacheHits.value - hits, llm.cacheMisses.value - misses), (1, 1))
+
+    def test_use_cache_false_calls_openai_and_refreshes_the_entry(self):
+        self.collection.find_one.return_value = {"_id": "key", "text": "old answer"}
+
+        with FakeOpenAIServer(self.recording) as server:
+            self.assertEqual(self.complete(server, useCache=False), self.text)
+
+        self.assertEqual(len(server.requests), 1)
+        self.collection.find_one.assert_not_called()
+        self.assertEqual(self.collection.replace_one.call_args.args[1]["text"], self.text)
+
+    def test_deletes_the_oldest_entries_past_the_size_cap(self):
+        self.collection.find_one.return_value = None
+        self.collection.estimated_document_count.return_value = 12
+        oldest = self.collection.find.return_value.sort.return_value.limit
+        oldest.return_value = [{"_id": "a"}, {"_id": "b"}]
+
+        with FakeOpenAIServer(self.recording) as server:
+            with override_settings(COMPLETION_CACHE_MAX_ENTRIES=10):
+                self.complete(server)
+
+        self.collection.find.return_value.sort.assert_called_once_with("createdAt", 1)
+        oldest.assert_called_once_with(2)
+        self.collection.delete_many.assert_called_once_with({"_id": {"$in": ["a", "b"]}})
@@ -0,0 +1,47 @@
+from django.apps import apps
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from api.models import User, Project
+from api.monitoring import countQueries
+from api.utils import createEncodedApiKey, encryptApiKey
+
+
+# Pages are rendered without running collectstatic first (no manifest)
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class TestQueriesPerPageView(SimpleTestCase):
+    """
+    The user/context data of a page should be resolved once per request, no matter how many
+    places (apiKeyRequired, views, the context processor, the feedback form) need it.
+    """
+
+    def setUp(self):
+        apps.get_app_config("api").ensure_connection()  # Done by the first request otherwise
+        self.user = User.objects.create(email="context-test@quayside.app", username="contextTest")
+        self.apiToken = createEncodedApiKey(str(self.user.id))
+        self.user.apiKey = encryptApiKey(self.apiToken)
+        self.user.save()
+        self.project = Project.objects.create(
+            name="Context Test",
+            userIDs=[self.user.id],
+            taskStatuses=[Project.Status(name="Todo", color="323232", order=1)],
+        )
+        self.client.cookies["apiToken"] = self.apiToken
+
+    def tearDown(self):
+        self.project.delete()
+        self.user.delete()
+
+    def test_index_looks_up_user_once(self):
+        with countQueries() as queries:
+            response = self.client.get(reverse("index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries.count, 1, queries.commands)
+
+    def test_kanban_page_looks_up_user_once(self):
+        url = reverse("project-kanban-view", kwargs={"projectID": str(self.project.id)})
+        self.client.get(url)  # Token is verified (and cached) on the first request
+
+        with countQueries() as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries.count, 1, queries.commands)
@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from pymongo.errors import OperationFailure
+
+from api.database import ILLEGAL_OPERATION, runInTransaction
+
+
+class TestRunInTransaction(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("api.database.mongo.get_connection")
+        self.client = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.session = self.client.start_session.return_value.__enter__.return_value
+        self.function = mock.Mock(return_value="result")
+
+    def test_runs_in_a_transaction_on_replica_sets(self):
+        self.client.topology_description.topology_type_name = "ReplicaSetWithPrimary"
+        self.session.with_transaction.side_effect = lambda function: function(self.session)
+
+        self.assertEqual(runInTransaction(self.function), "result")
+        self.function.assert_called_once_with(self.session)
+
+    def test_runs_directly_on_standalone_servers(self):
+        self.client.topology_description.topology_type_name = "Single"
+
+        self.assertEqual(runInTransaction(self.function), "result")
+        self.function.assert_called_once_with(None)
+        self.client.start_session.assert_not_called()
+
+    def test_falls_back_when_the_server_refuses_transactions(self):
+        # The topology looked like it supports transactions, the server says otherwise
+        self.client.topology_description.topology_type_name = "Sharded"
+        self.session.with_transaction.side_effect = OperationFailure(
+            "Transaction numbers are only allowed on a replica set member or mongos",
+            code=ILLEGAL_OPERATION,
+        )
+
+        self.assertEqual(runInTransaction(self.function), "result")
+        self.function.assert_called_once_with(None)
+
+    def test_other_failures_are_raised(self):
+        self.client.topology_description.topology_type_name = "ReplicaSetWithPrimary"
+        self.session.with_transaction.side_effect = OperationFailure("Write conflict", code=112)
+
+        with self.assertRaises(OperationFailure):
+            runInTransaction(self.function)
+        self.function.assert_not_called()
@@ -0,0 +1,76 @@
+from datetime import date, datetime
+from bson.objectid import ObjectId
+from django.test import SimpleTestCase
+
+from api.encoders import getEncoder
+from api.models import Project, Task, Feedback
+from api.serializers import ProjectSerializer, TaskSerializer, FeedbackSerializer
+
+
+def rawDocument(document) -> dict:
+    """
+    The document as pymongo would return it (what QuerySet.as_pymongo() gives).
+    """
+    rawData = document.to_mongo().to_dict()
+    rawData.setdefault("_id", ObjectId())
+    return rawData
+
+
+class TestEncoderParity(SimpleTestCase):
+    """
+    api.encoders must give exactly what the DocumentSerializers give for the same stored document.
+    """
+
+    def assertSameAsSerializer(self, documentClass, serializerClass, rawData):
+        expected = serializerClass(documentClass._from_son(rawData)).data
+        self.assertEqual(getEncoder(documentClass).encode(rawData), expected)
+
+    def test_full_task(self):
+        task = Task(
+            projectID=ObjectId(),
+            parentTaskID=ObjectId(),
+            name="Task",
+            objectives=["a", "b"],
+            contributorIDs=[ObjectId(), ObjectId()],
+            description="Description",
+            startDate=date(2024, 1, 2),
+            endDate=date(2024, 2, 3),
+            statusId=ObjectId(),
+            priority=3,
+            durationMinutes=90,
+        )
+        self.assertSameAsSerializer(Task, TaskSerializer, rawDocument(task))
+
+    def test_task_with_missing_and_null_fields(self):
+        rawData = {"_id": ObjectId(), "projectID": ObjectId(), "name": "Task", "parentTaskID": None}
+        self.assertSameAsSerializer(Task, TaskSerializer, rawData)
+
+    def test_project_with_statuses(self):
+        project = Project(
+            name="Project",
+            userIDs=[ObjectId()],
+            startDate=date(2024, 1, 2),
+            KPIs=["kpi"],
+            taskStatuses=[
+                Project.Status(name="Todo", color="323232", order=1),
+                Project.Status(name="Done", color="01796E", order=2),
+            ],
+        )
+        self.assertSameAsSerializer(Project, ProjectSerializer, rawDocument(project))
+
+    def test_feedback_datetime(self):
+        feedback = Feedback(
+            userID=ObjectId(),
+            projectID=ObjectId(),
+            dateCreated=datetime(2024, 1, 2, 3, 4, 5, 678000),
+            mood=4,
+        )
+        self.assertSameAsSerializer(Feedback, FeedbackSerializer, rawDocument(feedback))
+
+    def test_only_requested_fields(self):
+        rawData = {"_id": ObjectId(), "name": "Task", "parentTaskID": ObjectId()}
+        data = getEncoder(Task, ["id", "name", "parentTaskID"]).encode(rawData)
+        self.assertEqual(
+            data,
+            {"id": str(rawData["_id"]), "name": "Task", "parentTaskID": str(rawData["parentTaskID"])},
+        )
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from bson.objectid import ObjectId
+from django.test import SimpleTestCase
+
+from api.models import GenerationJob
+from api.views.v1.generatedTasks import GeneratedTasksAPIView, GenerationJobAPIView
+
+
+def makeJob(status: str, age: timedelta, runningFor: timedelta = None) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": ObjectId(),
+        "projectID": ObjectId(),
+        "status": status,
+        "createdAt": now - age,
+        "startedAt": None if runningFor is None else now - runningFor,
+    }
+
+
+class TestGenerationJobTimeout(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(GenerationJob, "_get_collection")
+        self.collection = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.authContext = mock.Mock(**{"canAccessProject.return_value": True})
+
+    def test_a_job_waiting_for_a_thread_is_not_timed_out_by_its_age(self):
+        queued = makeJob("pending", age=timedelta(minutes=10))
+        running = makeJob("running", age=timedelta(minutes=10), runningFor=timedelta(minutes=1))
+
+        self.assertFalse(GenerationJobAPIView.timedOut(queued))
+        self.assertFalse(GenerationJobAPIView.timedOut(running))
+        self.assertTrue(GenerationJobAPIView.timedOut(makeJob("pending", age=timedelta(hours=2))))
+        self.assertTrue(
+            GenerationJobAPIView.timedOut(makeJob("running", age=timedelta(minutes=10), runningFor=timedelta(minutes=6)))
+        )
+
+    def test_a_timed_out_job_is_saved_as_failed(self):
+        job = makeJob("running", age=timedelta(minutes=10), runningFor=timedelta(minutes=6))
+        self.collection.find_one.return_value = job
+        self.collection.find_one_and_update.return_value = {**job, "status": "failed"}
+
+        response, httpStatus = GenerationJobAPIView.getGenerationJob({"id": str(job["_id"])}, self.authContext)
+
+        self.assertEqual((httpStatus, response["status"]), (200, "failed"))
+        query, update = self.collection.find_one_and_update.call_args.args
+        self.assertEqual(query, {"_id": job["_id"], "status": "running"})
+        self.assertEqual(update["$set"]["status"], "failed")
+
+    def test_a_job_that_timed_out_while_pending_never_runs(self):
+        self.collection.update_one.return_value.matched_count = 0
+
+        with mock.patch.object(GeneratedTasksAPIView, "generateTasks") as generateTasks:
+            GeneratedTasksAPIView.runGenerationJob(ObjectId(), {}, self.authContext)
+
+        generateTasks.assert_not_called()
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from bson.objectid import ObjectId
+from django.test import SimpleTestCase
+
+from api.hierarchy import computeAncestors, subtreeFilter, subtreeQuery
+from api.models import Task
+
+
+class TestComputeAncestors(SimpleTestCase):
+    def test_computes_root_first_ancestors(self):
+        parents = {"a1": "a", "b": "root", "a": "root", "root": None, "a11": "a1"}
+
+        ancestors, brokenIDs = computeAncestors(parents)
+
+        self.assertEqual(ancestors["root"], [])
+        self.assertEqual(ancestors["a"], ["root"])
+        self.assertEqual(ancestors["b"], ["root"])
+        self.assertEqual(ancestors["a11"], ["root", "a", "a1"])
+        self.assertEqual(brokenIDs, set())
+
+    def test_handles_deep_trees_without_recursion(self):
+        parents = {i: (i - 1 if i else None) for i in range(5000)}
+
+        ancestors, _ = computeAncestors(parents)
+
+        self.assertEqual(ancestors[4999], list(range(4999)))
+
+    def test_stops_paths_at_missing_parents_and_cycles(self):
+        parents = {"orphan": "deleted", "child": "orphan", "x": "y", "y": "x"}
+
+        ancestors, brokenIDs = computeAncestors(parents)
+
+        self.assertEqual(ancestors["orphan"], [])
+        self.assertEqual(ancestors["child"], ["orphan"])
+        # The cycle is cut where the walk from x finds it again
+        self.assertEqual(ancestors["y"], [])
+        self.assertEqual(ancestors["x"], ["y"])
+        self.assertEqual(brokenIDs, {"orphan", "y"})
+
+
+class TestSubtreeQuery(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(Task, "_get_collection")
+        self.collection = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.taskID = ObjectId()
+        self.projectID = ObjectId()
+
+    def test_uses_ancestors_for_backfilled_tasks(self):
+        self.collection.find_one.return_value = {"_id": self.taskID}
+
+        self.assertEqual(subtreeQuery(self.taskID, self.projectID), subtreeFilter(self.taskID))
+        self.collection.aggregate.assert_not_called()
+
+    def test_follows_parent_ids_for_tasks_saved_before_ancestors(self):
+        # No depth yet: descendants have no ancestors, only parentTaskID
+        childID, grandchildID = ObjectId(), ObjectId()
+        self.collection.find_one.return_value = None
+        self.collection.aggregate.return_value = [
+            {"_id": childID, "parentTaskID": self.taskID},
+            {"_id": grandchildID, "parentTaskID": childID},
+        ]
+
+        self.assertEqual(
+            subtreeQuery(self.taskID, self.projectID),
+            {"_id": {"$in": [self.taskID, childID, grandchildID]}},
+        )
+        graphLookup = self.collection.aggregate.call_args.args[0][1]["$graphLookup"]
+        self.assertEqual(graphLookup["connectToField"], "parentTaskID")
+        self.assertEqual(graphLookup["restrictSearchWithMatch"], {"projectID": self.projectID})
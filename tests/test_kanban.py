@@ -0,0 +1,117 @@
+from bson.objectid import ObjectId
+from django.apps import apps
+from django.test import SimpleTestCase
+
+from api.auth import AuthContext
+from api.models import Project, Task, User
+from api.ranking import rankBetween
+from api.views.v1.kanban import KanbanAPIView
+
+
+class TestNormalizeTaskPriorityAndStatus(SimpleTestCase):
+    def test_normalizes_in_memory_and_returns_only_dirty_updates(self):
+        statusID = ObjectId()
+        tasks = [
+            {"_id": ObjectId(), "rank": "V", "statusId": statusID},  # Already right
+            {"_id": ObjectId(), "priority": 0, "statusId": None},  # Not migrated, no status
+            {"_id": ObjectId(), "rank": "A", "statusId": ObjectId()},  # Unknown status
+        ]
+
+        taskList, operations = KanbanAPIView.normalizeTaskPriorityAndStatus(tasks, statusID)
+
+        self.assertEqual(
+            [task["_id"] for task in taskList], [tasks[2]["_id"], tasks[0]["_id"], tasks[1]["_id"]]
+        )
+        self.assertEqual([task["priority"] for task in taskList], [0, 1, 2])
+        self.assertTrue(all(task["statusId"] == statusID for task in taskList))
+        self.assertGreater(taskList[2]["rank"], "V")
+        self.assertEqual(len(operations), 2)
+        # Only applies if the task was not changed since it was read
+        self.assertEqual(
+            operations[1]._filter,
+            {"_id": tasks[1]["_id"], "rank": None, "statusId": None},
+        )
+        self.assertEqual(
+            operations[1]._doc, {"$set": {"rank": taskList[2]["rank"], "statusId": statusID}}
+        )
+
+
+class TestKanbanPipeline(SimpleTestCase):
+    def test_groups_unknown_statuses_in_first_column_and_limits_inside_the_group(self):
+        statusIDs = [ObjectId(), ObjectId()]
+
+        pipeline = KanbanAPIView.kanbanPipeline(ObjectId(), statusIDs)
+        limited = KanbanAPIView.kanbanPipeline(ObjectId(), statusIDs, 50)
+
+        self.assertEqual(
+            pipeline[-1]["$group"]["_id"],
+            {"$cond": [{"$in": ["$statusId", statusIDs]}, "$statusId", statusIDs[0]]},
+        )
+        self.assertEqual(pipeline[-1]["$group"]["tasks"], {"$push": "$$ROOT"})
+        # Limited inside the group, a column is never built whole
+        self.assertEqual(limited[-1]["$group"]["tasks"], {"$firstN": {"input": "$$ROOT", "n": 50}})
+
+
+class TestUpdateKanban(SimpleTestCase):
+    """
+    Runs against the MongoDB collections (the project and its cards are real documents).
+    """
+
+    def setUp(self):
+        apps.get_app_config("api").ensure_connection()  # Done by the first request otherwise
+        self.user = User.objects.create(email="kanban-test@quayside.app")
+        self.project = Project.objects.create(
+            name="Kanban Test",
+            userIDs=[self.user.id],
+            taskStatuses=[
+                Project.Status(name="Todo", color="323232", order=1),
+                Project.Status(name="Done", color="01796E", order=2),
+            ],
+        )
+        self.todoID, self.doneID = (stat.id for stat in self.project.taskStatuses)
+        self.authContext = AuthContext(self.user.id)
+
+        rank = None
+        self.cards = {}
+        for name, statusID in [("a", self.todoID), ("b", self.todoID), ("c", self.todoID), ("d", self.doneID)]:
+            rank = rankBetween(rank, None)
+            self.cards[name] = Task.objects.create(
+                projectID=self.project.id, name=name, statusId=statusID, rank=rank
+            ).id
+
+    def tearDown(self):
+        Task.objects(projectID=self.project.id).delete()
+        self.project.delete()
+        self.user.delete()
+
+    def move(self, name, statusID, priority):
+        return KanbanAPIView.updateKanban(
+            {"id": str(self.cards[name]), "statusId": str(statusID) if statusID else None, "priority": priority},
+            self.authContext,
+        )
+
+    def column(self, statusID) -> list:
+        return [task.name for task in Task.objects(projectID=self.project.id, statusId=statusID).order_by("rank")]
+
+    def test_moves_a_card_within_its_column(self):
+        response, httpStatus = self.move("c", self.todoID, 0)
+
+        self.assertEqual(httpStatus, 200, response)
+        self.assertEqual(self.column(self.todoID), ["c", "a", "b"])
+
+        self.move("c", self.todoID, 1)
+        self.assertEqual(self.column(self.todoID), ["a", "c", "b"])
+
+    def test_moves_a_card_to_another_column(self):
+        response, httpStatus = self.move("a", self.doneID, 1)
+
+        self.assertEqual(httpStatus, 200, response)
+        self.assertEqual(self.column(self.todoID), ["b", "c"])
+        self.assertEqual(self.column(self.doneID), ["d", "a"])
+
+    def test_rejects_statuses_of_other_projects_and_no_status(self):
+        for statusID in (ObjectId(), None):
+            response, httpStatus = self.move("a", statusID, 0)
+
+            self.assertEqual(httpStatus, 400, response)
+        self.assertEqual(self.column(self.todoID), ["a", "b", "c"])
@@ -0,0 +1,34 @@
+from bson.objectid import ObjectId
+from django.test import SimpleTestCase, override_settings
+
+from api.pagination import encodeCursor, decodeCursor, popPaginationParameters
+
+
+class TestPagination(SimpleTestCase):
+    def test_cursor_round_trips(self):
+        objectID = ObjectId()
+        cursor = encodeCursor(objectID)
+        self.assertNotIn(str(objectID), cursor)
+        self.assertEqual(decodeCursor(cursor), objectID)
+
+    def test_invalid_cursor_raises(self):
+        with self.assertRaises(ValueError):
+            decodeCursor("not a cursor")
+
+    def test_no_parameters_is_unpaginated(self):
+        queryData = {"projectID": "1234"}
+        self.assertIsNone(popPaginationParameters(queryData))
+        self.assertEqual(queryData, {"projectID": "1234"})
+
+    @override_settings(PAGE_SIZE_DEFAULT=10, PAGE_SIZE_MAX=50)
+    def test_parameters_are_popped_and_limit_is_capped(self):
+        objectID = ObjectId()
+        queryData = {"projectID": "1234", "limit": "500", "cursor": encodeCursor(objectID)}
+        self.assertEqual(popPaginationParameters(queryData), (50, objectID))
+        self.assertEqual(queryData, {"projectID": "1234"})
+        self.assertEqual(popPaginationParameters({"cursor": ""}), (10, None))
+
+    def test_invalid_limit_raises(self):
+        for limit in ("abc", "0", "-1"):
+            with self.assertRaises(ValueError):
+                popPaginationParameters({"limit": limit})
@@ -0,0 +1,52 @@
+import random
+from django.test import SimpleTestCase
+
+from api.ranking import rankBetween, evenRanks, columnOrder
+
+
+class TestRanking(SimpleTestCase):
+    def assertBetween(self, before, rank, after):
+        if before is not None:
+            self.assertLess(before, rank)
+        if after is not None:
+            self.assertLess(rank, after)
+
+    def test_rank_between(self):
+        cases = [
+            (None, None), (None, "1"), ("1", None), ("z", None), ("A", "B"), ("A", "A1"), ("Az", "B"),
+        ]
+        for before, after in cases:
+            self.assertBetween(before, rankBetween(before, after), after)
+
+    def test_rank_between_rejects_unordered_ranks(self):
+        with self.assertRaises(ValueError):
+            rankBetween("B", "A")
+        with self.assertRaises(ValueError):
+            rankBetween("A", "A")
+
+    def test_random_inserts_keep_order(self):
+        generator = random.Random(0)
+        ranks = []
+        for _ in range(1000):
+            position = generator.randint(0, len(ranks))
+            before = ranks[position - 1] if position > 0 else None
+            after = ranks[position] if position < len(ranks) else None
+            rank = rankBetween(before, after)
+            self.assertBetween(before, rank, after)
+            ranks.insert(position, rank)
+
+    def test_even_ranks_are_sorted_and_unique(self):
+        for count in (0, 1, 5, 5000):
+            ranks = evenRanks(count)
+            self.assertEqual(len(ranks), count)
+            self.assertEqual(ranks, sorted(set(ranks)))
+            self.assertFalse(any(rank.endswith("0") for rank in ranks))
+
+    def test_column_order_puts_unranked_tasks_last_by_priority(self):
+        tasks = [
+            {"_id": 1, "priority": 2},
+            {"_id": 2, "rank": "B"},
+            {"_id": 3, "priority": 1},
+            {"_id": 4, "rank": "A"},
+        ]
+        self.assertEqual([task["_id"] for task in sorted(tasks, key=columnOrder)], [4, 2, 3, 1])
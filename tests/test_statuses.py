@@ -0,0 +1,116 @@
+from unittest import mock
+
+from bson.objectid import ObjectId
+from django.test import SimpleTestCase
+
+from api.auth import AuthContext
+from api.models import Project
+from api.serializers import ProjectSerializer
+from api.views.v1.statuses import StatusesAPIView, statusCache
+
+
+class TestStatusWrites(SimpleTestCase):
+    def setUp(self):
+        self.userID = ObjectId()
+        self.projectID = ObjectId()
+        self.statusID = ObjectId()
+        patcher = mock.patch.object(Project, "_get_collection")
+        self.collection = patcher.start().return_value
+        self.collection.update_one.return_value.matched_count = 1
+        self.addCleanup(patcher.stop)
+
+    def test_update_sets_only_the_changed_fields_of_one_status(self):
+        response, httpStatus = StatusesAPIView.updateStatus(
+            {"projectID": str(self.projectID), "id": str(self.statusID), "order": "3"},
+            AuthContext(self.userID),
+        )
+
+        self.assertEqual(httpStatus, 200, response)
+        self.collection.update_one.assert_called_once_with(
+            {"_id": self.projectID, "userIDs": self.userID, "taskStatuses.id": self.statusID},
+            {"$set": {"taskStatuses.$[status].order": 3}, "$inc": {"statusVersion": 1}},
+            array_filters=[{"status.id": self.statusID}],
+        )
+
+    def test_delete_pulls_the_status_for_members_only(self):
+        response, httpStatus = StatusesAPIView.deleteStatus(
+            {"projectID": str(self.projectID), "id": str(self.statusID)}, AuthContext(self.userID)
+        )
+
+        self.assertEqual(httpStatus, 200, response)
+        self.collection.update_one.assert_called_once_with(
+            {"_id": self.projectID, "userIDs": self.userID, "taskStatuses.id": self.statusID},
+            {"$pull": {"taskStatuses": {"id": self.statusID}}, "$inc": {"statusVersion": 1}},
+        )
+
+    def test_invalid_fields_are_not_written(self):
+        response, httpStatus = StatusesAPIView.createStatus(
+            {"projectID": str(self.projectID), "name": "Done", "color": "00FF00", "order": "last"},
+            AuthContext(self.userID),
+        )
+
+        self.assertEqual(httpStatus, 400)
+        self.assertIn("order", response["message"])
+        self.collection.update_one.assert_not_called()
+
+
+class TestGetStatuses(SimpleTestCase):
+    def setUp(self):
+        self.userID = ObjectId()
+        self.projectID = ObjectId()
+        patcher = mock.patch.object(Project, "_get_collection")
+        self.collection = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(AuthContext, "canAccessProject", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(statusCache.clear)
+
+    def test_sorts_by_order_and_only_rereads_changed_statuses(self):
+        statuses = [
+            {"id": ObjectId(), "name": "Done", "color": "00FF00", "order": 2},
+            {"id": ObjectId(), "name": "Todo", "color": "FF0000", "order": 1},
+        ]
+        self.collection.find_one.return_value = {"taskStatuses": statuses, "statusVersion": 4}
+        authContext = AuthContext(self.userID)
+
+        first, httpStatus = StatusesAPIView.getStatuses({"projectID": str(self.projectID)}, authContext)
+        self.assertEqual(httpStatus, 200)
+        self.assertEqual([stat["name"] for stat in first], ["Todo", "Done"])
+
+        # Unchanged: the read leaves the statuses out and the cached ones are returned
+        self.collection.find_one.return_value = {"statusVersion": 4}
+        second, httpStatus = StatusesAPIView.getStatuses({"projectID": str(self.projectID)}, authContext)
+
+        self.assertEqual(httpStatus, 200)
+        self.assertEqual(second, first)
+        query, projection = self.collection.find_one.call_args.args
+        self.assertEqual(query, {"_id": self.projectID, "userIDs": self.userID})
+        self.assertEqual(
+            projection["taskStatuses"]["$cond"][0], {"$gt": [{"$ifNull": ["$statusVersion", 0]}, 4]}
+        )
+
+    def test_cached_statuses_are_not_returned_to_removed_members(self):
+        statusCache.set(self.projectID, (1, [{"id": str(ObjectId()), "name": "Todo", "order": 1}]))
+
+        # Removed from the project (or it was deleted): the membership filter matches nothing
+        self.collection.find_one.return_value = None
+        response, httpStatus = StatusesAPIView.getStatuses(
+            {"projectID": str(self.projectID)}, AuthContext(self.userID)
+        )
+
+        self.assertEqual(httpStatus, 403, response)
+
+
+class TestProjectSerializerStatusVersion(SimpleTestCase):
+    def update(self, data) -> Project:
+        project = Project(name="Project", userIDs=[ObjectId()], taskStatuses=[], statusVersion=2)
+        with mock.patch.object(Project, "save"):
+            return ProjectSerializer().update(project, data)
+
+    def test_any_write_of_task_statuses_bumps_the_version(self):
+        self.assertEqual(self.update({"taskStatuses": []}).statusVersion, 3)
+        self.assertEqual(
+            self.update({"taskStatuses": [{"name": "Todo", "color": "323232", "order": 1}]}).statusVersion, 3
+        )
+        self.assertEqual(self.update({"name": "Renamed"}).statusVersion, 2)
@@ -0,0 +1,147 @@
+import os
+from unittest import mock
+
+from bson.objectid import ObjectId
+from django.test import SimpleTestCase, override_settings
+
+from api import llm
+from api.hierarchy import subtreeFilter
+from api.models import Task
+from api.taskPlan import TaskPlanParser, parseTaskLine
+from api.views.v1.generatedTasks import GeneratedTasksAPIView
+from tests.fakeOpenAI import FakeOpenAIServer, loadRecording
+
+
+def makeRoot() -> dict:
+    return {"_id": ObjectId(), "projectID": ObjectId(), "ancestors": [], "durationMinutes": 0}
+
+
+class TestParseTaskLine(SimpleTestCase):
+    def test_parses_numbers_names_and_durations(self):
+        self.assertEqual(parseTaskLine("1. Plan"), (("1",), "Plan", None))
+        self.assertEqual(
+            parseTaskLine("   2.2.1. Choose colors [1.5 hours]"), (("2", "2", "1"), "Choose colors", 90)
+        )
+        self.assertEqual(parseTaskLine("  1.3 Launch [2 days]"), (("1", "3"), "Launch", 960))
+
+    def test_ignores_lines_that_are_not_tasks(self):
+        self.assertIsNone(parseTaskLine(""))
+        self.assertIsNone(parseTaskLine("Here is your plan:"))
+        self.assertIsNone(parseTaskLine("2024 will be a great year"))
+
+
+class TestTaskPlanParser(SimpleTestCase):
+    def test_links_tasks_to_their_parents_as_lines_complete(self):
+        root = makeRoot()
+        parser = TaskPlanParser(root)
+
+        self.assertEqual(parser.feed("1. Plan\n   1.1. Res"), [plan := parser.topLevelTasks[0]])
+        self.assertEqual(plan["parentTaskID"], root["_id"])
+
+        (research,) = parser.feed("earch [30 minutes]\n")
+        self.assertEqual(research["name"], "Research")
+        self.assertEqual(research["parentTaskID"], plan["_id"])
+        self.assertEqual(research["ancestors"], [root["_id"], plan["_id"]])
+        self.assertEqual(research["depth"], 2)
+
+        # A skipped level goes under the closest listed ancestor, the last line needs close()
+        self.assertEqual(parser.feed("   1.2.1. Draft [2 hours]"), [])
+        (draft,) = parser.close()
+        self.assertEqual(draft["parentTaskID"], plan["_id"])
+
+    def test_rolls_up_durations_to_parents(self):
+        root = makeRoot()
+        parser = TaskPlanParser(root)
+        parser.feed("1. Plan [1 week]\n   1.1. A [30 minutes]\n   1.2. B [1 hour]\n2. Launch [2 hours]\n")
+        plan, launch = parser.topLevelTasks
+
+        durations = parser.rollUpDurations()
+
+        self.assertEqual(durations, {plan["_id"]: 90, root["_id"]: 210})
+        self.assertEqual(plan["durationMinutes"], 90)
+        self.assertEqual(launch["durationMinutes"], 120)
+        self.assertEqual(root["durationMinutes"], 210)
+
+
+class TestStreamedPlan(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"CHATGPT_API_KEY": "test"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(llm.resetClient)
+
+    def test_tasks_are_parsed_while_a_recorded_completion_streams(self):
+        recording = loadRecording("websitePlan")
+        parser = TaskPlanParser(makeRoot())
+
+        with FakeOpenAIServer(recording) as server:
+            with override_settings(OPENAI_BASE_URL=server.baseURL):
+                llm.resetClient()
+                chunksBeforeFirstTask = None
+                tasks = []
+                for i, text in enumerate(
+                    llm.streamCompletion([{"role": "user", "content": "A website"}], model="gpt-3.5-turbo")
+                ):
+                    tasks.extend(parser.feed(text))
+                    if tasks and chunksBeforeFirstTask is None:
+                        chunksBeforeFirstTask = i + 1
+                tasks.extend(parser.close())
+
+        self.assertTrue(server.requests[0]["stream"])
+        # The first task is known long before the end of the completion
+        self.assertLess(chunksBeforeFirstTask, len(recording["deltas"]) / 10)
+        self.assertEqual(len(tasks), 14)
+        self.assertEqual(
+            [task["name"] for task in parser.topLevelTasks],
+            ["Research and planning", "Design", "Development", "Launch"],
+        )
+        self.assertEqual(max(task["depth"] for task in tasks), 3)
+        self.assertEqual(parser.rollUpDurations()[parser.root["_id"]], 4680)
+
+
+class TestGenerateTasks(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(Task, "_get_collection")
+        self.collection = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.authContext = mock.Mock(**{"canAccessProject.return_value": True})
+        self.projectData = {"projectID": str(ObjectId()), "name": "Website", "description": None}
+
+    def generate(self, *chunks, error=None):
+        def completion(messages, **params):
+            yield from chunks
+            if error:
+                raise error
+
+        with mock.patch("api.views.v1.generatedTasks.cachedStreamCompletion", completion):
+            return GeneratedTasksAPIView.generateTasks(self.projectData, self.authContext)
+
+    def test_a_failed_stream_deletes_the_tasks_already_saved(self):
+        with override_settings(GENERATION_FLUSH_SECONDS=0):
+            with self.assertRaises(ConnectionError):
+                self.generate("1. Plan [1 hour]\n", "2. Build [2 hours]\n", error=ConnectionError())
+
+        root = self.collection.insert_many.call_args_list[0].args[0][0]
+        self.collection.delete_many.assert_called_once_with(subtreeFilter(root["_id"]))
+        self.collection.bulk_write.assert_not_called()
+
+    def test_a_single_top_level_task_replaces_the_project_root(self):
+        tasks, httpStatus = self.generate("1. Website\n   1.1. Design [2 hours]\n   1.2. Build [1 day]\n")
+
+        self.assertEqual(httpStatus, 201)
+        (website,) = tasks
+        self.assertEqual((website["name"], website["parentTaskID"], website["depth"]), ("Website", None, 0))
+        self.assertEqual(website["durationMinutes"], 600)
+        root = self.collection.insert_many.call_args_list[0].args[0][0]
+        self.collection.delete_one.assert_called_once_with({"_id": root["_id"]})
+        self.collection.update_many.assert_called_once_with(
+            {"ancestors": root["_id"]}, {"$pull": {"ancestors": root["_id"]}, "$inc": {"depth": -1}}
+        )
+
+    def test_several_top_level_tasks_go_under_the_project_root(self):
+        tasks, httpStatus = self.generate("1. Design [2 hours]\n2. Build [1 day]\n")
+
+        self.assertEqual(httpStatus, 201)
+        self.assertEqual([task["name"] for task in tasks], ["Website", "Design", "Build"])
+        self.assertEqual(tasks[0]["durationMinutes"], 600)
+        self.collection.delete_one.assert_not_called()
@@ -0,0 +1,127 @@
+from unittest import mock
+
+from bson.objectid import ObjectId
+from django.apps import apps
+from django.test import SimpleTestCase
+
+from api.auth import AuthContext, projectMembershipCache
+from api.models import Project, Task, User
+from api.views.v1.tasks import TasksAPIView
+
+
+class TestGetTasks(SimpleTestCase):
+    def setUp(self):
+        self.userID = str(ObjectId())
+        self.projectID = ObjectId()
+        patcher = mock.patch("api.auth.Project")
+        self.memberships = patcher.start().objects.return_value.scalar
+        self.addCleanup(patcher.stop)
+        self.addCleanup(projectMembershipCache.invalidate, self.userID)
+        patcher = mock.patch.object(Task, "objects")
+        self.tasks = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tasks.filter.return_value.as_pymongo.return_value = [
+            {"_id": ObjectId(), "projectID": self.projectID, "name": "Task"}
+        ]
+
+    def test_a_project_missing_from_the_cached_memberships_is_checked_again(self):
+        # Cached before the project was shared with the user by another worker
+        projectMembershipCache.set(self.userID, frozenset())
+        self.memberships.return_value = [self.projectID]
+
+        response, httpStatus = TasksAPIView.getTasks(
+            {"projectID": str(self.projectID)}, AuthContext(self.userID)
+        )
+
+        self.assertEqual(httpStatus, 200, response)
+        self.assertEqual([task["name"] for task in response], ["Task"])
+        self.tasks.filter.assert_called_once_with(projectID=str(self.projectID))
+
+    def test_other_projects_are_not_read(self):
+        projectMembershipCache.set(self.userID, frozenset())
+        self.memberships.return_value = []
+
+        response, httpStatus = TasksAPIView.getTasks(
+            {"projectID": str(self.projectID)}, AuthContext(self.userID)
+        )
+
+        self.assertEqual(httpStatus, 400)
+        self.tasks.filter.assert_not_called()
+
+
+class TestUpdateTask(SimpleTestCase):
+    def setUp(self):
+        self.userID = str(ObjectId())
+        self.projectID = ObjectId()
+        patcher = mock.patch("api.auth.Project")
+        self.memberships = patcher.start().objects.return_value.scalar
+        self.addCleanup(patcher.stop)
+        self.addCleanup(projectMembershipCache.invalidate, self.userID)
+
+    def test_a_cached_membership_is_not_trusted(self):
+        # Removed from the project by another worker since the memberships were cached
+        projectMembershipCache.set(self.userID, frozenset([self.projectID]))
+        self.memberships.return_value = []
+        task = Task(id=ObjectId(), projectID=self.projectID, name="Task")
+
+        with mock.patch.object(Task, "objects") as tasks:
+            tasks.get.return_value = task
+            response, httpStatus = TasksAPIView.updateTask(
+                {"id": str(task.id), "name": "Renamed"}, AuthContext(self.userID)
+            )
+
+        self.assertEqual(httpStatus, 403, response)
+        self.assertEqual(task.name, "Task")
+
+
+class TestDeleteTask(SimpleTestCase):
+    """
+    Runs against the MongoDB collections (the project and its tasks are real documents).
+    """
+
+    def setUp(self):
+        apps.get_app_config("api").ensure_connection()  # Done by the first request otherwise
+        self.user = User.objects.create(email="delete-task-test@quayside.app")
+        self.project = Project.objects.create(name="Delete Task Test", userIDs=[self.user.id], taskStatuses=[])
+        self.authContext = AuthContext(self.user.id)
+
+        # root > middle > (child > grandchild, sibling)
+        self.tasks = {}
+        for name, parent in [("root", None), ("middle", "root"), ("child", "middle"),
+                             ("grandchild", "child"), ("sibling", "middle")]:
+            parentTask = Task.objects.get(id=self.tasks[parent]) if parent else None
+            ancestors = parentTask.ancestors + [parentTask.id] if parentTask else []
+            self.tasks[name] = Task.objects.create(
+                projectID=self.project.id, name=name, parentTaskID=parentTask.id if parentTask else None,
+                ancestors=ancestors, depth=len(ancestors),
+            ).id
+
+    def tearDown(self):
+        Task.objects(projectID=self.project.id).delete()
+        self.project.delete()
+        self.user.delete()
+
+    def task(self, name) -> Task:
+        return Task.objects.get(id=self.tasks[name])
+
+    def test_children_of_a_deleted_middle_task_move_up(self):
+        response, httpStatus = TasksAPIView.deleteTasks({"id": str(self.tasks["middle"])}, self.authContext)
+
+        self.assertEqual(httpStatus, 200, response)
+        self.assertFalse(Task.objects(id=self.tasks["middle"]))
+        root = self.tasks["root"]
+        for name in ["child", "sibling"]:
+            task = self.task(name)
+            self.assertEqual((task.parentTaskID, task.ancestors, task.depth), (root, [root], 1))
+        grandchild = self.task("grandchild")
+        self.assertEqual(grandchild.parentTaskID, self.tasks["child"])
+        self.assertEqual((grandchild.ancestors, grandchild.depth), ([root, self.tasks["child"]], 2))
+        self.assertEqual((self.task("root").ancestors, self.task("root").depth), ([], 0))
+
+    def test_delete_children_removes_the_whole_subtree(self):
+        response, httpStatus = TasksAPIView.deleteTasks(
+            {"id": str(self.tasks["middle"]), "deleteChildren": "true"}, self.authContext
+        )
+
+        self.assertEqual(httpStatus, 200, response)
+        self.assertEqual([task.name for task in Task.objects(projectID=self.project.id)], ["root"])
@@ -25,12 +25,24 @@ class TestAPIUrls(SimpleTestCase):
         resolver = resolve(url)
         self.assertEqual(resolver.func.view_class, api_views.tasks.TasksAPIView)
 
+    def test_tasks_export_url(self):
+        url = reverse("v1-tasks-export")
+        self.assertEqual(url, "/api/v1/tasks/export/")
+        resolver = resolve(url)
+        self.assertEqual(resolver.func.view_class, api_views.taskExport.TaskExportAPIView)
+
     def test_generated_tasks_url(self):
         url = reverse("v1-generated-tasks")
         self.assertEqual(url, "/api/v1/generatedTasks/")
         resolver = resolve(url)
         self.assertEqual(resolver.func.view_class, api_views.generatedTasks.GeneratedTasksAPIView)
 
+    def test_generation_job_url(self):
+        url = reverse("v1-generated-tasks-job", kwargs={"jobID": "1234"})
+        self.assertEqual(url, "/api/v1/generatedTasks/1234/")
+        resolver = resolve(url)
+        self.assertEqual(resolver.func.view_class, api_views.generatedTasks.GenerationJobAPIView)
+
     def test_kanban_url(self):
         url = reverse("v1-kanban-board")
         self.assertEqual(url, "/api/v1/kanban/")
@@ -43,6 +55,12 @@ class TestAPIUrls(SimpleTestCase):
         resolver = resolve(url)
         self.assertEqual(resolver.func.view_class, api_views.statuses.StatusesAPIView)
 
+    def test_metrics_url(self):
+        url = reverse("v1-metrics")
+        self.assertEqual(url, "/api/v1/metrics/")
+        resolver = resolve(url)
+        self.assertEqual(resolver.func.view_class, api_views.metrics.MetricsAPIView)
+
     # ADD API URL TESTS HERE...
 
 
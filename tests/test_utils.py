@@ -0,0 +1,31 @@
+from datetime import datetime
+from bson.objectid import ObjectId
+from django.test import SimpleTestCase
+
+from api.models import Task
+from api.utils import toMongoValues
+
+
+class TestToMongoValues(SimpleTestCase):
+    def test_values_are_converted(self):
+        statusID = ObjectId()
+        values, errors = toMongoValues(
+            Task, {"statusId": str(statusID), "startDate": "2024-01-02", "priority": "3"}
+        )
+        self.assertEqual(errors, {})
+        self.assertEqual(
+            values,
+            {"statusId": statusID, "startDate": datetime(2024, 1, 2), "priority": 3},
+        )
+
+    def test_invalid_values_are_reported(self):
+        values, errors = toMongoValues(
+            Task, {"statusId": "bad", "name": 5, "id": str(ObjectId()), "unknown": 1}
+        )
+        self.assertEqual(values, {})
+        self.assertEqual(set(errors), {"statusId", "name", "id", "unknown"})
+
+    def test_null_only_allowed_on_nullable_fields(self):
+        values, errors = toMongoValues(Task, {"parentTaskID": None, "durationMinutes": None})
+        self.assertEqual(values, {"parentTaskID": None})
+        self.assertEqual(set(errors), {"durationMinutes"})